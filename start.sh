@@ -5,11 +5,16 @@ set -o errexit
 # pip install -r requirements.txt
 
 
-python manage.py makemigrations --noinput
-
-python manage.py migrate --noinput
-
-python manage.py collectstatic --noinput
+# Migrations and static files are a deploy step: run `python manage.py
+# release` once per deploy (the platform's build or pre-deploy command) and
+# set RELEASE_ON_START=0, and each start only checks that it ran. With
+# RELEASE_ON_START=1 (default) every start releases, which does nothing when
+# the database and the collected static files are already up to date.
+if [ "${RELEASE_ON_START:-1}" = "1" ]; then
+    python manage.py release
+else
+    python manage.py release --check
+fi
 
 #run one-time
 # python manage.py createsuperuser --noinput \
@@ -30,4 +35,24 @@ python manage.py collectstatic --noinput
 #   user.save()" \
 #   | python manage.py shell
 
-gunicorn task_management.wsgi:application --bind 0.0.0.0:$PORT
+# ASGI=1 serves the ASGI app so live group updates (server-sent events) work,
+# with the async list/detail views unless ASYNC_VIEWS=0.
+# Keep it to one process while TASK_EVENTS_BROKER is the in-process broker.
+# Async views run their queries on short-lived threads, so persistent
+# connections are off; set DB_POOL=1 to reuse connections there.
+if [ "${ASGI:-0}" = "1" ]; then
+    export ASYNC_VIEWS="${ASYNC_VIEWS:-1}"
+    export DB_CONN_MAX_AGE="${DB_CONN_MAX_AGE:-0}"
+    exec uvicorn task_management.asgi:application --host 0.0.0.0 --port $PORT
+fi
+
+# Each sync worker keeps its database connection open between requests
+# (DB_CONN_MAX_AGE), or a pool of its own with DB_POOL=1.
+# With GUNICORN_PRELOAD=1 (default) the app is loaded and warmed up once, in
+# the master, and the workers fork from it.
+PRELOAD=""
+if [ "${GUNICORN_PRELOAD:-1}" = "1" ]; then
+    PRELOAD="--preload"
+fi
+
+exec gunicorn task_management.wsgi:application --bind 0.0.0.0:$PORT $PRELOAD
@@ -47,22 +47,33 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'tasks.metrics.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tasks.activity.ActivityActorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'task_management.urls'
 
+# Compiled templates are cached per process, in development too (runserver
+# clears the cache when a template changes). WARM_UP compiles them, and
+# builds the form skeletons of tasks/form_rendering.py, before the first
+# request.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -86,12 +97,132 @@ WSGI_APPLICATION = 'task_management.wsgi.application'
 #     }
 # }
 
+# Connections are kept open between requests for DB_CONN_MAX_AGE seconds
+# (0 closes them at the end of each request) and checked before reuse, so a
+# gunicorn sync worker sets up one connection rather than one per request.
+# Under ASGI each request may run on a new thread with its own connection;
+# start.sh sets DB_CONN_MAX_AGE=0 there so they aren't left open.
+#
+# DB_POOL=1 (Postgres only) uses Django's connection pool instead: each
+# worker process keeps DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE connections, and
+# a request waits up to DB_POOL_TIMEOUT seconds for a free one. Useful under
+# ASGI or with threaded workers; the pool's wait and checkout counts are
+# served at /metrics. The pool needs psycopg 3 and psycopg-pool (both in
+# requirements.txt); Django uses psycopg 3 over psycopg2 when it's installed.
+DB_POOL = os.getenv('DB_POOL', '0') == '1'
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.getenv('DATABASE_URL')
+        default=os.getenv('DATABASE_URL'),
+        # Django refuses persistent connections alongside the pool.
+        conn_max_age=0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        conn_health_checks=True,
     )
 }
 
+# SQLite allows one writer at a time. A transaction that reads before it
+# writes can't wait for the lock once another connection (another worker, or
+# the activity log's writer thread) holds it, and fails with "database is
+# locked"; taking the lock at BEGIN makes it wait its turn instead.
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).setdefault('transaction_mode', 'IMMEDIATE')
+
+if DB_POOL and DATABASES['default'].get('ENGINE') == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '4')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+FRAGMENT_CACHES = {
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('FRAGMENT_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'fragments')),
+    },
+    'off': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered template fragments and their version counters
+    # (tasks/fragments.py). Every worker must see every other worker's
+    # version bumps, or it serves fragments from before their writes, so
+    # there is no per-process option: FRAGMENT_CACHE=file (the default)
+    # shares them between the workers on this host, FRAGMENT_CACHE=off
+    # turns fragment caching off.
+    'fragments': FRAGMENT_CACHES[os.getenv('FRAGMENT_CACHE', 'file')],
+    # Sessions, with SESSION_BACKEND=cached_db (see below). Shared between
+    # the workers on this host, so a logout in one is seen by all of them.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SESSION_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'sessions')),
+    },
+}
+
+FRAGMENT_CACHE_ALIAS = 'fragments'
+
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', '600'))
+
+# Seconds a user's group/admin IDs stay cached (users/access.py). Signals
+# invalidate entries in the process that made the change; with a per-process
+# cache, other workers may see the old value until it expires. That only
+# affects what read-only pages show: checks that allow a change read access
+# from the database (get_current_group_access()).
+GROUP_ACCESS_CACHE_TIMEOUT = int(os.getenv('GROUP_ACCESS_CACHE_TIMEOUT', '60'))
+
+# Live group updates (tasks/events.py). The in-process broker only reaches
+# clients connected to the same server process.
+TASK_EVENTS_BROKER = os.getenv('TASK_EVENTS_BROKER', 'tasks.events.InProcessBroker')
+TASK_EVENTS_HEARTBEAT = int(os.getenv('TASK_EVENTS_HEARTBEAT', '15'))
+
+# Route the task list, group list and group detail pages to the async views
+# (tasks/async_views.py). Only worth it under the ASGI server; start.sh turns
+# it on with ASGI=1.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+
+# Per-view request metrics (tasks/metrics.py). /metrics is open to staff
+# users, and to scrapers sending `Authorization: Bearer $METRICS_TOKEN`.
+# Tracing allocations costs a good share of throughput; leave it off unless
+# you're looking for a memory problem. The Server-Timing header shows every
+# client the query count and timings, so it is only on by default with DEBUG.
+REQUEST_METRICS_SERVER_TIMING = os.getenv('REQUEST_METRICS_SERVER_TIMING', '1' if DEBUG else '0') == '1'
+REQUEST_METRICS_TRACEMALLOC = os.getenv('REQUEST_METRICS_TRACEMALLOC', '0') == '1'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Sessions and flash messages. A logged-in request reads its session; a
+# message that can't go in a cookie makes the session a write, too.
+# - SESSION_BACKEND=db (default): one SELECT per request.
+# - SESSION_BACKEND=cached_db: reads from the 'sessions' cache, writes
+#   through to the database. The cache is a directory every worker on the
+#   host reads (SESSION_CACHE_DIR); workers on several hosts need db.
+# - SESSION_BACKEND=signed_cookies: no database at all, but a session can't
+#   be revoked server-side (logout only clears the browser's copy) and
+#   anyone with SECRET_KEY can forge one.
+# Messages go in a cookie and fall back to the session when they don't fit;
+# MESSAGE_BACKEND=session stores them in the session only.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.getenv('SESSION_BACKEND', 'db')]
+SESSION_CACHE_ALIAS = 'sessions'
+
+MESSAGE_STORAGES = {
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+}
+MESSAGE_STORAGE = MESSAGE_STORAGES[os.getenv('MESSAGE_BACKEND', 'fallback')]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -130,9 +261,39 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFileStorage'
+# Tests render pages without collecting static files first, so they use the
+# plain storage instead (tasks/tests.py).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
 
+# Deploy steps (tasks/release.py). `manage.py release` applies migrations,
+# collects static files and records their fingerprint here; `release
+# --check`, run on every start, compares against it.
+RELEASE_STAMP_FILE = os.getenv('RELEASE_STAMP_FILE', os.path.join(BASE_DIR, '.cache', 'release.json'))
+
+# Load the URLconf and templates when the WSGI/ASGI application is created
+# rather than on the first request. With gunicorn --preload (start.sh)
+# that happens once, before the workers fork.
+WARM_UP = os.getenv('WARM_UP', '1') == '1'
+
+# Activity log (tasks/activity.py). Events are written in the background, in
+# batches of up to ACTIVITY_LOG_BATCH_SIZE, at least every
+# ACTIVITY_LOG_FLUSH_INTERVAL seconds; 0 turns the background writes off, and
+# full batches are written as they fill up (tests call flush() for the rest).
+# `manage.py compact_activity` deletes
+# events older than ACTIVITY_LOG_RETENTION_DAYS.
+ACTIVITY_LOG = os.getenv('ACTIVITY_LOG', '1') == '1'
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', '500'))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', '2'))
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', '90'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+
+# Settings every test class applies, so they hold whatever runs the tests:
+# pages are rendered without collecting
+# static files, so there is no manifest; the activity log is written only
+# when a test flushes it; and the file caches are in a directory of their own,
+# so clearing them doesn't wipe a development server's.
+TEST_CACHE_DIR = tempfile.TemporaryDirectory()
+TEST_OVERRIDES = override_settings(
+    STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+    ACTIVITY_LOG_FLUSH_INTERVAL=0,
+    CACHES={**settings.CACHES, **{
+        alias: {**settings.CACHES[alias], 'LOCATION': os.path.join(TEST_CACHE_DIR.name, alias)}
+        for alias in ('fragments', 'sessions')
+    }},
+)
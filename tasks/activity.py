@@ -0,0 +1,199 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ActivityEvent
+
+logger = logging.getLogger(__name__)
+
+# The activity log: an ActivityEvent row per change to a task, a group or its
+# members, for the group and task timelines.
+#
+# Writing the rows must not slow down the change itself, so record() only
+# queues the event once the change commits; a background thread per process
+# writes what's queued with one bulk_create() when ACTIVITY_LOG_BATCH_SIZE
+# events are waiting, every ACTIVITY_LOG_FLUSH_INTERVAL seconds, and right
+# after a request that queued any unless it wrote less than
+# REQUEST_FLUSH_GAP seconds ago (under load, one write per request would
+# compete with the requests that follow). With ACTIVITY_LOG_FLUSH_INTERVAL=0
+# there is no thread: add() writes the batch itself once it is full. Events
+# still queued when the process exits are written then. If the database can't
+# take them they are kept for the next flush, up to MAX_PENDING; a process
+# that is killed loses them.
+
+# Events queued at most, e.g. while the database is unavailable; the oldest
+# are dropped first.
+MAX_PENDING = 50000
+
+REQUEST_FLUSH_GAP = 0.25
+
+_request = ContextVar('activity_request', default=None)
+
+
+class ActivityBuffer:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._events = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+        self._flushed_at = 0
+
+    def add(self, event):
+        with self._lock:
+            self._events.append(event)
+            pending = len(self._events)
+            if pending > MAX_PENDING:
+                del self._events[:pending - MAX_PENDING]
+        if pending > MAX_PENDING:
+            logger.error("Dropped the %d oldest activity events.", pending - MAX_PENDING)
+        if not settings.ACTIVITY_LOG_FLUSH_INTERVAL:
+            if pending >= settings.ACTIVITY_LOG_BATCH_SIZE:
+                self.flush()
+            return
+        if pending >= settings.ACTIVITY_LOG_BATCH_SIZE:
+            self._wake.set()
+        if self._flusher is None:
+            self._start_flusher()
+
+    def wake(self):
+        """Have the flusher write what's queued now rather than at the next interval."""
+        if self._events and time.monotonic() - self._flushed_at >= REQUEST_FLUSH_GAP:
+            self._wake.set()
+
+    def clear(self):
+        with self._lock:
+            self._events = []
+
+    def flush(self):
+        """Write the queued events in the calling thread. Returns how many were written."""
+        with self._lock:
+            events, self._events = self._events, []
+            self._flushed_at = time.monotonic()
+        if not events:
+            return 0
+        try:
+            ActivityEvent.objects.bulk_create(
+                [ActivityEvent(created_at=created_at, actor_id=actor_id, verb=verb, group_id=group_id,
+                               task_id=task_id, data=data)
+                 for created_at, actor_id, verb, group_id, task_id, data in events],
+                batch_size=settings.ACTIVITY_LOG_BATCH_SIZE,
+            )
+        except DatabaseError:
+            logger.exception("Couldn't write %d activity events; keeping them for the next flush.", len(events))
+            with self._lock:
+                self._events[:0] = events
+                dropped = len(self._events) - MAX_PENDING
+                if dropped > 0:
+                    del self._events[:dropped]
+                    logger.error("Dropped the %d oldest activity events.", dropped)
+            return 0
+        return len(events)
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='activity-log', daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        # Until the interval is set to 0, which turns the background writes off.
+        while settings.ACTIVITY_LOG_FLUSH_INTERVAL:
+            self._wake.wait(settings.ACTIVITY_LOG_FLUSH_INTERVAL)
+            self._wake.clear()
+            # This thread's connection follows CONN_MAX_AGE like a request's.
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Activity log flush failed.")
+            finally:
+                close_old_connections()
+        self._flusher = None
+
+
+buffer = ActivityBuffer()
+atexit.register(buffer.flush)
+# A forked worker (gunicorn --preload) starts with an empty queue and its
+# own flusher; the parent writes what it queued itself.
+os.register_at_fork(after_in_child=buffer._reset)
+
+
+@receiver(request_finished)
+def request_done(sender, **kwargs):
+    buffer.wake()
+
+
+def record(verb, group_id=None, task_id=None, data=None):
+    """Queue an event for when the current transaction commits. Doesn't query."""
+    if not settings.ACTIVITY_LOG:
+        return
+    user = getattr(_request.get(), 'user', None)
+    # The request's user is already loaded by the views that change things.
+    actor_id = user.pk if user is not None and user.is_authenticated else None
+    transaction.on_commit(lambda: buffer.add((timezone.now(), actor_id, verb, group_id, task_id, data or {})))
+
+
+def record_task_change(task_id, before, after):
+    """
+    Record a task change from (before, after) states of the fields in
+    counters.COUNTED_FIELDS, as passed to counters.track_changes().
+    """
+    if before is None:
+        record('task.created', after['group_id'], task_id)
+        return
+    if after is None:
+        record('task.deleted', before['group_id'], task_id)
+        return
+    changes = {field: [before[field], after[field]] for field in after
+               if field in before and before[field] != after[field]}
+    if 'group_id' in changes:
+        # In both groups' timelines.
+        if before['group_id'] is not None:
+            record('task.moved_out', before['group_id'], task_id, changes)
+        record('task.moved', after['group_id'], task_id, changes)
+    elif after['status'] == 'completed' and before.get('status') != 'completed':
+        record('task.completed', after['group_id'], task_id, changes)
+    else:
+        record('task.updated', after['group_id'], task_id, changes)
+
+
+class ActivityActorMiddleware:
+    """Makes request.user the actor of the events recorded while handling the request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # The request rather than its lazy user: asgiref compares context
+        # variables' values, which would load the user.
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
@@ -0,0 +1,272 @@
+import hashlib
+import json
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.core.paginator import InvalidPage
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.timezone import localdate
+from django.views import View
+from django.views.decorators.http import condition
+
+from users.access import get_current_group_access, get_group_access
+from users.models import Group
+from .bulk import FORBIDDEN, NOT_FOUND, apply_bulk_action
+from .forms import TaskForm
+from .fragments import (
+    group_fragment_version, group_last_modified, group_list_last_modified, group_list_version,
+    task_last_modified, task_list_fragment_version, task_list_last_modified,
+)
+from .models import Task, effective_status_for
+from .pagination import CursorPaginationMixin, CursorPaginator
+
+# ETags and Last-Modified come from the fragment version counters
+# (tasks/fragments.py) and Task.updated_at, so a conditional GET that ends in
+# a 304 reads at most one updated_at value and never loads the rows.
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+TASK_FIELDS = ('title', 'description', 'due_date', 'assignee', 'group', 'status')
+
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def task_data(task):
+    return {
+        'id': task.pk,
+        'title': task.title,
+        'description': task.description,
+        'status': task.status,
+        'effective_status': task.effective_status,
+        'due_date': task.due_date,
+        'owner': task.owner_id,
+        'assignee': {'id': task.assignee_id, 'username': task.assignee.username} if task.assignee_id else None,
+        'group': {'id': task.group_id, 'name': task.group.name} if task.group_id else None,
+        'created_at': task.created_at,
+        'updated_at': task.updated_at,
+    }
+
+
+def group_data(group, user):
+    return {
+        'id': group.pk,
+        'name': group.name,
+        'admin': {'id': group.admin_id, 'username': group.admin.username},
+        'is_admin': group.admin_id == user.pk,
+        'created_at': group.created_at,
+    }
+
+
+class ApiView(LoginRequiredMixin, View):
+    """Base for the JSON API: JSON errors, and responses that must be revalidated."""
+
+    def handle_no_permission(self):
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except BadRequest as error:
+            response = JsonResponse({'error': str(error)}, status=400)
+        except Http404:
+            response = JsonResponse({'error': 'Not found.'}, status=404)
+        except PermissionDenied:
+            response = JsonResponse({'error': 'You do not have permission to do that.'}, status=403)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def json_body(self):
+        try:
+            data = json.loads(self.request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            raise BadRequest('Expected a JSON object.')
+        return data
+
+    def page_size(self):
+        try:
+            return max(1, min(int(self.request.GET.get('page_size', API_PAGE_SIZE)), API_MAX_PAGE_SIZE))
+        except ValueError:
+            return API_PAGE_SIZE
+
+    def paginate(self, queryset):
+        paginator = CursorPaginator(queryset, CursorPaginationMixin.cursor_ordering, self.page_size())
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidPage as exc:
+            raise Http404(str(exc)) from exc
+        return {
+            'results': [task_data(task) for task in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        }
+
+
+def _visible_task(user, pk, listing=False):
+    tasks = Task.objects.visible_to(user)
+    if listing:
+        tasks = tasks.for_listing().with_effective_status()
+    task = tasks.filter(pk=pk).first()
+    if task is None:
+        raise Http404('No such task.')
+    return task
+
+
+def _task_list_etag(request):
+    return _etag(request.user.pk, task_list_fragment_version(request.user), request.GET.urlencode())
+
+
+def _task_list_last_modified(request):
+    return task_list_last_modified(request.user)
+
+
+def _task_state(request, pk):
+    """
+    (updated_at, group_id) of a task the user can see, else None. A primary
+    key lookup plus the cached GroupAccess, applying the same rule as
+    TaskQuerySet.visible_to(); shared by the ETag and Last-Modified functions.
+    """
+    if not hasattr(request, '_api_task_state'):
+        row = Task.objects.filter(pk=pk).values_list('updated_at', 'group_id', 'owner_id', 'assignee_id').first()
+        state = None
+        if row is not None:
+            updated_at, group_id, owner_id, assignee_id = row
+            if request.user.pk in (owner_id, assignee_id) or (
+                    group_id and get_group_access(request.user).can_access(group_id)):
+                state = (updated_at, group_id)
+        request._api_task_state = state
+    return request._api_task_state
+
+
+def _task_etag(request, pk):
+    state = _task_state(request, pk)
+    if state is None:
+        return None
+    updated_at, group_id = state
+    return _etag(request.user.pk, updated_at.isoformat(),
+                 group_fragment_version(group_id) if group_id else localdate().isoformat())
+
+
+def _task_last_modified(request, pk):
+    state = _task_state(request, pk)
+    return task_last_modified(*state) if state else None
+
+
+def _group_list_etag(request):
+    return _etag(request.user.pk, group_list_version(request.user))
+
+
+def _group_list_last_modified(request):
+    return group_list_last_modified(request.user)
+
+
+def _group_etag(request, pk):
+    if not get_group_access(request.user).can_access(pk):
+        return None
+    return _etag(request.user.pk, group_fragment_version(pk), request.GET.urlencode())
+
+
+def _group_last_modified(request, pk):
+    return group_last_modified(pk) if get_group_access(request.user).can_access(pk) else None
+
+
+class TaskListApiView(ApiView):
+    """GET: the tasks TaskListView shows (?status=, ?q=, ?cursor=, ?page_size=). POST: create a task."""
+
+    @method_decorator(condition(etag_func=_task_list_etag, last_modified_func=_task_list_last_modified))
+    def get(self, request):
+        tasks = Task.objects.with_status(request.GET.get('status')).visible_to(request.user)
+        if request.GET.get('q', '').strip():
+            tasks = tasks.search(request.GET['q'])
+        return JsonResponse(self.paginate(tasks.for_listing().with_effective_status()))
+
+    def post(self, request):
+        data = {'status': 'ongoing', **self.json_body()}
+        form = TaskForm(data={field: data.get(field) for field in TASK_FIELDS}, request_user=request.user)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        # Same defaults as TaskCreateView.
+        task = form.save(commit=False)
+        task.owner = request.user
+        if task.assignee_id is None and (task.group_id is None or
+                                         get_current_group_access(request.user).can_access(task.group_id)):
+            task.assignee = request.user
+        task.save()
+
+        response = JsonResponse(task_data(_visible_task(request.user, task.pk, listing=True)), status=201)
+        response['Location'] = reverse('api_task_detail', args=[task.pk])
+        return response
+
+
+class TaskDetailApiView(ApiView):
+    """GET a task; PATCH any of its fields (owner or group admin, as TaskUpdateView)."""
+
+    @method_decorator(condition(etag_func=_task_etag, last_modified_func=_task_last_modified))
+    def get(self, request, pk):
+        return JsonResponse(task_data(_visible_task(request.user, pk, listing=True)))
+
+    def patch(self, request, pk):
+        task = _visible_task(request.user, pk)
+        if task.owner_id != request.user.pk and not (
+                task.group_id and get_current_group_access(request.user).is_admin(task.group_id)):
+            raise PermissionDenied
+        data = self.json_body()
+
+        current = {
+            'title': task.title, 'description': task.description, 'due_date': task.due_date,
+            'assignee': task.assignee_id, 'group': task.group_id, 'status': task.status,
+        }
+        current.update((field, data[field]) for field in TASK_FIELDS if field in data)
+        was_overdue = effective_status_for(task.status, task.due_date) == 'overdue'
+        form = TaskForm(data=current, instance=task, request_user=request.user)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        if 'due_date' in form.changed_data and was_overdue and request.user.pk != task.owner_id:
+            return JsonResponse({'errors': {'due_date': ["Only the task owner can change the due date "
+                                                         "of an overdue task."]}}, status=400)
+        form.save()
+        return JsonResponse(task_data(_visible_task(request.user, pk, listing=True)))
+
+
+class TaskCompleteApiView(ApiView):
+    """POST: mark a task completed, with TaskMarkCompleteView's rules."""
+
+    def post(self, request, pk):
+        result = apply_bulk_action(request.user, 'complete', [str(pk)])[str(pk)]
+        if result == NOT_FOUND:
+            raise Http404('No such task.')
+        if result == FORBIDDEN:
+            raise PermissionDenied
+        return JsonResponse(task_data(_visible_task(request.user, pk, listing=True)))
+
+
+class GroupListApiView(ApiView):
+    """GET: the groups GroupListView shows."""
+
+    @method_decorator(condition(etag_func=_group_list_etag, last_modified_func=_group_list_last_modified))
+    def get(self, request):
+        groups = Group.objects.visible_to(request.user).select_related('admin').order_by('name')
+        return JsonResponse({'results': [group_data(group, request.user) for group in groups]})
+
+
+class GroupDetailApiView(ApiView):
+    """GET: a group with its members and a page of its tasks, as GroupDetailView shows them."""
+
+    @method_decorator(condition(etag_func=_group_etag, last_modified_func=_group_last_modified))
+    def get(self, request, pk):
+        group = Group.objects.visible_to(request.user).select_related('admin').filter(pk=pk).first()
+        if group is None:
+            raise Http404('No such group.')
+        members = group.members.select_related('user').only('group_id', 'user__username').order_by('user__username')
+        data = group_data(group, request.user)
+        data['members'] = [{'id': membership.user_id, 'username': membership.user.username} for membership in members]
+        data['tasks'] = self.paginate(group.tasks.for_listing().with_effective_status())
+        return JsonResponse(data)
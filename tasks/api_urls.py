@@ -0,0 +1,10 @@
+from django.urls import path
+from .api import GroupDetailApiView, GroupListApiView, TaskCompleteApiView, TaskDetailApiView, TaskListApiView
+
+urlpatterns = [
+    path('tasks/', TaskListApiView.as_view(), name='api_task_list'),
+    path('tasks/<uuid:pk>/', TaskDetailApiView.as_view(), name='api_task_detail'),
+    path('tasks/<uuid:pk>/complete/', TaskCompleteApiView.as_view(), name='api_task_complete'),
+    path('groups/', GroupListApiView.as_view(), name='api_group_list'),
+    path('groups/<uuid:pk>/', GroupDetailApiView.as_view(), name='api_group_detail'),
+]
@@ -0,0 +1,127 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.views import View
+
+from users.access import aget_group_access
+from users.models import Group
+from .counters import task_counts
+from .fragments import afragment_cached, group_fragment_version, task_list_fragment_version
+from .models import Task
+from .pagination import CursorPaginationMixin
+
+# Async versions of the read-heavy pages, routed instead of the sync views
+# when ASYNC_VIEWS is on (see tasks/urls.py). They render the same templates
+# with the same context; the rows are loaded here with the async ORM, and
+# only when the cached fragment that shows them is missing.
+#
+# Django 5.2's async ORM still runs each query through sync_to_async on the
+# request's own thread, so the queries gathered below run one after another.
+# What an async worker gains is that a request waiting on the database holds
+# a thread from the pool rather than a whole worker process.
+
+
+class AsyncLoginRequiredMixin:
+    """LoginRequiredMixin for async views."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        # The templates read request.user; don't load the user a second time.
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncTaskListView(AsyncLoginRequiredMixin, CursorPaginationMixin, View):
+    paginate_by = 10
+
+    async def get(self, request):
+        user = request.user
+        await aget_group_access(user)  # cached on the user for the helpers below
+        queryset = Task.objects.with_status(request.GET.get('status')).visible_to(user)
+        search_query = request.GET.get('q', '').strip()
+        if search_query:
+            queryset = queryset.search(search_query)
+        page = self.get_cursor_page(queryset.for_listing().with_effective_status(), self.paginate_by)
+        current_status_filter = request.GET.get('status', 'ongoing')
+        fragment_version = await sync_to_async(task_list_fragment_version)(user)
+        status_counts = await sync_to_async(task_counts)(user)
+
+        # Must match the {% cache %} tag in tasks/task_list.html.
+        if not await afragment_cached('task_list', user.pk, current_status_filter, request.GET.get('q', ''),
+                                      request.GET.get(self.cursor_kwarg, ''), fragment_version):
+            await page.aload()
+
+        return TemplateResponse(request, 'tasks/task_list.html', {
+            'view': self,
+            'tasks': page,
+            'object_list': page,
+            'page_obj': page,
+            'paginator': page.paginator,
+            'is_paginated': True,
+            'current_status_filter': current_status_filter,
+            'search_query': search_query,
+            'status_counts': status_counts,
+            'fragment_version': fragment_version,
+            'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        })
+
+
+class AsyncGroupListView(AsyncLoginRequiredMixin, View):
+    async def get(self, request):
+        groups = Group.objects.visible_to(request.user).select_related('admin').with_counts().order_by('name')
+        groups = [group async for group in groups.aiterator()]
+        return TemplateResponse(request, 'groups/group_list.html', {
+            'view': self,
+            'groups': groups,
+            'object_list': groups,
+        })
+
+
+class AsyncGroupDetailView(AsyncLoginRequiredMixin, CursorPaginationMixin, View):
+    paginate_tasks_by = 10
+
+    async def get(self, request, pk):
+        try:
+            group = await Group.objects.visible_to(request.user).select_related('admin').aget(pk=pk)
+        except Group.DoesNotExist:
+            raise Http404("No such group.")
+        page = self.get_cursor_page(group.tasks.for_listing().with_effective_status(), self.paginate_tasks_by)
+        members = group.members.select_related('user').only('group_id', 'user__username').order_by('user__username')
+        is_admin = request.user.pk == group.admin_id
+        fragment_version = await sync_to_async(group_fragment_version)(group.pk)
+
+        # Must match the {% cache %} tags in groups/group_detail.html.
+        members_cached, tasks_cached = await asyncio.gather(
+            afragment_cached('group_detail_members', group.pk, fragment_version),
+            afragment_cached('group_detail_tasks', group.pk, is_admin,
+                             request.GET.get(self.cursor_kwarg, ''), fragment_version),
+        )
+        loads = []
+        if not members_cached:
+            async def load_members():
+                return [membership async for membership in members.aiterator()]
+            loads.append(load_members())
+        if not tasks_cached:
+            loads += [page.aload(), page.aload_count()]
+        if loads:
+            results = await asyncio.gather(*loads)
+            if not members_cached:
+                members = results[0]
+
+        return TemplateResponse(request, 'groups/group_detail.html', {
+            'view': self,
+            'group': group,
+            'object': group,
+            'members': members,
+            'page_obj': page,
+            'tasks': page,
+            'is_admin': is_admin,
+            'fragment_version': fragment_version,
+            'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        })
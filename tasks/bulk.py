@@ -0,0 +1,179 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from users.access import get_current_group_access
+from users.models import Group, Membership
+from .activity import record_task_change
+from .counters import track_changes
+from .events import publish_group_event
+from .fragments import invalidate_groups, invalidate_users
+from .models import Task, delete_rows
+
+User = get_user_model()
+
+ACTIONS = ('complete', 'reassign', 'move_group', 'delete')
+
+# Largest number of task IDs accepted by one bulk request.
+MAX_BULK_TASKS = 500
+
+# Per-ID results.
+OK = 'ok'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+INVALID = 'invalid'
+
+
+class BulkActionError(Exception):
+    """The request as a whole is invalid (unknown action, bad target, too many IDs)."""
+
+
+def _parse_task_ids(values):
+    parsed = {}
+    for value in values:
+        try:
+            parsed[str(value)] = uuid.UUID(str(value))
+        except ValueError:
+            parsed[str(value)] = None
+    return parsed
+
+
+def _can_modify(user, access, row):
+    # Same rule as TaskOwnerOrGroupAdminMixin (edit and delete).
+    return row['owner_id'] == user.pk or (row['group_id'] is not None and access.is_admin(row['group_id']))
+
+
+def _can_complete(user, access, row):
+    # Same rule as TaskMarkCompleteView.
+    return (row['owner_id'] == user.pk or row['assignee_id'] == user.pk
+            or (row['group_id'] is not None and access.can_access(row['group_id'])))
+
+
+def apply_bulk_action(user, action, task_ids, assignee_id=None, group_id=None):
+    """
+    Apply one action to many tasks. Permissions for the whole set are checked
+    against a single SELECT of the tasks (group membership is read from the
+    database, not the per-process GroupAccess cache), and the change itself
+    is one UPDATE or DELETE.
+
+    Returns {task_id: result} with one of the result constants for every ID
+    passed in. Raises BulkActionError if the request itself is invalid.
+    """
+    if action not in ACTIONS:
+        raise BulkActionError(f"Unknown action {action!r}.")
+    if len(task_ids) > MAX_BULK_TASKS:
+        raise BulkActionError(f"At most {MAX_BULK_TASKS} tasks can be changed at once.")
+
+    access = get_current_group_access(user)
+    if action == 'reassign' and assignee_id is not None:
+        assignee_id = _to_python(User, assignee_id, "Unknown assignee.")
+        if not User.objects.filter(pk=assignee_id).exists():
+            raise BulkActionError("Unknown assignee.")
+    if action == 'move_group' and group_id is not None:
+        group_id = _to_python(Group, group_id, "Unknown group.")
+        if not access.can_access(group_id):
+            raise BulkActionError("You can only move tasks into groups you belong to.")
+
+    parsed = _parse_task_ids(task_ids)
+    check = _can_complete if action == 'complete' else _can_modify
+    results = {}
+    with transaction.atomic():
+        rows = (Task.objects.select_for_update().order_by()
+                .filter(pk__in={pk for pk in parsed.values() if pk is not None})
+                .values('id', 'owner_id', 'assignee_id', 'group_id', 'status', 'due_date'))
+        allowed = []
+        for row in rows:
+            if not check(user, access, row):
+                results[row['id']] = FORBIDDEN
+            elif _is_unchanged(action, row, assignee_id, group_id):
+                results[row['id']] = UNCHANGED
+            else:
+                allowed.append(row)
+
+        if action == 'reassign' and assignee_id is not None:
+            # A group task can only go to a member of its group, as in TaskForm.
+            member_of = set(Membership.objects.filter(
+                user_id=assignee_id, group_id__in={row['group_id'] for row in allowed if row['group_id']}
+            ).values_list('group_id', flat=True))
+            for row in allowed:
+                if row['group_id'] and row['group_id'] not in member_of:
+                    results[row['id']] = INVALID
+            allowed = [row for row in allowed if row['id'] not in results]
+
+        if allowed:
+            _apply(action, [row['id'] for row in allowed], assignee_id, group_id)
+            changes = [(row, _changed_row(action, row, assignee_id, group_id)) for row in allowed]
+            track_changes(changes)
+            for before, after in changes:
+                record_task_change(before['id'], before, after)
+        results.update((row['id'], OK) for row in allowed)
+
+    # update() and the raw delete skip model signals, so invalidate the
+    # cached fragments of everyone the changed tasks were or are visible to.
+    invalidate_users(*[row['owner_id'] for row in allowed], *[row['assignee_id'] for row in allowed],
+                     assignee_id if allowed and action == 'reassign' else None)
+    invalidate_groups(*[row['group_id'] for row in allowed], group_id if allowed and action == 'move_group' else None)
+    for row in allowed:
+        _publish(action, row, assignee_id, group_id)
+    return {key: INVALID if pk is None else results.get(pk, NOT_FOUND) for key, pk in parsed.items()}
+
+
+def _to_python(model, value, message):
+    try:
+        return model._meta.pk.to_python(value)
+    except ValidationError:
+        raise BulkActionError(message)
+
+
+def _is_unchanged(action, row, assignee_id, group_id):
+    if action == 'complete':
+        return row['status'] == 'completed'
+    if action == 'reassign':
+        return row['assignee_id'] == assignee_id
+    if action == 'move_group':
+        return row['group_id'] == group_id
+    return False
+
+
+def _changed_row(action, row, assignee_id, group_id):
+    # The row as _apply() leaves it, for the counters.
+    if action == 'complete':
+        return {**row, 'status': 'completed'}
+    if action == 'reassign':
+        return {**row, 'assignee_id': assignee_id}
+    if action == 'move_group':
+        return {**row, 'group_id': group_id}
+    return None
+
+
+def _publish(action, row, assignee_id, group_id):
+    task = {'id': row['id']}
+    if action == 'complete':
+        publish_group_event(row['group_id'], 'task.completed',
+                            {'task': {**task, 'status': 'completed', 'effective_status': 'completed'}})
+    elif action == 'reassign':
+        publish_group_event(row['group_id'], 'task.updated', {'task': {**task, 'assignee_id': assignee_id}})
+    elif action == 'delete':
+        publish_group_event(row['group_id'], 'task.deleted', {'task': task})
+    elif action == 'move_group':
+        publish_group_event(row['group_id'], 'task.deleted', {'task': task})
+        publish_group_event(group_id, 'task.created', {'task': task})
+
+
+def _apply(action, pks, assignee_id, group_id):
+    tasks = Task.objects.filter(pk__in=pks)
+    # update() doesn't touch auto_now fields.
+    now = timezone.now()
+    if action == 'complete':
+        tasks.update(status='completed', updated_at=now)
+    elif action == 'reassign':
+        tasks.update(assignee_id=assignee_id, updated_at=now)
+    elif action == 'move_group':
+        tasks.update(group_id=group_id, updated_at=now)
+    elif action == 'delete':
+        # The caller does what the post_delete receivers would.
+        delete_rows(Task, pks)
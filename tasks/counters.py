@@ -0,0 +1,254 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.utils.timezone import localdate
+
+from users.access import get_current_group_access
+from users.models import Group, Membership
+from .models import Task, TaskCounter, effective_status_for
+
+# Per-status task counts for the task list tabs, without counting over the
+# visibility UNION on every page view.
+#
+# Writes apply +1/-1 deltas to the affected TaskCounter rows (see
+# track_changes()). Rows that don't exist yet are built from a live count
+# the first time they are read, and a row from an earlier day is rolled
+# over on read by moving the tasks that have fallen due since from ongoing to
+# overdue. Anything that changes which groups a user can access drops that
+# user's row instead of adjusting it. `manage.py reconcile_task_counters`
+# rebuilds every row from scratch and reports drift.
+
+BUCKETS = ('ongoing', 'overdue', 'completed')
+
+# The task fields that decide which rows and bucket a task is counted in.
+COUNTED_FIELDS = ('owner_id', 'assignee_id', 'group_id', 'status', 'due_date')
+
+
+def _bucket_aggregates(today):
+    # The same split as TaskQuerySet.ongoing()/overdue()/completed().
+    return {
+        'ongoing': Count('pk', filter=Q(status='ongoing') & (Q(due_date__isnull=True) | Q(due_date__gte=today))),
+        'overdue': Count('pk', filter=Q(status='ongoing', due_date__lt=today)),
+        'completed': Count('pk', filter=Q(status='completed')),
+    }
+
+
+def _bucket_counts(queryset, today):
+    return queryset.order_by().aggregate(**_bucket_aggregates(today))
+
+
+def _accessible_group_ids(user_id):
+    """Subqueries of the groups a user can access, read from the database rather than the GroupAccess cache."""
+    return (Membership.objects.filter(user_id=user_id).values('group_id'),
+            Group.objects.filter(admin_id=user_id).values('id'))
+
+
+def _scope_tasks(scope):
+    """The tasks a counter row counts; scope is ('user', id) or ('group', id)."""
+    kind, pk = scope
+    if kind == 'group':
+        return Task.objects.filter(group_id=pk)
+    member_of, admin_of = _accessible_group_ids(pk)
+    # A saved row is kept and adjusted for good, so it can't be built from
+    # another worker's stale cache entry.
+    return (Task.objects.filter(Q(owner_id=pk) | Q(assignee_id=pk))
+            .exclude(group_id__in=member_of).exclude(group_id__in=admin_of))
+
+
+def _access_pairs(states):
+    """The (user ID, group ID) pairs among the states' owners, assignees and groups that grant access."""
+    users, groups = set(), set()
+    for state in states:
+        if state['group_id'] is not None:
+            users.update({state['owner_id'], state['assignee_id']} - {None})
+            groups.add(state['group_id'])
+    if not users:
+        return set()
+    members = Membership.objects.filter(user_id__in=users, group_id__in=groups).order_by().values_list(
+        'user_id', 'group_id')
+    admins = Group.objects.filter(admin_id__in=users, id__in=groups).order_by().values_list('admin_id', 'id')
+    return set(members.union(admins, all=True))
+
+
+def _scopes(state, access):
+    """The rows a task with these COUNTED_FIELDS values is counted in, given _access_pairs()."""
+    group_id = state['group_id']
+    scopes = [('group', group_id)] if group_id else []
+    for user_id in {state['owner_id'], state['assignee_id']} - {None}:
+        if group_id is None or (user_id, group_id) not in access:
+            scopes.append(('user', user_id))
+    return scopes
+
+
+def task_state(task):
+    return {field: getattr(task, field) for field in COUNTED_FIELDS}
+
+
+def track_changes(changes, today=None):
+    """
+    Apply (before, after) pairs of task states to the counters. before is
+    None for a new task and after is None for a deleted one. Call inside the
+    writing transaction, so the counters roll back with it.
+    """
+    today = today or localdate()
+    # Saves that leave the counted fields as they were change no row.
+    changes = [(before, after) for before, after in changes if before != after]
+    access = _access_pairs(state for change in changes for state in change if state is not None)
+    deltas = defaultdict(Counter)
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is not None:
+                bucket = effective_status_for(state['status'], state['due_date'], today)
+                for scope in _scopes(state, access):
+                    deltas[scope][bucket] += sign
+
+    for (kind, pk), delta in deltas.items():
+        delta = {bucket: count for bucket, count in delta.items() if count}
+        if not delta:
+            continue
+        rows = TaskCounter.objects.filter(**{f'{kind}_id': pk})
+        if not rows.filter(as_of=today).update(**{bucket: F(bucket) + count for bucket, count in delta.items()}):
+            # No row, or one from an earlier day: a delta computed for today
+            # can't be mixed into it, so let the next read rebuild it.
+            rows.delete()
+
+
+def drop_user_counters(*user_ids):
+    """For changes to which groups the users can access."""
+    TaskCounter.objects.filter(user_id__in=[user_id for user_id in user_ids if user_id is not None]).delete()
+
+
+def _build(scope, today):
+    counts = _bucket_counts(_scope_tasks(scope), today)
+    kind, pk = scope
+    try:
+        with transaction.atomic():
+            TaskCounter.objects.create(**{f'{kind}_id': pk}, as_of=today, **counts)
+    except IntegrityError:
+        pass  # built by a concurrent request
+    return counts
+
+
+def _build_groups(group_ids, today):
+    """_build() for many groups' rows: one grouped aggregate and one INSERT."""
+    counts = {group_id: dict.fromkeys(BUCKETS, 0) for group_id in group_ids}
+    rows = (Task.objects.filter(group_id__in=group_ids).order_by().values('group_id')
+            .annotate(**_bucket_aggregates(today)))
+    for row in rows:
+        counts[row['group_id']] = {bucket: row[bucket] for bucket in BUCKETS}
+    # Rows built by a concurrent request are left alone.
+    TaskCounter.objects.bulk_create(
+        [TaskCounter(group_id=group_id, as_of=today, **group_counts) for group_id, group_counts in counts.items()],
+        ignore_conflicts=True,
+    )
+    return counts
+
+
+def _roll_over(row, scope, today):
+    counts = {bucket: getattr(row, bucket) for bucket in BUCKETS}
+    if row.as_of > today:
+        return _bucket_counts(_scope_tasks(scope), today)
+    fallen_due = _scope_tasks(scope).filter(status='ongoing', due_date__gte=row.as_of, due_date__lt=today).count()
+    counts['ongoing'] -= fallen_due
+    counts['overdue'] += fallen_due
+    # Only from the day read, so a concurrent rollover isn't applied twice.
+    TaskCounter.objects.filter(pk=row.pk, as_of=row.as_of).update(
+        ongoing=F('ongoing') - fallen_due, overdue=F('overdue') + fallen_due, as_of=today)
+    return counts
+
+
+def _roll_over_groups(rows, today):
+    """
+    _roll_over() for many groups' rows from earlier days: per day they were
+    computed for (normally just yesterday), one grouped count and one UPDATE.
+    """
+    counts = {}
+    by_day = defaultdict(list)
+    for row in rows:
+        if row.as_of > today:
+            counts[row.group_id] = _bucket_counts(_scope_tasks(('group', row.group_id)), today)
+        else:
+            by_day[row.as_of].append(row)
+    for as_of, day_rows in by_day.items():
+        fallen_due = dict(
+            Task.objects.filter(group_id__in=[row.group_id for row in day_rows], status='ongoing',
+                                due_date__gte=as_of, due_date__lt=today)
+            .order_by().values('group_id').annotate(n=Count('pk')).values_list('group_id', 'n')
+        )
+        for row in day_rows:
+            shift = fallen_due.get(row.group_id, 0)
+            counts[row.group_id] = {'ongoing': row.ongoing - shift, 'overdue': row.overdue + shift,
+                                    'completed': row.completed}
+        shift = Case(*[When(pk=row.pk, then=Value(fallen_due[row.group_id]))
+                       for row in day_rows if row.group_id in fallen_due], default=Value(0))
+        # Only from the day read, so a concurrent rollover isn't applied twice.
+        TaskCounter.objects.filter(pk__in=[row.pk for row in day_rows], as_of=as_of).update(
+            ongoing=F('ongoing') - shift, overdue=F('overdue') + shift, as_of=today)
+    return counts
+
+
+def rebuild_counts(today=None):
+    """
+    {scope: counts} for every row that should exist, computed from scratch
+    with a few aggregate queries rather than one count per user and group.
+    """
+    buckets = _bucket_aggregates(today or localdate())
+    expected = {}
+    for row in Task.objects.filter(group__isnull=False).order_by().values('group_id').annotate(**buckets):
+        expected[('group', row['group_id'])] = {bucket: row[bucket] for bucket in BUCKETS}
+
+    access = set(Membership.objects.values_list('user_id', 'group_id').iterator())
+    access.update(Group.objects.values_list('admin_id', 'id').iterator())
+    by_owner = Task.objects.order_by().values('owner_id', 'group_id').annotate(**buckets)
+    # Tasks assigned to their owner are already counted once for the owner.
+    by_assignee = (Task.objects.filter(assignee__isnull=False).exclude(assignee_id=F('owner_id'))
+                   .order_by().values('assignee_id', 'group_id').annotate(**buckets))
+    for user_field, rows in (('owner_id', by_owner), ('assignee_id', by_assignee)):
+        for row in rows.iterator():
+            if row['group_id'] is not None and (row[user_field], row['group_id']) in access:
+                continue
+            counts = expected.setdefault(('user', row[user_field]), dict.fromkeys(BUCKETS, 0))
+            for bucket in BUCKETS:
+                counts[bucket] += row[bucket]
+    return expected
+
+
+def task_counts(user, today=None):
+    """
+    {'ongoing', 'overdue', 'completed', 'all'} counts of the tasks visible
+    to the user, matching TaskQuerySet.with_status() over visible_to().
+    """
+    today = today or localdate()
+    # From the database, like _scope_tasks(): with another worker's stale
+    # cached access a task would be counted in both or in neither.
+    group_ids = list(get_current_group_access(user).group_ids)
+    rows = {}
+    for row in TaskCounter.objects.filter(Q(user_id=user.pk) | Q(group_id__in=group_ids)):
+        rows[('user', row.user_id) if row.user_id else ('group', row.group_id)] = row
+
+    # The user's own row, then every group row at once, so the number of
+    # queries doesn't grow with the number of groups.
+    user_row = rows.get(('user', user.pk))
+    if user_row is None:
+        scope_counts = [_build(('user', user.pk), today)]
+    elif user_row.as_of != today:
+        scope_counts = [_roll_over(user_row, ('user', user.pk), today)]
+    else:
+        scope_counts = [{bucket: getattr(user_row, bucket) for bucket in BUCKETS}]
+    group_rows = [rows.get(('group', group_id)) for group_id in group_ids]
+    scope_counts += [{bucket: getattr(row, bucket) for bucket in BUCKETS}
+                     for row in group_rows if row is not None and row.as_of == today]
+    stale = [row for row in group_rows if row is not None and row.as_of != today]
+    if stale:
+        scope_counts += _roll_over_groups(stale, today).values()
+    missing = [group_id for group_id, row in zip(group_ids, group_rows) if row is None]
+    if missing:
+        scope_counts += _build_groups(missing, today).values()
+
+    totals = dict.fromkeys(BUCKETS, 0)
+    for counts in scope_counts:
+        for bucket in BUCKETS:
+            totals[bucket] += counts[bucket]
+    totals['all'] = sum(totals[bucket] for bucket in BUCKETS)
+    return totals
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import effective_status_for
+
+# Live group updates: signal handlers (tasks/signals.py) and the bulk paths
+# publish small JSON deltas to a per-group channel, and GroupEventsView streams
+# them to browsers as server-sent events.
+
+# Sent instead of the dropped events when a slow subscriber's queue fills up;
+# the client reloads the page.
+RESYNC = 'resync'
+
+
+class BaseBroker:
+    """
+    Interface for the pub/sub backend. publish() may be called from any
+    thread; subscribe() is called on the event loop serving the stream.
+    InProcessBroker only reaches subscribers in the same process, so a
+    deployment with several server processes needs a broker backed by
+    something shared (e.g. Redis pub/sub) implementing the same two methods.
+    """
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Return a Subscription-like object: `await get(timeout)` and `close()`."""
+        raise NotImplementedError
+
+
+class Subscription:
+    def __init__(self, broker, channel, max_queue):
+        self.broker = broker
+        self.channel = channel
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(max_queue)
+        self._overflowed = False
+
+    def deliver(self, message):
+        # Called from publishing threads; the queue belongs to the loop.
+        self._loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self._overflowed:
+            return
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._overflowed = True
+
+    async def get(self, timeout=None):
+        """The next message, RESYNC after an overflow, or None on timeout."""
+        if self._overflowed and self._queue.empty():
+            self._overflowed = False
+            return RESYNC
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(BaseBroker):
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_queue)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.TASK_EVENTS_BROKER)()
+
+
+def group_channel(group_id):
+    return f"group:{group_id}"
+
+
+def publish_group_event(group_id, event_type, data):
+    """Publish once the surrounding transaction commits, so listeners never see rolled-back changes."""
+    if group_id is None:
+        return
+    message = json.dumps({'type': event_type, **data}, cls=DjangoJSONEncoder)
+    transaction.on_commit(lambda: get_broker().publish(group_channel(group_id), message))
+
+
+def task_delta(task):
+    """The fields a group page shows for a task, without loading deferred fields or related rows."""
+    fields = {name: task.__dict__[name] for name in ('title', 'status', 'due_date', 'assignee_id')
+              if name in task.__dict__}
+    if 'status' in fields and 'due_date' in fields:
+        fields['effective_status'] = effective_status_for(fields['status'], fields['due_date'])
+    return {'id': task.pk, **fields}
@@ -0,0 +1,131 @@
+import threading
+import uuid
+
+from crispy_forms.templatetags.crispy_forms_filters import as_crispy_form
+from crispy_forms.templatetags.crispy_forms_utils import remove_spaces
+from django import forms
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+# Most of a rendered form is the same on every request: the wrappers, labels,
+# help text and CSS classes around each widget. render_form() renders a form
+# once with a marker in place of each widget, keeps the markup between the
+# markers (a "skeleton") per process, and afterwards renders only the widgets,
+# which carry the values and choices.
+#
+# A form with errors is rendered the normal way: errors change the markup
+# around the widgets.
+
+# Style name: (renders the whole form, the change that rendering makes to
+# each widget's HTML). crispy collapses the whitespace between tags.
+FORM_STYLES = {
+    'p': (lambda form: form.as_p(), None),
+    'crispy': (as_crispy_form, remove_spaces),
+}
+
+# Forms whose skeletons warm_up_forms() builds at startup, as (form class,
+# style). Only the keyword-less constructor is used, so it must not query.
+WARM_UP_FORMS = [
+    ('tasks.forms.TaskForm', 'p'),
+    ('tasks.forms.GroupMemberForm', 'crispy'),
+]
+
+# Skeletons are keyed by everything the markup around the widgets depends
+# on, so there are only a few per form; this is a safety net.
+MAX_SKELETONS = 256
+
+_MARKER = f'<!--form-widget-{uuid.uuid4().hex}-->'
+_skeletons = {}
+_lock = threading.Lock()
+
+
+def render_form(form, style):
+    render, widget_filter = FORM_STYLES[style]
+    if (form.is_bound and form.errors) or not _reusable(form):
+        return render(form)
+    key = _skeleton_key(form, style)
+    skeleton = _skeletons.get(key)
+    if skeleton is None:
+        skeleton = _build_skeleton(form, render)
+        if skeleton is None:
+            return render(form)
+        with _lock:
+            if len(_skeletons) >= MAX_SKELETONS:
+                _skeletons.clear()
+            _skeletons[key] = skeleton
+    chunks, widgets = skeleton
+    parts = [chunks[0]]
+    for (name, attrs, only_initial), chunk in zip(widgets, chunks[1:]):
+        # Exactly what the template would have rendered, attributes added
+        # by the template (crispy's CSS classes) included.
+        html = form[name].as_widget(attrs=dict(attrs), only_initial=only_initial)
+        parts.append(widget_filter(html) if widget_filter else html)
+        parts.append(chunk)
+    return mark_safe(''.join(parts))
+
+
+def _reusable(form):
+    for field in form.fields.values():
+        widget = field.widget
+        # Rendered through another widget instance (the hidden initial), or
+        # with values in the template itself (file links, crispy's radio
+        # and checkbox lists).
+        if field.show_hidden_initial or widget.needs_multipart_form or isinstance(widget, forms.RadioSelect):
+            return False
+    return True
+
+
+def _skeleton_key(form, style):
+    # The class by name: ModelForms made by generic views are a new class
+    # on every request.
+    form_class = type(form)
+    fields = tuple(
+        (name, type(field), type(field.widget), field.required, field.disabled, str(field.label),
+         str(field.help_text), tuple(sorted(field.widget.attrs)))
+        for name, field in form.fields.items()
+    )
+    return (f'{form_class.__module__}.{form_class.__qualname__}', style, form.prefix, form.auto_id,
+            form.is_bound, form.use_required_attribute, get_language(), fields)
+
+
+def _build_skeleton(form, render):
+    widgets = []
+
+    def recorder(field_name, widget):
+        attrs_before = dict(widget.attrs)
+
+        # Widget.render()'s signature; `name` is the HTML name.
+        def render_widget(name, value, attrs=None, renderer=None):
+            changed = {key: now for key, now in widget.attrs.items() if attrs_before.get(key) != now}
+            widgets.append((field_name, changed, name == form[field_name].html_initial_name))
+            return mark_safe(_MARKER)
+        return render_widget
+
+    for name, field in form.fields.items():
+        field.widget.render = recorder(name, field.widget)
+    try:
+        html = str(render(form))
+    finally:
+        for field in form.fields.values():
+            del field.widget.render
+    chunks = html.split(_MARKER)
+    # A marker that didn't make it through unchanged can't be filled in.
+    if len(chunks) != len(widgets) + 1:
+        return None
+    return chunks, widgets
+
+
+def warm_up_forms():
+    """Build the skeletons of WARM_UP_FORMS and compile their widget templates, without querying."""
+    for path, style in WARM_UP_FORMS:
+        form = import_string(path)()
+        key = _skeleton_key(form, style)
+        skeleton = _build_skeleton(form, FORM_STYLES[style][0])
+        if skeleton is not None:
+            with _lock:
+                _skeletons[key] = skeleton
+        for field in form.fields.values():
+            for template_name in (field.widget.template_name, getattr(field.widget, 'option_template_name', None)):
+                if template_name:
+                    form.renderer.get_template(template_name)
@@ -1,6 +1,8 @@
 from django import forms
 
-from users.models import Group, Membership
+from users.access import get_current_group_access, get_group_access
+from users.models import Group
+from users.widgets import UserSearchSelect, UserSearchSelectMultiple
 from .models import Task
 from django.contrib.auth import get_user_model
 
@@ -13,7 +15,8 @@ class TaskForm(forms.ModelForm):
         queryset=User.objects.all().order_by('username'), # Default: all users
         required=False,
         empty_label="Unassigned",
-        widget=forms.Select(attrs={'class': 'form-control'})
+        # Only the current assignee is rendered; others are found by typeahead.
+        widget=UserSearchSelect(attrs={'class': 'form-control'})
     )
     group = forms.ModelChoiceField(
         queryset=Group.objects.all().order_by('name'), # Default: all groups
@@ -52,9 +55,10 @@ class TaskForm(forms.ModelForm):
 
         if self.request_user:
             # Filter groups for the current user (admin or member)
-            user_groups_as_member_ids = Membership.objects.filter(user=self.request_user).values_list('group__id', flat=True)
-            user_groups_as_admin_ids = Group.objects.filter(admin=self.request_user).values_list('id', flat=True)
-            allowed_group_ids = list(set(list(user_groups_as_member_ids) + list(user_groups_as_admin_ids)))
+            # A submitted form decides where the task goes: check it against
+            # the database, not this process's cache.
+            access = get_current_group_access if self.is_bound else get_group_access
+            allowed_group_ids = access(self.request_user).group_ids
             self.fields['group'].queryset = Group.objects.filter(id__in=allowed_group_ids).order_by('name')
 
             # If a specific group is provided (e.g., when creating a task from GroupDetailView)
@@ -63,12 +67,16 @@ class TaskForm(forms.ModelForm):
                 self.fields['group'].initial = self.specific_group
                 self.fields['group'].widget.attrs['disabled'] = 'disabled'
                 # Filter assignees to only members of this specific group
-                group_member_ids = Membership.objects.filter(group=self.specific_group).values_list('user__id', flat=True)
-                self.fields['assignee'].queryset = User.objects.filter(id__in=group_member_ids).order_by('username')
-            elif self.instance.pk and self.instance.group: # If editing an existing task with a group
+                self.fields['assignee'].queryset = User.objects.filter(
+                    group_memberships__group=self.specific_group
+                ).order_by('username')
+                self.fields['assignee'].widget.attrs['data-user-search-group'] = str(self.specific_group.pk)
+            elif self.instance.pk and self.instance.group_id: # If editing an existing task with a group
                  # Filter assignees to only members of the task's current group
-                group_member_ids = Membership.objects.filter(group=self.instance.group).values_list('user__id', flat=True)
-                self.fields['assignee'].queryset = User.objects.filter(id__in=group_member_ids).order_by('username')
+                self.fields['assignee'].queryset = User.objects.filter(
+                    group_memberships__group_id=self.instance.group_id
+                ).order_by('username')
+                self.fields['assignee'].widget.attrs['data-user-search-group'] = str(self.instance.group_id)
             else:
                 # For personal tasks or when no group is selected, assignee can be any user (or self)
                 self.fields['assignee'].queryset = User.objects.all().order_by('username')
@@ -77,9 +85,9 @@ class TaskForm(forms.ModelForm):
 class GroupMemberForm(forms.Form):
     members = forms.ModelMultipleChoiceField(
         queryset=User.objects.all().order_by('username'),
-        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+        widget=UserSearchSelectMultiple(attrs={'class': 'form-select', 'size': 10}),
         required=False,
-        help_text="Select members to add/remove from the group."
+        help_text="Search by username, then select or deselect members (Ctrl/Cmd-click to pick several)."
     )
 
     def __init__(self, *args, **kwargs):
@@ -87,9 +95,9 @@ class GroupMemberForm(forms.Form):
         super().__init__(*args, **kwargs)
 
         if self.group:
-            current_members = self.group.members.values_list('user', flat=True)
+            current_members = self.group.members.exclude(user_id=self.group.admin_id).values_list('user', flat=True)
             self.fields['members'].initial = list(current_members)
 
             self.fields['members'].queryset = User.objects.exclude(
-                id=self.group.admin.id  
+                id=self.group.admin_id
             ).order_by('username')
\ No newline at end of file
@@ -0,0 +1,159 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.utils.timezone import get_current_timezone, localdate
+
+from users.access import get_current_group_access
+
+# Rendered fragments of group_detail.html and task_list.html are cached under
+# keys that include a version token. Every write that can change a fragment
+# bumps the matching version (see tasks/signals.py), so old entries are simply
+# never read again and expire on their own.
+#
+# A version is the time.time_ns() of the last bump, so it doubles as a
+# last-modified timestamp for the JSON API's conditional GETs (tasks/api.py).
+
+
+def fragment_cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def _group_key(group_id):
+    return f"tasks:fragment-version:group:{group_id}"
+
+
+def _user_key(user_id):
+    return f"tasks:fragment-version:user:{user_id}"
+
+
+def _groups_key(user_id):
+    return f"tasks:fragment-groups:user:{user_id}"
+
+
+def _versions(keys):
+    cache = fragment_cache()
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # A fresh, never-before-used value, so an evicted counter can't come
+        # back at a number that old fragments were stored under.
+        for key, value in missing.items():
+            if not cache.add(key, value, None):
+                value = cache.get(key, value)
+            versions[key] = value
+    return [versions[key] for key in keys]
+
+
+def _bump(keys):
+    # Concurrent bumps may overwrite each other, but either way the version
+    # ends up at a value that no reader has seen before.
+    if keys:
+        now = time.time_ns()
+        fragment_cache().set_many({key: now for key in keys}, None)
+
+
+def _bump_now_and_on_commit(keys):
+    # Bumping again after commit covers readers that picked up the new
+    # version before the transaction was visible and cached the old rows.
+    _bump(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+async def afragment_cached(fragment_name, *vary_on):
+    """
+    Whether `{% cache ... fragment_name *vary_on %}` has a stored render, so an
+    async view can skip loading rows the template won't read. vary_on must be
+    the values the template tag resolves, in the same order.
+    """
+    return await fragment_cache().ahas_key(make_template_fragment_key(fragment_name, vary_on))
+
+
+def invalidate_groups(*group_ids):
+    _bump_now_and_on_commit([_group_key(group_id) for group_id in set(group_ids) if group_id is not None])
+
+
+def invalidate_users(*user_ids):
+    _bump_now_and_on_commit([_user_key(user_id) for user_id in set(user_ids) if user_id is not None])
+
+
+def invalidate_memberships(*user_ids):
+    """For users who joined or left a group, or became or stopped being its admin."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    keys = [_groups_key(user_id) for user_id in user_ids]
+    fragment_cache().delete_many(keys)
+    transaction.on_commit(lambda: fragment_cache().delete_many(keys))
+    invalidate_users(*user_ids)
+
+
+def _changed_at(versions):
+    return datetime.fromtimestamp(max(versions, default=0) / 1e9, tz=timezone.utc)
+
+
+def _last_modified(versions):
+    # Effective status changes at midnight without any write.
+    today = datetime.combine(localdate(), datetime.min.time(), tzinfo=get_current_timezone())
+    return max(_changed_at(versions), today)
+
+
+def _group_ids(user):
+    # Kept in the shared fragments cache rather than taken from the per-process
+    # group access cache, so a membership change made in one worker changes
+    # the versions every worker computes.
+    key = _groups_key(user.pk)
+    group_ids = fragment_cache().get(key)
+    if group_ids is None:
+        group_ids = sorted(str(group_id) for group_id in get_current_group_access(user).group_ids)
+        fragment_cache().set(key, group_ids, settings.FRAGMENT_CACHE_TIMEOUT)
+    return group_ids
+
+
+def _group_list_keys(user):
+    group_ids = _group_ids(user)
+    return group_ids, [_group_key(group_id) for group_id in group_ids]
+
+
+def _task_list_keys(user):
+    group_ids, keys = _group_list_keys(user)
+    return group_ids, [_user_key(user.pk)] + keys
+
+
+def group_fragment_version(group_id):
+    # Effective status depends on the date, so it is part of every version.
+    return f"{_versions([_group_key(group_id)])[0]}:{localdate().isoformat()}"
+
+
+def group_last_modified(group_id):
+    return _last_modified(_versions([_group_key(group_id)]))
+
+
+def task_last_modified(updated_at, group_id=None):
+    # A group task also shows the group's name, so group changes count too.
+    versions = _versions([_group_key(group_id)]) if group_id else []
+    return max(updated_at, _last_modified(versions))
+
+
+def task_list_fragment_version(user):
+    """A user's list shows their own tasks plus tasks of all their groups."""
+    group_ids, keys = _task_list_keys(user)
+    parts = [str(version) for version in _versions(keys)] + group_ids + [localdate().isoformat()]
+    return hashlib.md5(':'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def task_list_last_modified(user):
+    return _last_modified(_versions(_task_list_keys(user)[1]))
+
+
+def group_list_version(user):
+    """Covers every group the user can see."""
+    group_ids, keys = _group_list_keys(user)
+    parts = [str(version) for version in _versions(keys)] + group_ids
+    return hashlib.md5(':'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def group_list_last_modified(user):
+    return _changed_at(_versions(_group_list_keys(user)[1]))
@@ -0,0 +1,210 @@
+import csv
+import io
+import json
+import uuid
+from collections import Counter
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.utils import timezone
+
+from users.models import Group, Membership
+from .activity import record
+from .counters import task_state, track_changes
+from .events import RESYNC, publish_group_event
+from .fragments import invalidate_groups, invalidate_users
+from .models import Task
+
+User = get_user_model()
+
+# Rows accepted per INSERT/COPY, each in its own transaction.
+IMPORT_BATCH_SIZE = 5000
+
+TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+
+# Database columns written for each task, in COPY order.
+COPY_COLUMNS = ('id', 'title', 'description', 'owner_id', 'assignee_id', 'group_id',
+                'status', 'due_date', 'created_at', 'updated_at')
+
+
+class RejectedRow(Exception):
+    pass
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        # Unparseable lines are passed through so they end up in the rejects file.
+        yield row if isinstance(row, dict) else {'line': line.rstrip('\n')}
+
+
+IMPORT_READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+class TaskImporter:
+    """
+    Bulk task import from the columns written by tasks/export.py: title,
+    description, status, due_date, owner, assignee and group. Owner and
+    assignee are usernames; group is a group name or ID.
+    id, created_at and updated_at are ignored, so every row becomes a new task.
+
+    Users, groups and memberships are loaded into dictionaries once up front,
+    so resolving a row costs no queries.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, use_copy=None, using='default'):
+        self.batch_size = batch_size
+        self.using = using
+        connection = connections[using]
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        self.use_copy = use_copy
+        self.imported = 0
+        self.rejected = 0
+        self._touched_users = set()
+        self._touched_groups = set()
+        self._load_lookups()
+
+    def _load_lookups(self):
+        self.user_ids = dict(User.objects.using(self.using).values_list('username', 'id').iterator())
+        self.group_ids_by_name = dict(Group.objects.using(self.using).values_list('name', 'id').iterator())
+        self.group_ids = {str(group_id): group_id for group_id in self.group_ids_by_name.values()}
+        self.memberships = set(Membership.objects.using(self.using).values_list('group_id', 'user_id').iterator())
+
+    def _resolve_group(self, value):
+        if value in self.group_ids_by_name:
+            return self.group_ids_by_name[value]
+        try:
+            group_id = self.group_ids.get(str(uuid.UUID(value)))
+        except ValueError:
+            group_id = None
+        if group_id is None:
+            raise RejectedRow(f"unknown group {value!r}")
+        return group_id
+
+    def build_task(self, row, now):
+        """Validate one input row and return a Task, or raise RejectedRow."""
+        if 'line' in row and len(row) == 1:
+            raise RejectedRow("not a JSON object")
+
+        def field(name):
+            value = row.get(name)
+            return str(value).strip() if value is not None else ''
+
+        title = field('title')
+        if not title:
+            raise RejectedRow("title is required")
+        if len(title) > TITLE_MAX_LENGTH:
+            raise RejectedRow(f"title is longer than {TITLE_MAX_LENGTH} characters")
+
+        owner_id = self.user_ids.get(field('owner'))
+        if owner_id is None:
+            raise RejectedRow(f"unknown owner {field('owner')!r}")
+
+        assignee_id = None
+        if field('assignee'):
+            assignee_id = self.user_ids.get(field('assignee'))
+            if assignee_id is None:
+                raise RejectedRow(f"unknown assignee {field('assignee')!r}")
+
+        group_id = self._resolve_group(field('group')) if field('group') else None
+        if group_id is not None and assignee_id is not None and (group_id, assignee_id) not in self.memberships:
+            # Same rule as TaskForm: group tasks go to group members.
+            raise RejectedRow("assignee is not a member of the group")
+
+        # Overdue is derived from due_date at query time (see TaskQuerySet),
+        # so an exported 'overdue' row is stored as ongoing.
+        status = field('status').lower() or 'ongoing'
+        if status == 'overdue':
+            status = 'ongoing'
+        if status not in ('ongoing', 'completed'):
+            raise RejectedRow(f"unknown status {status!r}")
+
+        due_date = None
+        if field('due_date'):
+            try:
+                due_date = date.fromisoformat(field('due_date')[:10])
+            except ValueError:
+                raise RejectedRow(f"invalid due_date {field('due_date')!r}")
+
+        return Task(
+            id=uuid.uuid4(), title=title, description=field('description') or None,
+            owner_id=owner_id, assignee_id=assignee_id, group_id=group_id,
+            status=status, due_date=due_date, created_at=now, updated_at=now,
+        )
+
+    def run(self, rows, on_reject=None):
+        """Import an iterable of dict rows; on_reject(row, reason) sees each rejected row."""
+        batch = []
+        for row in rows:
+            if not batch:
+                now = timezone.now()
+            try:
+                batch.append(self.build_task(row, now))
+            except RejectedRow as error:
+                self.rejected += 1
+                if on_reject:
+                    on_reject(row, str(error))
+                continue
+            if len(batch) >= self.batch_size:
+                self._insert(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+        # bulk_create and COPY skip post_save, so refresh the cached
+        # fragments of everyone who can now see the new tasks (the counters
+        # are updated per batch in _insert()).
+        invalidate_users(*self._touched_users)
+        invalidate_groups(*self._touched_groups)
+        # One reload hint per group rather than an event per imported row.
+        for group_id in self._touched_groups:
+            publish_group_event(group_id, RESYNC, {})
+
+    def _insert(self, tasks):
+        with transaction.atomic(using=self.using):
+            if self.use_copy:
+                self._copy(tasks)
+            else:
+                Task.objects.using(self.using).bulk_create(tasks, batch_size=self.batch_size)
+            track_changes([(None, task_state(task)) for task in tasks])
+            # One activity event per group and batch rather than one per task.
+            for group_id, count in Counter(task.group_id for task in tasks).items():
+                record('tasks.imported', group_id, data={'count': count})
+        self.imported += len(tasks)
+        for task in tasks:
+            self._touched_users.update((task.owner_id, task.assignee_id))
+            self._touched_groups.add(task.group_id)
+
+    def _copy(self, tasks):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for task in tasks:
+            writer.writerow(['' if value is None else value
+                             for value in (getattr(task, column) for column in COPY_COLUMNS)])
+        buffer.seek(0)
+        # In CSV format an unquoted empty field is NULL, and csv.writer never
+        # quotes one; build_task() already turned blank strings into None.
+        columns = ', '.join(COPY_COLUMNS)
+        sql = f'COPY {Task._meta.db_table} ({columns}) FROM STDIN WITH (FORMAT csv)'
+        # Only imported on Postgres: it needs psycopg 3 or psycopg2.
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        with connections[self.using].cursor() as cursor:
+            if is_psycopg3:
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+            else:
+                cursor.copy_expert(sql, buffer)
@@ -0,0 +1,89 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.forms import modelform_factory
+from django.template import Engine, engines
+from django.template.backends.django import Template
+from django.test import RequestFactory
+
+from tasks.form_rendering import FORM_STYLES, render_form
+from tasks.forms import GroupMemberForm, TaskForm
+from users.models import Group
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Micro-benchmark form and page rendering: each form rendered in full vs. from its cached "
+            "skeleton (tasks/form_rendering.py), and the form pages through uncached vs. cached template "
+            "loaders. Fails if a skeleton render differs from the full render.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=300)
+        parser.add_argument('--group', help="Name of the group to render forms for (default: the largest).")
+
+    def handle(self, *args, **options):
+        groups = Group.objects.select_related('admin')
+        if options['group']:
+            group = groups.filter(name=options['group']).first()
+        else:
+            group = groups.annotate(n=Count('members')).order_by('-n').first()
+        if group is None:
+            raise CommandError("No group to render forms for; run seed_tasks first.")
+        user = group.admin
+        self.iterations = options['iterations']
+
+        group_form = modelform_factory(Group, fields=['name'])
+        cases = [
+            ('task_form', 'p', lambda: TaskForm(request_user=user)),
+            ('task_form_in_group', 'p', lambda: TaskForm(request_user=user, specific_group=group)),
+            ('group_member_form', 'crispy', lambda: GroupMemberForm(group=group)),
+            ('group_form', 'crispy', lambda: group_form(instance=group)),
+        ]
+        self.stdout.write(f"Forms for {group.name} ({user.username}), µs per render (form construction "
+                          f"included), median of {self.iterations}:")
+        self.stdout.write(f"  {'form':20} {'style':7} {'full':>8} {'skeleton':>9} {'saved':>6}")
+        for name, style, make_form in cases:
+            render = FORM_STYLES[style][0]
+            if str(render_form(make_form(), style)) != str(render(make_form())):
+                raise CommandError(f"{name}: the skeleton render differs from the full render.")
+            full = self.time(lambda: render(make_form()))
+            cached = self.time(lambda: render_form(make_form(), style))
+            self.stdout.write(f"  {name:20} {style:7} {full:8.0f} {cached:9.0f} {1 - cached / full:6.0%}")
+
+        request = RequestFactory().get('/')
+        request.user = user
+        pages = [
+            ('tasks/task_form.html', {'form': TaskForm(request_user=user), 'page_title': 'Create New Task'}),
+            ('groups/group_member_manage.html', {'form': GroupMemberForm(group=group), 'group': group,
+                                                 'page_title': 'Manage Members'}),
+        ]
+        backend = engines['django']
+        cached_engine = backend.engine
+        # The same engine, with the loaders the cached loader wraps.
+        uncached_engine = Engine(
+            dirs=cached_engine.dirs, context_processors=cached_engine.context_processors,
+            debug=cached_engine.debug, loaders=cached_engine.loaders[0][1], libraries=cached_engine.libraries,
+            builtins=cached_engine.builtins[len(Engine.default_builtins):],
+        )
+        self.stdout.write("Pages, µs per render:")
+        self.stdout.write(f"  {'template':32} {'uncached':>9} {'cached':>8} {'saved':>6}")
+        for template_name, context in pages:
+            times = []
+            for engine in (uncached_engine, cached_engine):
+                times.append(self.time(
+                    lambda: Template(engine.get_template(template_name), backend).render(context, request)
+                ))
+            self.stdout.write(f"  {template_name:32} {times[0]:9.0f} {times[1]:8.0f} {1 - times[1] / times[0]:6.0%}")
+
+    def time(self, render):
+        render()
+        samples = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            render()
+            samples.append((time.perf_counter() - start) * 1e6)
+        return statistics.median(samples)
@@ -0,0 +1,55 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+
+from tasks.models import Task
+from tasks.pagination import CursorPaginator
+from tasks.search import search_terms
+from tasks.views import TaskListView
+from .bench_task_list import percentile
+
+User = get_user_model()
+
+
+def icontains(queryset, query):
+    # The scan the search index replaces.
+    for term in search_terms(query):
+        queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+    return queryset
+
+
+class Command(BaseCommand):
+    help = "Compare the first task list page of a search through the index against an icontains scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=['report', 'task 42', 'zzz'])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--status', default='all')
+        parser.add_argument('--username', help="User to search as (default: the user with the most tasks).")
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            top = Task.objects.values('owner').annotate(n=Count('pk')).order_by('-n').first()
+            user = User.objects.filter(pk=top['owner']).first() if top else None
+        if user is None:
+            raise CommandError("No user to benchmark with; run seed_tasks first or pass --username.")
+
+        visible = Task.objects.with_status(options['status']).visible_to(user)
+        self.stdout.write(f"search (status={options['status']}, user={user.username}, "
+                          f"{Task.objects.count()} tasks, {options['repeat']} runs)")
+        for query in options['queries']:
+            for name, queryset in (('index', visible.search(query)), ('icontains', icontains(visible, query))):
+                paginator = CursorPaginator(queryset.for_listing(), TaskListView.cursor_ordering,
+                                            TaskListView.paginate_by)
+                samples = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    rows = list(paginator.page())
+                    samples.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f"  {query!r:12} {name:9} {len(rows):3} rows  "
+                                  f"p50 {percentile(samples, 50):8.1f} ms  mean {statistics.mean(samples):8.1f} ms")
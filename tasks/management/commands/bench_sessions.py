@@ -0,0 +1,79 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tasks.models import Task
+
+User = get_user_model()
+
+# (session backend, message storage), as in settings.SESSION_ENGINES and
+# settings.MESSAGE_STORAGES.
+CONFIGURATIONS = [
+    ('db', 'session'),
+    ('db', 'fallback'),
+    ('cached_db', 'fallback'),
+    ('signed_cookies', 'cookie'),
+]
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = ("Count database reads and writes per task-complete round trip (the POST and the redirected "
+            "task list) for each session and message storage.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--round-trips', type=int, default=50)
+        parser.add_argument('--username', help="User to log in as (default: the user with the most tasks).")
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            top = Task.objects.values('owner').annotate(n=Count('pk')).order_by('-n').first()
+            user = User.objects.filter(pk=top['owner']).first() if top else None
+        if user is None:
+            raise CommandError("No user to benchmark with; run seed_tasks first or pass --username.")
+
+        session_table = Session._meta.db_table
+        self.stdout.write(f"{options['round_trips']} task-complete round trips as {user.username}, per round trip:")
+        self.stdout.write(f"  {'session':15} {'messages':9} {'queries':>8} {'writes':>7} "
+                          f"{'session reads':>14} {'session writes':>15} {'p50 ms':>7}")
+        for backend, storage in CONFIGURATIONS:
+            with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[backend],
+                                   MESSAGE_STORAGE=settings.MESSAGE_STORAGES[storage]):
+                client = Client()
+                client.force_login(user)
+                client.get(reverse('task_list'))  # warm the caches
+                samples = []
+                # Rolled back, so every configuration completes the same tasks.
+                with transaction.atomic():
+                    tasks = [Task.objects.create(title='bench task', owner=user).pk
+                             for _ in range(options['round_trips'])]
+                    with CaptureQueriesContext(connection) as queries:
+                        for pk in tasks:
+                            start = time.perf_counter()
+                            response = client.post(reverse('task_complete', args=[pk]), follow=True)
+                            samples.append((time.perf_counter() - start) * 1000)
+                            if response.status_code != 200 or b'Task marked as completed.' not in response.content:
+                                raise CommandError(f"{backend}/{storage}: the round trip didn't show its message.")
+                    transaction.set_rollback(True)
+
+            statements = [query['sql'] for query in queries]
+            writes = [sql for sql in statements if sql.startswith(WRITES)]
+            per_trip = len(tasks)
+            self.stdout.write(
+                f"  {backend:15} {storage:9} {len(statements) / per_trip:8.1f} {len(writes) / per_trip:7.1f} "
+                f"{sum(sql.startswith('SELECT') and session_table in sql for sql in statements) / per_trip:14.1f} "
+                f"{sum(session_table in sql for sql in writes) / per_trip:15.1f} "
+                f"{statistics.median(samples):7.1f}"
+            )
@@ -0,0 +1,73 @@
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = ("Time from launching a server command (by default start.sh) to its first response, "
+            "e.g. before and after `manage.py release`, or with and without GUNICORN_PRELOAD.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--command', default='bash start.sh',
+                            help="Shell command starting the server on $PORT.")
+        parser.add_argument('--path', help="Path to request (default: the login page).")
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--timeout', type=float, default=120, help="Seconds to wait for each start.")
+
+    def handle(self, *args, **options):
+        path = options['path'] or reverse('login')
+        samples, firsts = [], []
+        for run in range(options['runs']):
+            elapsed, first = self.start(options['command'], path, options['timeout'])
+            samples.append(elapsed)
+            firsts.append(first)
+            self.stdout.write(f"  run {run + 1}: first response after {elapsed * 1000:.0f} ms, "
+                              f"which took {first * 1000:.0f} ms")
+        self.stdout.write(f"{options['command']}: median {statistics.median(samples) * 1000:.0f} ms to the "
+                          f"first response, which took {statistics.median(firsts) * 1000:.0f} ms "
+                          f"({len(samples)} run(s))")
+
+    def start(self, command, path, timeout):
+        """Seconds to the first response, and how long that request took once connected."""
+        port = free_port()
+        started = time.perf_counter()
+        # Its own process group, so the server's workers are stopped with it.
+        server = subprocess.Popen(command, shell=True, env=dict(os.environ, PORT=str(port)),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise CommandError(f"{command!r} exited with status {server.returncode} before responding.")
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+                try:
+                    connection.connect()
+                    sent = time.perf_counter()
+                    connection.request('GET', path)
+                    if connection.getresponse().status < 500:
+                        now = time.perf_counter()
+                        return now - started, now - sent
+                except OSError:
+                    pass
+                finally:
+                    connection.close()
+                time.sleep(0.01)
+            raise CommandError(f"{command!r} didn't respond within {timeout:.0f} s.")
+        finally:
+            try:
+                os.killpg(server.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            server.wait()
@@ -0,0 +1,72 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from tasks.models import Task
+from tasks.pagination import CursorPaginator
+from tasks.views import TaskListView
+
+User = get_user_model()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = "Measure TaskListView latency (p50/p95/p99) through the test client."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--status', default='ongoing', help="status_filter passed to the list view.")
+        parser.add_argument('--page', type=int, default=1,
+                            help="Follow next-page cursors to this page before measuring.")
+        parser.add_argument('--username', help="User to log in as (default: the user with the most tasks).")
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            top = (Task.objects.values('owner').annotate(n=Count('pk')).order_by('-n').first())
+            user = User.objects.filter(pk=top['owner']).first() if top else None
+        if user is None:
+            raise CommandError("No user to benchmark with; run seed_tasks first or pass --username.")
+
+        client = Client()
+        client.force_login(user)
+        url = f"{reverse('task_list')}?status={options['status']}"
+        if options['page'] > 1:
+            queryset = Task.objects.with_status(options['status']).visible_to(user)
+            paginator = CursorPaginator(queryset, TaskListView.cursor_ordering, TaskListView.paginate_by)
+            page = paginator.page()
+            for number in range(1, options['page']):
+                if not page.has_next():
+                    raise CommandError(f"Only {number} page(s) available.")
+                cursor = page.next_cursor
+                page = paginator.page(cursor)
+            url = f"{url}&cursor={cursor}"
+
+        samples = []
+        for i in range(options['warmup'] + options['requests']):
+            start = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned {response.status_code}")
+            if i >= options['warmup']:
+                samples.append(elapsed)
+
+        self.stdout.write(f"task_list (status={options['status']}, page={options['page']}, user={user.username}, "
+                          f"{Task.objects.count()} tasks, {len(samples)} requests)")
+        self.stdout.write(f"  p50 {percentile(samples, 50):.1f} ms")
+        self.stdout.write(f"  p95 {percentile(samples, 95):.1f} ms")
+        self.stdout.write(f"  p99 {percentile(samples, 99):.1f} ms")
+        self.stdout.write(f"  mean {statistics.mean(samples):.1f} ms")
@@ -0,0 +1,190 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from tasks.models import Task
+from users.models import Group, Membership
+from .bench_task_list import percentile
+
+User = get_user_model()
+
+# seed_tasks options for each --scale; every scale gets its own name prefix.
+SCALES = {
+    '10k': {'users': 1000, 'groups': 100, 'members_per_group': 20, 'tasks': 10_000},
+    '100k': {'users': 10_000, 'groups': 1000, 'members_per_group': 20, 'tasks': 100_000},
+    '1M': {'users': 50_000, 'groups': 5000, 'members_per_group': 20, 'tasks': 1_000_000},
+}
+
+STATUS_FILTERS = ('ongoing', 'overdue', 'completed', 'all')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the task list, group detail, task create, task complete and member management views "
+            "through the test client against a seeded dataset, and write p50/p95/p99 latency and query "
+            "counts as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='10k',
+                            help="Dataset size; seeded with seed_tasks first if this database doesn't have it.")
+        parser.add_argument('--requests', type=int, default=100, help="Measured requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--cold', action='store_true', help="Clear the caches before every request.")
+        parser.add_argument('--output', help="Write the JSON results here instead of to stdout.")
+        parser.add_argument('--compare', help="A previous results file to print the differences against.")
+
+    def handle(self, *args, **options):
+        prefix = f"bench_{options['scale'].lower()}"
+        if not User.objects.filter(username=f"{prefix}_user_0").exists():
+            self.stderr.write(f"Seeding the {options['scale']} dataset...")
+            call_command('seed_tasks', prefix=prefix, stdout=self.stderr, **SCALES[options['scale']])
+
+        # The admin of the group with the most tasks: the heaviest task list
+        # and group detail page in the dataset.
+        group = (Group.objects.filter(name__startswith=f"{prefix}_group_").annotate(n=Count('tasks'))
+                 .order_by('-n').select_related('admin').first())
+        if group is None:
+            raise CommandError(f"No {prefix} groups; the dataset is incomplete.")
+        self.user = group.admin
+        self.group = group
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.options = options
+
+        scenarios = {}
+        for status in STATUS_FILTERS:
+            scenarios[f'task_list_{status}'] = self.measure('GET', f"{reverse('task_list')}?status={status}")
+        scenarios['group_detail'] = self.measure('GET', reverse('group_detail', args=[group.pk]))
+        scenarios['task_create'] = self.bench_task_create()
+        scenarios['task_complete'] = self.bench_task_complete()
+        scenarios['group_member_manage'] = self.bench_member_manage()
+
+        results = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'scale': options['scale'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': {
+                'users': User.objects.filter(username__startswith=f"{prefix}_user_").count(),
+                'groups': Group.objects.filter(name__startswith=f"{prefix}_group_").count(),
+                'memberships': Membership.objects.filter(group__name__startswith=f"{prefix}_group_").count(),
+                'tasks': Task.objects.filter(owner__username__startswith=f"{prefix}_user_").count(),
+            },
+            'user': self.user.username,
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'cold_caches': options['cold'],
+            'scenarios': scenarios,
+        }
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), results)
+
+    def measure(self, method, path, data=None):
+        """
+        Time one request per call of data(i) (or the same request each time)
+        and return the latency percentiles and query counts.
+        """
+        samples, queries = [], []
+        for i in range(self.options['warmup'] + self.options['requests']):
+            if self.options['cold']:
+                for backend in caches.all():
+                    backend.clear()
+            payload = data(i) if callable(data) else data
+            request_path = path(i) if callable(path) else path
+            start = time.perf_counter()
+            if method == 'POST':
+                response = self.client.post(request_path, payload)
+            else:
+                response = self.client.get(request_path)
+            elapsed = (time.perf_counter() - start) * 1000
+            # A POST that doesn't redirect re-rendered its form with errors.
+            if response.status_code != (302 if method == 'POST' else 200):
+                raise CommandError(f"{method} {request_path} returned {response.status_code}")
+            if i >= self.options['warmup']:
+                samples.append(elapsed)
+                queries.append(response.request_metrics.queries)
+        return {
+            'method': method,
+            'path': path if isinstance(path, str) else path(0),
+            'p50_ms': round(percentile(samples, 50), 2),
+            'p95_ms': round(percentile(samples, 95), 2),
+            'p99_ms': round(percentile(samples, 99), 2),
+            'mean_ms': round(statistics.mean(samples), 2),
+            'queries': {'min': min(queries), 'median': statistics.median(queries), 'max': max(queries)},
+        }
+
+    @contextmanager
+    def rolled_back(self):
+        # Writes are undone so every run starts from the same dataset. Work
+        # deferred to on_commit (event publishing) doesn't run.
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+
+    def bench_task_create(self):
+        with self.rolled_back():
+            return self.measure('POST', reverse('task_create'), lambda i: {
+                'title': f"bench task {i}", 'description': '', 'due_date': '', 'assignee': '',
+                'group': str(self.group.pk), 'status': 'ongoing',
+            })
+
+    def bench_task_complete(self):
+        count = self.options['warmup'] + self.options['requests']
+        with self.rolled_back():
+            tasks = list(Task.objects.filter(group=self.group, status='ongoing').values_list('pk', flat=True)[:count])
+            while len(tasks) < count:
+                tasks.append(Task.objects.create(title='bench task', owner=self.user, group=self.group).pk)
+            return self.measure('POST', lambda i: reverse('task_complete', args=[tasks[i]]))
+
+    def bench_member_manage(self):
+        members = [str(user_id) for user_id in
+                   self.group.members.exclude(user_id=self.group.admin_id).values_list('user_id', flat=True)]
+        outsider = (User.objects.exclude(group_memberships__group=self.group).exclude(pk=self.group.admin_id)
+                    .values_list('pk', flat=True).first())
+        if outsider is None:
+            raise CommandError("Every user is already in the group.")
+        # Alternately add one member and remove them again.
+        with self.rolled_back():
+            return self.measure('POST', reverse('group_members_manage', args=[self.group.pk]),
+                                lambda i: {'members': members + [str(outsider)] if i % 2 == 0 else members})
+
+    def compare(self, before, after):
+        self.stderr.write(f"{'scenario':24} {'p50 ms':>18} {'p95 ms':>18} {'queries':>10}")
+        for name, now in after['scenarios'].items():
+            then = before.get('scenarios', {}).get(name)
+            if then is None:
+                continue
+            self.stderr.write(
+                f"{name:24} {then['p50_ms']:8.1f} -> {now['p50_ms']:6.1f} {then['p95_ms']:8.1f} -> "
+                f"{now['p95_ms']:6.1f} {then['queries']['median']:4g} -> {now['queries']['median']:g}"
+            )
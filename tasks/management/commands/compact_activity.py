@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tasks.models import ActivityEvent
+
+
+class Command(BaseCommand):
+    help = ("Delete activity log events older than the retention period (ACTIVITY_LOG_RETENTION_DAYS), "
+            "oldest first and in batches; run it from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Keep this many days of events instead.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help="Seconds to pause between batches, to leave room for other writers.")
+
+    def handle(self, *args, **options):
+        days = settings.ACTIVITY_LOG_RETENTION_DAYS if options['days'] is None else options['days']
+        if days < 1:
+            raise CommandError("--days must be at least 1.")
+        cutoff = timezone.now() - timedelta(days=days)
+        events = ActivityEvent.objects
+        deleted = 0
+        while True:
+            # Events are written roughly in time order, so the expired ones
+            # are at the start of the primary key: read the oldest batch and
+            # stop at the first event to keep. No index on created_at needed.
+            rows = list(events.order_by('id').values_list('id', 'created_at')[:options['batch_size']])
+            expired = [pk for pk, created_at in rows if created_at < cutoff]
+            if expired:
+                # No signal receivers or dependent rows: a single DELETE.
+                deleted += events.filter(id__in=expired).delete()[0]
+            if len(expired) < options['batch_size']:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} activity events older than {days} days."))
@@ -0,0 +1,72 @@
+import resource
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_queryset, iter_rows
+from users.models import Group
+
+User = get_user_model()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+class Command(BaseCommand):
+    help = "Stream the tasks visible to a user, or every task in a group, as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--username', help="Export the tasks this user can see.")
+        target.add_argument('--group', help="Export every task in the group with this ID.")
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', default='-', help="File to write to (default: stdout).")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help="Rows fetched per round trip from the database cursor.")
+        parser.add_argument('--stats', action='store_true',
+                            help="Report rows, rows/second and peak RSS on stderr when done.")
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['username']!r}.")
+            queryset = export_queryset(user=user)
+        else:
+            try:
+                group = Group.objects.filter(pk=options['group']).first()
+            except ValidationError:
+                group = None
+            if group is None:
+                raise CommandError(f"No group with ID {options['group']!r}.")
+            queryset = export_queryset(group=group)
+
+        rows = 0
+
+        def counted(source):
+            nonlocal rows
+            for row in source:
+                rows += 1
+                yield row
+
+        _, lines = EXPORT_FORMATS[options['format']]
+        start = time.perf_counter()
+        chunks = lines(counted(iter_rows(queryset, options['chunk_size'])))
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+        else:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+                for chunk in chunks:
+                    out.write(chunk)
+        elapsed = time.perf_counter() - start
+
+        if options['stats']:
+            self.stderr.write(f"{rows} rows in {elapsed:.2f} s ({rows / elapsed if elapsed else 0:.0f} rows/s), "
+                              f"peak RSS {peak_rss_mb():.1f} MB")
@@ -0,0 +1,81 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.importer import IMPORT_BATCH_SIZE, IMPORT_READERS, TaskImporter
+
+
+class Command(BaseCommand):
+    help = "Import tasks from a CSV or NDJSON file (the export_tasks format), in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for stdin.")
+        parser.add_argument('--format', choices=sorted(IMPORT_READERS),
+                            help="Input format (default: from the file extension, else csv).")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--rejects', help="Where to write rejected rows with the reason "
+                                              "(default: <path>.rejects.<format>).")
+        parser.add_argument('--no-copy', action='store_true',
+                            help="Use bulk_create even on Postgres instead of COPY.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        export_format = options['format']
+        if export_format is None:
+            extension = os.path.splitext(path)[1].lstrip('.').lower()
+            export_format = extension if extension in IMPORT_READERS else 'csv'
+        rejects_path = options['rejects'] or (f"{path}.rejects.{export_format}" if path != '-' else None)
+        if rejects_path is None:
+            raise CommandError("Pass --rejects when reading from stdin.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        importer = TaskImporter(batch_size=options['batch_size'], use_copy=False if options['no_copy'] else None)
+        try:
+            source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as error:
+            raise CommandError(f"Can't read {path}: {error.strerror}.")
+        start = time.perf_counter()
+        try:
+            try:
+                rejects = open(rejects_path, 'w', newline='', encoding='utf-8')
+            except OSError as error:
+                raise CommandError(f"Can't write {rejects_path}: {error.strerror}.")
+            with rejects:
+                importer.run(IMPORT_READERS[export_format](source), on_reject=self._reject_writer(export_format, rejects))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        elapsed = time.perf_counter() - start
+
+        total = importer.imported + importer.rejected
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.imported} of {total} rows in {elapsed:.2f} s "
+            f"({total / elapsed if elapsed else 0:.0f} rows/s, {'COPY' if importer.use_copy else 'bulk_create'})."
+        ))
+        if importer.rejected:
+            self.stdout.write(self.style.WARNING(f"{importer.rejected} rejected row(s) written to {rejects_path}."))
+        else:
+            os.remove(rejects_path)
+
+    def _reject_writer(self, export_format, stream):
+        if export_format == 'ndjson':
+            def write(row, reason):
+                stream.write(json.dumps({**row, 'error': reason}) + '\n')
+            return write
+
+        writer = None
+
+        def write(row, reason):
+            nonlocal writer
+            if writer is None:
+                # The header comes from the first rejected row; DictReader gives
+                # every row the input file's columns.
+                writer = csv.DictWriter(stream, fieldnames=[*row, 'error'], extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow({**row, 'error': reason})
+        return write
@@ -0,0 +1,157 @@
+import http.client
+import statistics
+import threading
+import time
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+
+from tasks.models import Task
+from users.models import Group
+from .bench_task_list import percentile
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Load-test the task list, group list and group detail pages of a running server "
+            "(e.g. gunicorn vs. uvicorn with ASYNC_VIEWS=1 at the same worker count, or with "
+            "DB_CONN_MAX_AGE=0, the default persistent connections and DB_POOL=1).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Base URL of the server under test.")
+        parser.add_argument('--concurrency', type=int, default=16, help="Clients sending requests in parallel.")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds to run, after the warmup.")
+        parser.add_argument('--warmup', type=float, default=2)
+        parser.add_argument('--username', help="User to log in as (default: the user with the most tasks).")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Path to request; repeatable (default: the three read-heavy pages).")
+        parser.add_argument('--metrics-token',
+                            help="The server's METRICS_TOKEN; reports database connections set up and pool "
+                                 "waits from /metrics. Each scrape reaches one worker, so run the server "
+                                 "with a single worker for exact counts.")
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            top = Task.objects.values('owner').annotate(n=Count('pk')).order_by('-n').first()
+            user = User.objects.filter(pk=top['owner']).first() if top else None
+        if user is None:
+            raise CommandError("No user to test with; run seed_tasks first or pass --username.")
+
+        paths = options['paths']
+        if not paths:
+            paths = [reverse('task_list'), reverse('group_list')]
+            group = Group.objects.visible_to(user).order_by('name').first()
+            if group is not None:
+                paths.append(reverse('group_detail', args=[group.pk]))
+
+        session = self.login(user)
+        try:
+            before = self.scrape(options)
+            results = self.run(options, paths, f"{settings.SESSION_COOKIE_NAME}={session.session_key}")
+            after = self.scrape(options)
+        finally:
+            session.delete()
+
+        samples = [elapsed for _, elapsed, status in results if status == 200]
+        errors = len(results) - len(samples)
+        self.stdout.write(f"{options['url']} ({options['concurrency']} clients, {options['duration']:.0f} s, "
+                          f"user={user.username})")
+        self.stdout.write(f"  {len(results)} requests, {len(results) / options['duration']:.1f} req/s, "
+                          f"{errors} errors")
+        if samples:
+            self.stdout.write(f"  p50 {percentile(samples, 50):.1f} ms")
+            self.stdout.write(f"  p95 {percentile(samples, 95):.1f} ms")
+            self.stdout.write(f"  p99 {percentile(samples, 99):.1f} ms")
+            self.stdout.write(f"  mean {statistics.mean(samples):.1f} ms")
+        if options['metrics_token']:
+            # Includes the warmup's requests.
+            requests = after.get('django_view_requests_total', 0) - before.get('django_view_requests_total', 0)
+            opened = after.get('django_db_connections_total', 0) - before.get('django_db_connections_total', 0)
+            self.stdout.write(f"  {opened:g} database connections set up for {requests:g} requests")
+            if 'django_db_pool_checkouts_total' in after:
+                queued, waited = (
+                    after.get(name, 0) - before.get(name, 0)
+                    for name in ('django_db_pool_checkouts_queued_total', 'django_db_pool_wait_seconds_total')
+                )
+                self.stdout.write(f"  pool: {queued:g} checkouts waited, {waited * 1000:.1f} ms in total, "
+                                  f"{after.get('django_db_pool_size', 0):g} connections open")
+
+    def login(self, user):
+        # What Client.force_login() does, against the server's session store.
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
+
+    def scrape(self, options):
+        """The server's /metrics, each metric summed over its labels."""
+        if not options['metrics_token']:
+            return {}
+        target = urlsplit(options['url'])
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        try:
+            connection.request('GET', target.path.rstrip('/') + reverse('metrics'),
+                               headers={'Authorization': f"Bearer {options['metrics_token']}"})
+            response = connection.getresponse()
+            body = response.read().decode()
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise CommandError(f"/metrics returned {response.status}; check --metrics-token.")
+        totals = {}
+        for line in body.splitlines():
+            # Leaving out the scrapes themselves.
+            if line and not line.startswith('#') and 'view="metrics"' not in line:
+                sample, value = line.rsplit(' ', 1)
+                name = sample.split('{', 1)[0]
+                totals[name] = totals.get(name, 0) + float(value)
+        return totals
+
+    def run(self, options, paths, cookie):
+        target = urlsplit(options['url'])
+        start = time.perf_counter()
+        measure_from = start + options['warmup']
+        stop = measure_from + options['duration']
+        results = []
+        lock = threading.Lock()
+
+        def client(offset):
+            connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+            mine = []
+            i = offset
+            while True:
+                sent = time.perf_counter()
+                if sent >= stop:
+                    break
+                path = paths[i % len(paths)]
+                i += 1
+                try:
+                    connection.request('GET', target.path.rstrip('/') + path, headers={'Cookie': cookie})
+                    response = connection.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    status = None
+                if sent >= measure_from:
+                    mine.append((path, (time.perf_counter() - sent) * 1000, status))
+            connection.close()
+            with lock:
+                results.extend(mine)
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks.models import Task
+from tasks.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = ("Re-create the task search index's triggers and refill it. Needed on SQLite after a VACUUM "
+            "(`migrate` repairs it after migrations that rebuild the task table); a no-op on Postgres.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        install_search_index(connection, Task._meta.db_table)
+        self.stdout.write(f"Search index ready on {connection.vendor}.")
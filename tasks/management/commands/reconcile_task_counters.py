@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.timezone import localdate
+
+from tasks.counters import BUCKETS, rebuild_counts, task_counts
+from tasks.models import Task, TaskCounter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the task list counters (tasks/counters.py) from scratch and report rows that had "
+            "drifted. Writes that land while it runs may need another pass.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drift; exit with an error if there is any.")
+        parser.add_argument('--verify-users', type=int, default=0, metavar='N',
+                            help="Also compare N users' totals with live counts over visible_to().")
+
+    def handle(self, *args, **options):
+        today = localdate()
+        with transaction.atomic():
+            expected = rebuild_counts(today)
+            stored = {}
+            for row in TaskCounter.objects.select_for_update():
+                scope = ('user', row.user_id) if row.user_id else ('group', row.group_id)
+                stored[scope] = row
+
+            drifted = stale = 0
+            for scope, row in stored.items():
+                if row.as_of != today:
+                    stale += 1  # rolled over on its next read
+                    continue
+                counts = {bucket: getattr(row, bucket) for bucket in BUCKETS}
+                if counts != expected.get(scope, dict.fromkeys(BUCKETS, 0)):
+                    drifted += 1
+                    self.stderr.write(f"{scope[0]} {scope[1]}: stored {counts}, "
+                                      f"expected {expected.get(scope, dict.fromkeys(BUCKETS, 0))}")
+
+            if not options['check']:
+                # Rows for scopes without tasks are simply built on first read.
+                TaskCounter.objects.all().delete()
+                TaskCounter.objects.bulk_create(
+                    [TaskCounter(**{f'{kind}_id': pk}, as_of=today, **counts)
+                     for (kind, pk), counts in expected.items()],
+                    batch_size=1000,
+                )
+
+        mismatched = self.verify_users(options['verify_users'], today) if options['verify_users'] else 0
+        self.stdout.write(f"{len(stored)} rows checked: {drifted} drifted, {stale} from an earlier day. "
+                          + ("" if options['check'] else f"Rebuilt {len(expected)} rows."))
+        if options['check'] and (drifted or mismatched):
+            raise CommandError("Task counters have drifted; run reconcile_task_counters without --check.")
+
+    def verify_users(self, limit, today):
+        mismatched = 0
+        for user in User.objects.order_by('?')[:limit]:
+            visible = Task.objects.visible_to(user)
+            live = {status: visible.with_status(status, today).count() for status in (*BUCKETS, 'all')}
+            counted = task_counts(user, today)
+            if counted != live:
+                mismatched += 1
+                self.stderr.write(f"user {user.username}: counters {counted}, live {live}")
+        self.stdout.write(f"{limit} users verified against live counts: {mismatched} mismatched.")
+        return mismatched
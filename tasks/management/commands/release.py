@@ -0,0 +1,68 @@
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tasks.release import static_collected, static_fingerprint, unapplied_migrations, write_stamp
+
+# pg_advisory_lock key held while migrating, so instances releasing at the
+# same time take turns; the second one finds nothing left to apply.
+MIGRATION_LOCK_ID = 0x7a5c_0001
+
+
+class Command(BaseCommand):
+    help = ("Apply unapplied migrations and collect static files if they changed, then record the static "
+            "files' fingerprint. Run once per deploy (build or pre-deploy step); with --check, as start.sh "
+            "does on every start, only verify that both are done.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Exit with an error, changing nothing, if migrations or static files are out of date.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        using = options['database']
+        fingerprint = static_fingerprint()
+        unapplied = unapplied_migrations(using)
+        collected = static_collected(fingerprint)
+
+        if options['check']:
+            problems = []
+            if unapplied:
+                names = ', '.join(f'{app}.{name}' for app, name in unapplied[:5])
+                problems.append(f"{len(unapplied)} unapplied migration(s) ({names})")
+            if not collected:
+                problems.append("static files changed since they were last collected")
+            if problems:
+                raise CommandError(f"Not released: {'; '.join(problems)}. Run `manage.py release`.")
+            self.stdout.write(f"Release is current ({(time.perf_counter() - start) * 1000:.0f} ms).")
+            return
+
+        verbosity = options['verbosity']
+        if unapplied:
+            with self.migration_lock(using):
+                call_command('migrate', database=using, interactive=False, verbosity=verbosity, stdout=self.stdout)
+        if not collected:
+            call_command('collectstatic', interactive=False, verbosity=verbosity, stdout=self.stdout)
+            write_stamp(static=fingerprint)
+        self.stdout.write(self.style.SUCCESS(
+            f"Released: {len(unapplied)} migration(s) applied, static files "
+            f"{'already collected' if collected else 'collected'} ({time.perf_counter() - start:.1f} s)."
+        ))
+
+    @contextmanager
+    def migration_lock(self, using):
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            yield
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [MIGRATION_LOCK_ID])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [MIGRATION_LOCK_ID])
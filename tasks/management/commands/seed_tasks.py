@@ -0,0 +1,82 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import localdate
+
+from tasks.models import Task
+from users.models import Group, Membership
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Generate a reproducible dataset of users, groups, memberships and tasks for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--members-per-group', type=int, default=20)
+        parser.add_argument('--tasks', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42, help="Random seed, so runs are reproducible.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='bench', help="Prefix for generated usernames and group names.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        batch_size = options['batch_size']
+        today = localdate()
+
+        with transaction.atomic():
+            users = [User(username=f"{prefix}_user_{i}") for i in range(options['users'])]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users, batch_size=batch_size)
+            user_ids = list(
+                User.objects.filter(username__startswith=f"{prefix}_user_").order_by('id').values_list('id', flat=True)
+            )
+
+            groups = [
+                Group(name=f"{prefix}_group_{i}", admin_id=rng.choice(user_ids))
+                for i in range(options['groups'])
+            ]
+            Group.objects.bulk_create(groups, batch_size=batch_size)
+
+            memberships = []
+            group_members = {}
+            for group in groups:
+                size = min(options['members_per_group'], len(user_ids))
+                members = set(rng.sample(user_ids, size)) | {group.admin_id}
+                group_members[group.pk] = list(members)
+                memberships.extend(Membership(group=group, user_id=user_id) for user_id in members)
+            Membership.objects.bulk_create(memberships, batch_size=batch_size)
+
+        # Tasks are inserted in their own transactions so a 1M-row run doesn't
+        # build one enormous transaction.
+        created = 0
+        while created < options['tasks']:
+            chunk = []
+            for _ in range(min(batch_size, options['tasks'] - created)):
+                group = rng.choice(groups) if groups and rng.random() < 0.6 else None
+                pool = group_members[group.pk] if group else user_ids
+                due_date = today + timedelta(days=rng.randint(-60, 60)) if rng.random() < 0.9 else None
+                chunk.append(Task(
+                    title=f"Task {created + len(chunk)}",
+                    description="Generated by seed_tasks." if rng.random() < 0.5 else None,
+                    owner_id=rng.choice(pool),
+                    assignee_id=rng.choice(pool) if rng.random() < 0.8 else None,
+                    group=group,
+                    status='completed' if rng.random() < 0.3 else 'ongoing',
+                    due_date=due_date,
+                ))
+            with transaction.atomic():
+                Task.objects.bulk_create(chunk, batch_size=batch_size)
+            created += len(chunk)
+            self.stdout.write(f"  {created}/{options['tasks']} tasks")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users, {len(groups)} groups, {len(memberships)} memberships and {created} tasks."
+        ))
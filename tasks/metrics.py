@@ -0,0 +1,305 @@
+import logging
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+# Per-request query count, DB time, template render time and (optionally)
+# peak allocations, attributed to the resolved view name. Each response gets
+# a Server-Timing header, and the per-view totals are served at /metrics in
+# the Prometheus text format.
+#
+# The totals are per process; with several workers, each scrape of /metrics
+# sees the worker that answered it. So are the database connection counts,
+# and the connection pool's (DB_POOL=1) checkout and wait statistics.
+
+Budget = namedtuple('Budget', ['queries', 'ms'])
+
+# Worst case (cold caches, counters to rebuild, and for the API detail views
+# a write) each view is allowed. RequestMetricsMiddleware logs and counts
+# requests over budget; CacheClearingTestCase.assertWithinBudget() fails a
+# test on them.
+VIEW_BUDGETS = {
+    'task_list': Budget(queries=14, ms=500),
+    'group_list': Budget(queries=6, ms=300),
+    'group_detail': Budget(queries=10, ms=400),
+    'api_task_list': Budget(queries=10, ms=300),
+    'api_task_detail': Budget(queries=10, ms=300),
+    'api_group_list': Budget(queries=6, ms=300),
+    'api_group_detail': Budget(queries=8, ms=300),
+    'user_search': Budget(queries=4, ms=200),
+}
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.view_name = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.duration = 0.0
+        self.peak_alloc = None
+        self._started = time.perf_counter()
+        self._render_started = None
+
+    def over_budget(self):
+        """Descriptions of how the request went over its view's budget, if it has one."""
+        budget = VIEW_BUDGETS.get(self.view_name)
+        if budget is None:
+            return []
+        problems = []
+        if self.queries > budget.queries:
+            problems.append(f"{self.queries} queries (budget {budget.queries})")
+        if self.duration * 1000 > budget.ms:
+            problems.append(f"{self.duration * 1000:.0f} ms (budget {budget.ms} ms)")
+        return problems
+
+    def server_timing(self):
+        # Template time includes queries run lazily while rendering.
+        timings = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.render_time * 1000:.1f}',
+            f'total;dur={self.duration * 1000:.1f}',
+        ]
+        if self.peak_alloc is not None:
+            timings.append(f'mem;desc="peak {self.peak_alloc / 1024:.0f} KiB"')
+        return ', '.join(timings)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed on the connection rather than per request: async views run
+    # their queries on another thread's connection, but the request's
+    # RequestMetrics travels there with the context.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+    registry.record_connection(connection.alias)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    """Per-view totals since the process started."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._connections = {}
+
+    def record(self, metrics):
+        with self._lock:
+            view = self._views.get(metrics.view_name)
+            if view is None:
+                view = self._views[metrics.view_name] = {
+                    'requests': 0, 'duration': 0.0, 'buckets': [0] * len(DURATION_BUCKETS),
+                    'queries': 0, 'queries_max': 0, 'db_time': 0.0, 'render_time': 0.0,
+                    'peak_alloc_max': 0, 'over_budget': 0,
+                }
+            view['requests'] += 1
+            view['duration'] += metrics.duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if metrics.duration <= bound:
+                    view['buckets'][i] += 1
+            view['queries'] += metrics.queries
+            view['queries_max'] = max(view['queries_max'], metrics.queries)
+            view['db_time'] += metrics.db_time
+            view['render_time'] += metrics.render_time
+            view['peak_alloc_max'] = max(view['peak_alloc_max'], metrics.peak_alloc or 0)
+            view['over_budget'] += bool(metrics.over_budget())
+
+    def record_connection(self, alias):
+        with self._lock:
+            self._connections[alias] = self._connections.get(alias, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+            self._connections.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(view, buckets=list(view['buckets'])) for name, view in self._views.items()}
+
+    def render(self):
+        views = sorted(self.snapshot().items())
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        family('django_view_requests_total', 'counter', 'Requests by view.',
+               [f'django_view_requests_total{{view="{name}"}} {view["requests"]}' for name, view in views])
+        duration = []
+        for name, view in views:
+            for bound, count in zip(DURATION_BUCKETS, view['buckets']):
+                duration.append(f'django_view_duration_seconds_bucket{{view="{name}",le="{bound}"}} {count}')
+            duration.append(f'django_view_duration_seconds_bucket{{view="{name}",le="+Inf"}} {view["requests"]}')
+            duration.append(f'django_view_duration_seconds_sum{{view="{name}"}} {view["duration"]:.6f}')
+            duration.append(f'django_view_duration_seconds_count{{view="{name}"}} {view["requests"]}')
+        family('django_view_duration_seconds', 'histogram', 'Time to the response, by view.', duration)
+        for metric, key, kind, help_text, fmt in (
+            ('django_view_db_queries_total', 'queries', 'counter', 'Database queries by view.', 'd'),
+            ('django_view_db_queries_max', 'queries_max', 'gauge', 'Most queries in one request.', 'd'),
+            ('django_view_db_seconds_total', 'db_time', 'counter', 'Time in database queries.', '.6f'),
+            ('django_view_template_seconds_total', 'render_time', 'counter',
+             'Time rendering templates, including queries run while rendering.', '.6f'),
+            ('django_view_peak_alloc_bytes_max', 'peak_alloc_max', 'gauge',
+             'Largest peak allocation in one request (REQUEST_METRICS_TRACEMALLOC only).', 'd'),
+            ('django_view_over_budget_total', 'over_budget', 'counter', 'Requests over the view budget.', 'd'),
+        ):
+            family(metric, kind, help_text,
+                   [f'{metric}{{view="{name}"}} {view[key]:{fmt}}' for name, view in views])
+
+        with self._lock:
+            opened = sorted(self._connections.items())
+        family('django_db_connections_total', 'counter',
+               'Database connections set up: new connections, or checkouts from the pool with DB_POOL=1.',
+               [f'django_db_connections_total{{alias="{alias}"}} {count}' for alias, count in opened])
+        pools = sorted(pool_stats().items())
+        for metric, key, kind, help_text, scale in POOL_METRICS:
+            if pools:
+                family(metric, kind, help_text,
+                       [f'{metric}{{alias="{alias}"}} {stats.get(key, 0) * scale:g}' for alias, stats in pools])
+        return '\n'.join(lines) + '\n'
+
+
+# Prometheus metric, psycopg_pool statistic, type, help text and scale.
+POOL_METRICS = (
+    ('django_db_pool_size', 'pool_size', 'gauge', 'Connections in the pool, in use or idle.', 1),
+    ('django_db_pool_available', 'pool_available', 'gauge', 'Idle connections in the pool.', 1),
+    ('django_db_pool_max_size', 'pool_max', 'gauge', 'Most connections the pool will open.', 1),
+    ('django_db_pool_requests_waiting', 'requests_waiting', 'gauge', 'Requests waiting for a connection.', 1),
+    ('django_db_pool_checkouts_total', 'requests_num', 'counter', 'Connections taken from the pool.', 1),
+    ('django_db_pool_checkouts_queued_total', 'requests_queued', 'counter',
+     'Checkouts that had to wait for a connection.', 1),
+    ('django_db_pool_wait_seconds_total', 'requests_wait_ms', 'counter',
+     'Time spent waiting for a connection.', 0.001),
+    ('django_db_pool_checkout_errors_total', 'requests_errors', 'counter',
+     'Checkouts that timed out (DB_POOL_TIMEOUT) or failed.', 1),
+    ('django_db_pool_usage_seconds_total', 'usage_ms', 'counter', 'Time connections were checked out.', 0.001),
+    ('django_db_pool_connections_total', 'connections_num', 'counter', 'Connections the pool opened.', 1),
+    ('django_db_pool_connections_lost_total', 'connections_lost', 'counter',
+     'Connections found broken by the health check.', 1),
+)
+
+
+def pool_stats():
+    """psycopg_pool statistics of each database alias whose pool is open, in this process."""
+    stats = {}
+    for alias in connections:
+        # Read the pools Django has opened rather than connection.pool, which
+        # would open one.
+        pool = getattr(connections[alias], '_connection_pools', {}).get(alias)
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+    return stats
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.trace_allocations = settings.REQUEST_METRICS_TRACEMALLOC
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def _start(self):
+        metrics = RequestMetrics()
+        if self.trace_allocations:
+            # Process-wide: concurrent requests in other threads add to it.
+            tracemalloc.reset_peak()
+            metrics.peak_alloc = tracemalloc.get_traced_memory()[0]
+        return metrics, _current.set(metrics)
+
+    def _finish(self, request, response, metrics):
+        metrics.duration = time.perf_counter() - metrics._started
+        if metrics.peak_alloc is not None:
+            metrics.peak_alloc = max(0, tracemalloc.get_traced_memory()[1] - metrics.peak_alloc)
+        match = request.resolver_match
+        metrics.view_name = match.view_name if match else 'unresolved'
+        registry.record(metrics)
+        problems = metrics.over_budget()
+        if problems:
+            logger.warning("%s over budget: %s", metrics.view_name, ', '.join(problems))
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response.headers['Server-Timing'] = metrics.server_timing()
+        response.request_metrics = metrics
+        return response
+
+    def process_template_response(self, request, response):
+        # Replaced by aprocess_template_response() in async mode, so the
+        # handler doesn't hop to a thread to call it.
+        metrics = _current.get()
+        if metrics is not None:
+            metrics._render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._rendered(metrics))
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        return RequestMetricsMiddleware.process_template_response(self, request, response)
+
+    def _rendered(self, metrics):
+        metrics.render_time += time.perf_counter() - metrics._render_started
+
+
+def metrics_view(request):
+    """The per-view totals, for staff users or a scraper sending `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (token and constant_time_compare(authorization, f'Bearer {token}'))):
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
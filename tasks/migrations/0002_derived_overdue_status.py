@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+def clear_stored_overdue(apps, schema_editor):
+    # Overdue is now derived from due_date at query time.
+    Task = apps.get_model('tasks', 'Task')
+    Task.objects.filter(status='overdue').update(status='ongoing')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_stored_overdue, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='task',
+            name='status',
+            field=models.CharField(choices=[('ongoing', 'Ongoing'), ('completed', 'Completed')], default='ongoing', help_text='Current status of the task.', max_length=20),
+        ),
+    ]
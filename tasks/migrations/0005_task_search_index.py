@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from tasks.search import install_search_index, uninstall_search_index
+
+
+def install(apps, schema_editor):
+    install_search_index(schema_editor.connection, apps.get_model('tasks', 'Task')._meta.db_table)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection, apps.get_model('tasks', 'Task')._meta.db_table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
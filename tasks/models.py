@@ -1,7 +1,109 @@
-from django.db import models
+from django.db import connections, models, router
 import uuid
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.timezone import localdate
 from users.models import Group
+from .search import search_filter
+
+
+def effective_status_for(status, due_date, today=None):
+    """Python mirror of TaskQuerySet.with_effective_status()."""
+    if status == 'ongoing' and due_date and due_date < (today or localdate()):
+        return 'overdue'
+    return status
+
+
+def delete_rows(model, pks, batch_size=500):
+    """
+    Delete the model's rows with these primary keys, one DELETE per batch,
+    and return how many were deleted.
+
+    For the bulk paths (bulk task delete, member removal) that do what the
+    post_delete receivers would themselves: QuerySet.delete() sends the
+    signals per row, so it fetches every row first and deletes them in
+    batches of 100. Nothing cascades either, so only for models that nothing
+    references but foreign keys declared on_delete=DO_NOTHING and
+    db_constraint=False (ActivityEvent's).
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    values = [model._meta.pk.get_db_prep_value(pk, connection) for pk in pks]
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(batch))})", batch)
+            deleted += cursor.rowcount
+    return deleted
+
+
+class TaskQuerySet(models.QuerySet):
+    """
+    Overdue is never stored: it is derived from status and due_date at query
+    time, so it is correct the moment the date changes without any writes.
+    """
+
+    def visible_to(self, user):
+        """
+        Tasks the user owns, is assigned to, or can see through a group.
+
+        Built as `pk IN (a UNION b UNION c UNION d)` where each branch is a
+        single index-backed lookup, instead of an OR across joins that needs
+        DISTINCT to undo the membership fan-out. Filters already applied to
+        this queryset (e.g. with_status()) are pushed into every branch so
+        they can use the composite indexes declared on Task.
+        """
+        branches = [
+            self.filter(owner=user),
+            self.filter(assignee=user),
+            self.filter(group__members__user=user),
+            self.filter(group__admin=user),
+        ]
+        branches = [branch.order_by().values('pk') for branch in branches]
+        return self.filter(pk__in=branches[0].union(*branches[1:]))
+
+    def for_listing(self):
+        # Everything the list pages and the JSON API read per row, in one query.
+        return self.select_related('assignee', 'group').only(
+            'title', 'description', 'status', 'due_date', 'created_at', 'updated_at',
+            'owner_id', 'assignee__username', 'group__name', 'group__admin_id',
+        )
+
+    def with_effective_status(self, today=None):
+        today = today or localdate()
+        return self.annotate(effective_status=models.Case(
+            models.When(status='ongoing', due_date__lt=today, then=models.Value('overdue')),
+            default=models.F('status'),
+            output_field=models.CharField(max_length=20),
+        ))
+
+    # The filters below are plain column predicates equivalent to filtering
+    # on effective_status, so the database can use indexes on status/due_date.
+    def ongoing(self, today=None):
+        today = today or localdate()
+        return self.filter(models.Q(due_date__isnull=True) | models.Q(due_date__gte=today), status='ongoing')
+
+    def overdue(self, today=None):
+        return self.filter(status='ongoing', due_date__lt=today or localdate())
+
+    def completed(self):
+        return self.filter(status='completed')
+
+    def search(self, query):
+        """Tasks whose title or description contains every word of query as a prefix; see tasks/search.py."""
+        return self.filter(search_filter(query, self.db))
+
+    def with_status(self, status_filter, today=None):
+        if status_filter == 'all':
+            return self
+        if status_filter == 'completed':
+            return self.completed()
+        if status_filter == 'overdue':
+            return self.overdue(today)
+        return self.ongoing(today)
 
 
 class Task(models.Model):
@@ -12,6 +114,7 @@ class Task(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='created_tasks',
+        db_index=False,  # covered by the composite indexes in Meta
         help_text="the user who created the task"
     )
     assignee = models.ForeignKey(
@@ -20,21 +123,23 @@ class Task(models.Model):
         null=True,
         blank=True,
         related_name='assigned_tasks',
+        db_index=False,  # covered by the composite indexes in Meta
         help_text="the user currently assigned to this task"
     )
     group = models.ForeignKey(
         Group,
         on_delete=models.CASCADE,
         related_name='tasks',
+        db_index=False,  # covered by the composite indexes in Meta
         null=True,
         blank=True,
         help_text="The group this task belongs to"
     )
 
+    # 'overdue' is not a stored status; see TaskQuerySet.with_effective_status().
     STATUS_CHOICES = [
         ('ongoing', 'Ongoing'),
         ('completed', 'Completed'),
-        ('overdue', 'Overdue'),
     ]
 
     status = models.CharField(
@@ -47,16 +152,115 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, help_text="Timestamp when the task was created.")
     updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp when the task was last updated.")
 
+    objects = TaskQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Task"
         verbose_name_plural = "Tasks"
         ordering = ['-created_at']
+        # Shaped around the list views: visible_to() branches filter on
+        # owner/assignee/group plus status and due_date, and both the task
+        # list and group detail sort by (due_date, -created_at).
+        indexes = [
+            models.Index(fields=['owner', 'status', 'due_date'], name='task_owner_status_due_idx'),
+            models.Index(fields=['assignee', 'status', 'due_date'], name='task_assignee_status_due_idx'),
+            models.Index(fields=['group', 'due_date', '-created_at'], name='task_group_due_created_idx'),
+            models.Index(
+                fields=['due_date', '-created_at'],
+                condition=models.Q(status='ongoing'),
+                name='task_open_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.title} (Status: {self.effective_status.capitalize()})"
+
+    @property
+    def effective_status(self):
+        # Querysets annotated with with_effective_status() set the value from SQL.
+        if '_effective_status' in self.__dict__:
+            return self.__dict__['_effective_status']
+        return effective_status_for(self.status, self.due_date)
+
+    @effective_status.setter
+    def effective_status(self, value):
+        self.__dict__['_effective_status'] = value
+
+
+class TaskCounter(models.Model):
+    """
+    Task counts per effective status for the task list tabs, kept up to date
+    by tasks/counters.py. A group's row counts every task in the group; a
+    user's row counts the tasks they own or are assigned to outside the groups
+    they can access, so a user's totals are their row plus their groups' rows.
+    """
+    # Not indexed: the partial unique constraints below cover lookups.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True,
+                             related_name='+', db_index=False)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, null=True, related_name='+', db_index=False)
+    ongoing = models.IntegerField(default=0)
+    overdue = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    # The day `overdue` was computed for; see counters.task_counts().
+    as_of = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=models.Q(user__isnull=False),
+                                    name='taskcounter_user_unique'),
+            models.UniqueConstraint(fields=['group'], condition=models.Q(group__isnull=False),
+                                    name='taskcounter_group_unique'),
+            models.CheckConstraint(
+                condition=models.Q(user__isnull=False, group__isnull=True) | models.Q(user__isnull=True, group__isnull=False),
+                name='taskcounter_one_scope',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id or self.group_id}: {self.ongoing}/{self.overdue}/{self.completed}"
+
+
+class ActivityEventQuerySet(models.QuerySet):
+    def for_group(self, group_id):
+        """A group's timeline, newest first (activity_group_timeline_idx)."""
+        return self.filter(group_id=group_id).order_by('-created_at', '-id')
+
+    def for_task(self, task_id):
+        """A task's timeline, newest first (activity_task_timeline_idx)."""
+        return self.filter(task_id=task_id).order_by('-created_at', '-id')
+
+
+class ActivityEvent(models.Model):
+    """
+    One change to a task, a group or its members, written by tasks/activity.py.
+    Append-only: rows are never updated, and outlive what they describe, so
+    the foreign keys have no database constraints and nothing cascades to
+    them. `manage.py compact_activity` removes rows past the retention period.
+    """
+    # Set when the change commits, not when the row is written.
+    created_at = models.DateTimeField()
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+                              null=True, related_name='+', db_index=False)
+    verb = models.CharField(max_length=32)
+    # Not indexed: covered by the timeline indexes in Meta.
+    group = models.ForeignKey(Group, on_delete=models.DO_NOTHING, db_constraint=False, null=True,
+                              related_name='+', db_index=False)
+    task = models.ForeignKey(Task, on_delete=models.DO_NOTHING, db_constraint=False, null=True,
+                             related_name='+', db_index=False)
+    # What changed, e.g. {"status": ["ongoing", "completed"]}.
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    objects = ActivityEventQuerySet.as_manager()
+
+    class Meta:
+        # Partial, so events without a group (or task) aren't indexed twice.
+        # Retention deletes walk the primary key from the oldest row instead.
+        indexes = [
+            models.Index(fields=['group', '-created_at', '-id'], condition=models.Q(group__isnull=False),
+                         name='activity_group_timeline_idx'),
+            models.Index(fields=['task', '-created_at', '-id'], condition=models.Q(task__isnull=False),
+                         name='activity_task_timeline_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.title} (Status: {self.status.capitalize()})"
-    
-    def save(self, *args, **kwargs):
-        from datetime import date
-        if self.due_date and self.due_date < date.today() and self.status != 'completed':
-            self.status = 'overdue'
-        super().save(*args, **kwargs)
\ No newline at end of file
+        return f"{self.created_at:%Y-%m-%d %H:%M} {self.verb}"
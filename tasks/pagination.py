@@ -0,0 +1,216 @@
+from functools import cached_property
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from django.http import Http404
+
+CURSOR_SALT = 'tasks.pagination.cursor'
+
+# Above this many rows the count is shown as "N+" instead of counted.
+APPROXIMATE_COUNT_CAP = 1000
+
+
+def approximate_count(queryset):
+    """
+    Cheap row count for display: a COUNT that stops after
+    APPROXIMATE_COUNT_CAP + 1 rows. Returns (count, qualifier) where qualifier
+    is '' for an exact count and '+' for a capped one. (The Postgres planner's
+    estimate would cost nothing to read but can be off by orders of magnitude
+    for a single group's tasks.)
+    """
+    return _capped(queryset.order_by()[:APPROXIMATE_COUNT_CAP + 1].count())
+
+
+async def aapproximate_count(queryset):
+    """approximate_count() for async views."""
+    return _capped(await queryset.order_by()[:APPROXIMATE_COUNT_CAP + 1].acount())
+
+
+def _capped(count):
+    if count > APPROXIMATE_COUNT_CAP:
+        return APPROXIMATE_COUNT_CAP, '+'
+    return count, ''
+
+
+def _display_count(count, qualifier):
+    return f"{count}{qualifier}"
+
+
+class CursorPage:
+    """One page of a CursorPaginator. Rows are fetched on first access."""
+
+    def __init__(self, paginator, queryset, values, backwards):
+        self.paginator = paginator
+        self._queryset = queryset
+        self._values = values
+        self._backwards = backwards
+
+    @cached_property
+    def _result(self):
+        return self._split(list(self._queryset[:self.paginator.per_page + 1]))
+
+    def _split(self, rows):
+        per_page = self.paginator.per_page
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if self._backwards:
+            rows.reverse()
+            return rows, True, has_more
+        return rows, has_more, self._values is not None
+
+    async def aload(self):
+        """Fetch the rows now with the async ORM, for async views."""
+        if '_result' not in self.__dict__:
+            rows = [obj async for obj in self._queryset[:self.paginator.per_page + 1]]
+            self.__dict__['_result'] = self._split(rows)
+
+    async def aload_count(self):
+        if 'approximate_count' not in self.__dict__:
+            self.__dict__['approximate_count'] = _display_count(*await aapproximate_count(self.paginator.queryset))
+
+    @property
+    def object_list(self):
+        return self._result[0]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self._result[1]
+
+    def has_previous(self):
+        return self._result[2]
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], 'next')
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], 'previous')
+
+    @cached_property
+    def approximate_count(self):
+        return _display_count(*approximate_count(self.paginator.queryset))
+
+
+class CursorPaginator:
+    """
+    Keyset paginator: each page is fetched with a WHERE on the sort key of
+    the row it continues from, so page N costs the same as page 1 and no
+    COUNT(*) is needed.
+
+    `ordering` must end in a unique field (e.g. '-id'). Nullable keys sort
+    NULLs last in page order; that is Postgres' default for an ascending key
+    (like due_date), so a plain index serves it. NOT NULL keys are ordered
+    without a NULLS clause, so the DESC columns of the indexes (NULLS FIRST
+    by default) serve them too.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        self.per_page = per_page
+
+    def _field(self, name):
+        opts = self.queryset.model._meta
+        return opts.pk if name in ('id', 'pk') else opts.get_field(name)
+
+    def _row_values(self, obj):
+        return [getattr(obj, self._field(name).attname) for name, descending in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [self._field(name).value_to_string(obj) if value is not None else None
+                  for (name, descending), value in zip(self.ordering, self._row_values(obj))]
+        return signing.dumps([direction[0], values], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, token):
+        try:
+            direction, raw = signing.loads(token, salt=CURSOR_SALT)
+            values = [self._field(name).to_python(value) if value is not None else None
+                      for (name, descending), value in zip(self.ordering, raw)]
+        except (signing.BadSignature, ValidationError, ValueError, TypeError) as exc:
+            raise InvalidPage('Invalid cursor.') from exc
+        if direction not in ('n', 'p') or len(values) != len(self.ordering):
+            raise InvalidPage('Invalid cursor.')
+        return direction == 'p', values
+
+    def _order_by(self, backwards):
+        nulls = {'nulls_first': True} if backwards else {'nulls_last': True}
+        order = []
+        for name, descending in self.ordering:
+            options = nulls if self._field(name).null else {}
+            if descending != backwards:
+                order.append(F(name).desc(**options))
+            else:
+                order.append(F(name).asc(**options))
+        return order
+
+    def _beyond(self, name, descending, value, backwards):
+        # Rows strictly after `value` in page order (before it when going back).
+        # NULLs sort last in page order, i.e. after every non-null value.
+        if value is None:
+            return Q(**{f'{name}__isnull': False}) if backwards else None
+        lookup = 'lt' if descending != backwards else 'gt'
+        condition = Q(**{f'{name}__{lookup}': value})
+        if not backwards:
+            condition |= Q(**{f'{name}__isnull': True})
+        return condition
+
+    def _keyset_filter(self, values, backwards):
+        # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... with per-key direction.
+        branches = []
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            beyond = self._beyond(name, descending, value, backwards)
+            if beyond is not None:
+                branches.append(equal & beyond)
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+        condition = Q()
+        for branch in branches:
+            condition |= branch
+        return condition
+
+    def page(self, cursor=None):
+        # The cursor is validated now; rows are only queried when the page is
+        # read, so a cached template fragment can skip the query entirely.
+        backwards, values = self.decode_cursor(cursor) if cursor else (False, None)
+        queryset = self.queryset.order_by(*self._order_by(backwards))
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, backwards))
+        return CursorPage(self, queryset, values, backwards)
+
+
+class CursorPaginationMixin:
+    """Swap ListView's offset paginator for CursorPaginator."""
+    cursor_ordering = ('due_date', '-created_at', '-id')
+    cursor_kwarg = 'cursor'
+
+    def get_cursor_page(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, self.cursor_ordering, page_size)
+        try:
+            return paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as exc:
+            raise Http404(str(exc)) from exc
+
+    def paginate_queryset(self, queryset, page_size):
+        # The page doubles as the (lazy) object list.
+        page = self.get_cursor_page(queryset, page_size)
+        return (page.paginator, page, page, True)
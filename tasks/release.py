@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import pkgutil
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.template import engines
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from .form_rendering import warm_up_forms
+
+# What a deploy has to do before the app can serve, and how to tell quickly
+# that it's done. Migrations are checked against the database's own record
+# (django_migrations), since the release step may run in another container
+# than the web process; collected static files against a fingerprint of
+# their sources, recorded in RELEASE_STAMP_FILE next to this checkout.
+
+
+def static_fingerprint():
+    """SHA-256 over the path and contents of every file collectstatic would collect."""
+    digest = hashlib.sha256()
+    files = {}
+    for finder in finders.get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            # As in collectstatic, the first finder to list a path wins.
+            files.setdefault(path, storage)
+    for path, storage in sorted(files.items()):
+        digest.update(path.encode() + b'\0')
+        with storage.open(path) as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def migrations_on_disk():
+    """(app label, migration name) of every migration file, without importing them."""
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        spec = find_spec(module_name) if module_name else None
+        if spec is None or spec.submodule_search_locations is None:
+            continue
+        for _, name, is_pkg in pkgutil.iter_modules(spec.submodule_search_locations):
+            # The names MigrationLoader skips.
+            if not is_pkg and name[0] not in '_~':
+                found.add((app_config.label, name))
+    return found
+
+
+def unapplied_migrations(using='default'):
+    return sorted(migrations_on_disk() - set(MigrationRecorder(connections[using]).applied_migrations()))
+
+
+def static_collected(fingerprint):
+    """Whether the collected static files (and their manifest) match the fingerprint."""
+    manifest = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest and not staticfiles_storage.exists(manifest):
+        return False
+    return read_stamp().get('static') == fingerprint
+
+
+def read_stamp():
+    try:
+        with open(settings.RELEASE_STAMP_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_stamp(**values):
+    os.makedirs(os.path.dirname(settings.RELEASE_STAMP_FILE), exist_ok=True)
+    stamp = dict(read_stamp(), released_at=timezone.now().isoformat(timespec='seconds'), **values)
+    # Written whole and renamed into place, so a reader never sees half of it.
+    partial = f'{settings.RELEASE_STAMP_FILE}.{os.getpid()}'
+    with open(partial, 'w') as f:
+        json.dump(stamp, f)
+    os.replace(partial, settings.RELEASE_STAMP_FILE)
+
+
+def warm_up():
+    """
+    Import the URLconf (and with it the views, forms and models), compile
+    the project's templates and build the form skeletons, so the first
+    request doesn't. Doesn't touch the database: gunicorn --preload runs
+    this before forking the workers, which mustn't share a connection.
+    """
+    reverse('task_list')  # imports the URLconf and builds the reverse lookup
+    base_dir = str(settings.BASE_DIR)
+    for engine in engines.all():
+        dirs = set()
+        for loader in engine.engine.template_loaders:
+            dirs.update(str(d) for d in loader.get_dirs()
+                        if str(d).startswith(base_dir) and 'site-packages' not in str(d))
+        for directory in sorted(dirs):
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    if name.endswith(('.html', '.txt')):
+                        get_template(os.path.relpath(os.path.join(root, name), directory), using=engine.name)
+    warm_up_forms()
@@ -0,0 +1,151 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, Expression, F, Q
+
+# Full-text search over Task.title and description; see TaskQuerySet.search().
+#
+# The index lives outside the model: on Postgres a generated tsvector column
+# with a GIN index, on SQLite an FTS5 table kept in sync by triggers. Both are
+# created by migration 0005 through install_search_index(). Other backends
+# fall back to icontains.
+#
+# On SQLite, a migration that rebuilds the task table (most AlterField and
+# RemoveField operations) drops the triggers and renumbers rows;
+# repair_search_index() re-creates the index after `migrate` then. VACUUM
+# renumbers rows too: run `manage.py rebuild_search_index` after one. (The
+# FTS5 table can only be keyed on an integer column, and Task's primary key
+# is a UUID, so it is keyed on the rowid.)
+
+SEARCH_CONFIG = 'english'
+
+# Terms beyond this are ignored, to bound the cost of one query.
+MAX_SEARCH_TERMS = 8
+
+
+def search_terms(query):
+    """The words of a search. Everything else is dropped, so user input can't break the query syntax."""
+    return re.findall(r'\w+', query.lower())[:MAX_SEARCH_TERMS]
+
+
+def _fts_table(table):
+    return f'{table}_fts'
+
+
+class SearchMatch(Expression):
+    """
+    True for rows matching the terms. Compiled against the alias the row's
+    table has in the query, so it also works inside the visible_to() branches,
+    and it tests the row itself rather than building a `pk IN (...)` list of
+    every matching task.
+    """
+    conditional = True
+    output_field = BooleanField()
+
+    def __init__(self, terms, pk=None):
+        super().__init__()
+        self.terms = terms
+        self.pk = F('pk') if pk is None else pk
+
+    def get_source_expressions(self):
+        return [self.pk]
+
+    def set_source_expressions(self, exprs):
+        (self.pk,) = exprs
+
+    def _table(self, compiler):
+        return compiler.quote_name_unless_alias(self.pk.alias)
+
+    def as_postgresql(self, compiler, connection):
+        tsquery = ' & '.join(f'{term}:*' for term in self.terms)
+        return (f'{self._table(compiler)}.search_vector @@ to_tsquery(%s::regconfig, %s)',
+                [SEARCH_CONFIG, tsquery])
+
+    def as_sqlite(self, compiler, connection):
+        fts = _fts_table(self.pk.target.model._meta.db_table)
+        match = ' '.join(f'"{term}"*' for term in self.terms)
+        # SQLite drives the query from the matches: near free for selective
+        # terms, slower than a scan of the visible tasks for a term in most rows.
+        return f'{self._table(compiler)}.rowid IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)', [match]
+
+
+def search_filter(query, using='default'):
+    """A Q matching rows whose title or description has every term as a word prefix."""
+    terms = search_terms(query)
+    if not terms:
+        return Q()
+    if connections[using].vendor in ('postgresql', 'sqlite'):
+        return Q(SearchMatch(terms))
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def install_search_index(connection, table):
+    """Create (or on SQLite, re-create and refill) the search index. Safe to run again."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Weighted so a ranking can put title matches above description matches.
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')) STORED"
+            )
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING GIN (search_vector)')
+        elif connection.vendor == 'sqlite':
+            fts = _fts_table(table)
+            # External content: the FTS table indexes tasks_task's rows by rowid
+            # and reads the text back from it, so nothing is stored twice.
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"title, description, content='{table}', tokenize='porter unicode61')"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN '
+                f'INSERT INTO {fts}(rowid, title, description) VALUES (new.rowid, new.title, new.description); END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN '
+                f"INSERT INTO {fts}({fts}, rowid, title, description) "
+                f"VALUES ('delete', old.rowid, old.title, old.description); END"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF title, description ON {table} BEGIN '
+                f"INSERT INTO {fts}({fts}, rowid, title, description) "
+                f"VALUES ('delete', old.rowid, old.title, old.description); "
+                f'INSERT INTO {fts}(rowid, title, description) VALUES (new.rowid, new.title, new.description); END'
+            )
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(connection, table):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+            cursor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+        elif connection.vendor == 'sqlite':
+            fts = _fts_table(table)
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{trigger}')
+            cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def repair_search_index(sender, using='default', **kwargs):
+    """
+    post_migrate receiver: on SQLite, re-create the index if a migration
+    rebuilt the task table and so dropped its triggers. Does nothing before
+    migration 0005 has created the index.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    table = sender.get_model('Task')._meta.db_table
+    fts = _fts_table(table)
+    expected = {fts} | {f'{fts}_{trigger}' for trigger in ('insert', 'delete', 'update')}
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(expected))})",
+                       sorted(expected))
+        found = {row[0] for row in cursor.fetchall()}
+    if fts in found and found != expected:
+        install_search_index(connection, table)
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Group, Membership
+from .activity import record, record_task_change
+from .counters import COUNTED_FIELDS, drop_user_counters, task_state, track_changes
+from .events import publish_group_event, task_delta
+from .fragments import invalidate_groups, invalidate_memberships, invalidate_users
+from .models import Task
+
+User = get_user_model()
+
+TRACKED_TASK_FIELDS = COUNTED_FIELDS
+
+
+@receiver(post_init, sender=Task)
+def remember_task_relations(sender, instance, **kwargs):
+    # Read from __dict__ so tasks loaded with only() don't fetch deferred fields.
+    instance._loaded_relations = {field: instance.__dict__.get(field) for field in TRACKED_TASK_FIELDS}
+
+
+def _invalidate_task(instance):
+    # Invalidate where the task was as well as where it is now (reassignment,
+    # moving between groups).
+    loaded = getattr(instance, '_loaded_relations', {})
+    invalidate_users(instance.owner_id, instance.assignee_id, loaded.get('owner_id'), loaded.get('assignee_id'))
+    invalidate_groups(instance.group_id, loaded.get('group_id'))
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, **kwargs):
+    _invalidate_task(instance)
+    loaded = getattr(instance, '_loaded_relations', {})
+    state = task_state(instance)
+    track_changes([(None if created else loaded, state)])
+    record_task_change(instance.pk, None if created else loaded, state)
+    old_group_id = None if created else loaded.get('group_id')
+    if old_group_id != instance.group_id:
+        # Moving between groups looks like a delete in one and a create in the other.
+        publish_group_event(old_group_id, 'task.deleted', {'task': {'id': instance.pk}})
+        publish_group_event(instance.group_id, 'task.created', {'task': task_delta(instance)})
+    elif instance.status == 'completed' and loaded.get('status') != 'completed':
+        publish_group_event(instance.group_id, 'task.completed', {'task': task_delta(instance)})
+    else:
+        publish_group_event(instance.group_id, 'task.updated', {'task': task_delta(instance)})
+    instance._loaded_relations = {field: getattr(instance, field) for field in TRACKED_TASK_FIELDS}
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    _invalidate_task(instance)
+    before = getattr(instance, '_loaded_relations', None) or task_state(instance)
+    track_changes([(before, None)])
+    record_task_change(instance.pk, before, None)
+    publish_group_event(instance.group_id, 'task.deleted', {'task': {'id': instance.pk}})
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def membership_changed(sender, instance, **kwargs):
+    invalidate_groups(instance.group_id)
+    invalidate_memberships(instance.user_id)
+    drop_user_counters(instance.user_id)
+    event_type = 'member.removed' if kwargs['signal'] is post_delete else 'member.added'
+    publish_group_event(instance.group_id, event_type, {'user_id': instance.user_id})
+    record(event_type, instance.group_id, data={'user_id': instance.user_id})
+
+
+@receiver(pre_save, sender=Group)
+def group_admin_changing(sender, instance, **kwargs):
+    # Admins can access the group, so a new admin changes what both users'
+    # counters cover. Checked before users/signals.py resets _loaded_admin_id.
+    old_admin_id = getattr(instance, '_loaded_admin_id', None)
+    if old_admin_id is not None and old_admin_id != instance.admin_id:
+        drop_user_counters(old_admin_id, instance.admin_id)
+        invalidate_memberships(old_admin_id, instance.admin_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    invalidate_groups(instance.pk)
+    if kwargs.get('created') or kwargs['signal'] is post_delete:
+        invalidate_memberships(instance.admin_id)
+    event_type = 'group.deleted' if kwargs['signal'] is post_delete else 'group.updated'
+    publish_group_event(instance.pk, event_type, {})
+    # From __dict__, so groups loaded with only() don't fetch the name.
+    record('group.created' if kwargs.get('created') else event_type, instance.pk,
+           data={'name': instance.__dict__.get('name')})
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    # Read from __dict__ so users loaded with only() don't fetch the username.
+    instance._loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, **kwargs):
+    # Logins save last_login; only a new username changes what fragments show.
+    old_username = getattr(instance, '_loaded_username', None)
+    instance._loaded_username = instance.username
+    if created or old_username is None or old_username == instance.username:
+        return
+    # The fragments show usernames in group member lists and as the
+    # assignee, on group pages and on the task owner's list.
+    assigned = Task.objects.filter(assignee_id=instance.pk).order_by().values_list('owner_id', 'group_id').distinct()
+    owners = set()
+    groups = set(Membership.objects.filter(user_id=instance.pk).values_list('group_id', flat=True))
+    for owner_id, group_id in assigned:
+        owners.add(owner_id)
+        groups.add(group_id)
+    invalidate_users(instance.pk, *owners)
+    invalidate_groups(*groups)
@@ -0,0 +1,66 @@
+// Live updates for group_detail.html from GroupEventsView (server-sent events).
+document.addEventListener('DOMContentLoaded', function () {
+    var banner = document.getElementById('group-events');
+    if (!banner || !window.EventSource) {
+        return;
+    }
+    var badges = {
+        completed: '<span class="badge bg-success rounded-pill">Completed</span>',
+        overdue: '<span class="badge bg-danger rounded-pill">Overdue</span>',
+        ongoing: '<span class="badge bg-warning text-dark rounded-pill">Ongoing</span>'
+    };
+    var source = new EventSource(banner.dataset.eventsUrl);
+
+    function showBanner() {
+        banner.classList.remove('d-none');
+    }
+
+    function row(task) {
+        return document.querySelector('tr[data-task-id="' + task.id + '"]');
+    }
+
+    function applyTask(event) {
+        var task = JSON.parse(event.data).task;
+        var tr = row(task);
+        if (!tr) {
+            // Not on this page; the counts and ordering may have changed.
+            showBanner();
+            return;
+        }
+        if (task.title !== undefined) {
+            tr.querySelector('[data-task-title]').textContent = task.title;
+        }
+        if (task.effective_status && badges[task.effective_status]) {
+            tr.querySelector('[data-task-status]').innerHTML = badges[task.effective_status];
+        }
+        if (task.status === 'completed') {
+            var button = tr.querySelector('[data-task-complete]');
+            if (button) {
+                button.remove();
+            }
+        }
+        var assignee = task.assignee_id === null ? '' : String(task.assignee_id);
+        if ((task.assignee_id !== undefined && assignee !== tr.dataset.assigneeId) ||
+                (task.due_date !== undefined && (task.due_date || '') !== tr.dataset.dueDate)) {
+            // Usernames and formatted dates aren't in the delta; ask for a refresh.
+            showBanner();
+        }
+    }
+
+    source.addEventListener('task.updated', applyTask);
+    source.addEventListener('task.completed', applyTask);
+    source.addEventListener('task.deleted', function (event) {
+        var tr = row(JSON.parse(event.data).task);
+        if (tr) {
+            tr.remove();
+        }
+        showBanner();
+    });
+    ['task.created', 'member.added', 'member.removed', 'group.updated', 'resync'].forEach(function (name) {
+        source.addEventListener(name, showBanner);
+    });
+    source.addEventListener('group.deleted', function () {
+        source.close();
+        showBanner();
+    });
+});
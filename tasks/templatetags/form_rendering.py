@@ -0,0 +1,11 @@
+from django import template
+
+from tasks import form_rendering
+
+register = template.Library()
+
+
+@register.filter
+def render_form(form, style='p'):
+    """`{{ form|render_form:'crispy' }}`: the form as `form.as_p` or `form|crispy` would render it."""
+    return form_rendering.render_form(form, style)
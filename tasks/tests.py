@@ -1,3 +1,1897 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import re
+import runpy
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F, Q
+from django.forms import modelform_factory
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from django.utils.timezone import localdate
+
+from task_management.testing import TEST_OVERRIDES
+from users.access import _cache_key as group_access_key, get_current_group_access, get_group_access
+from users.models import Group, Membership
+from . import activity, form_rendering
+from .async_views import AsyncGroupDetailView, AsyncGroupListView, AsyncTaskListView
+from .bulk import apply_bulk_action
+from .counters import task_counts
+from .events import RESYNC, BaseBroker, InProcessBroker, get_broker, group_channel
+from .form_rendering import render_form
+from .forms import GroupMemberForm, TaskForm
+from .fragments import task_list_fragment_version
+from .importer import COPY_COLUMNS, TaskImporter
+from .metrics import VIEW_BUDGETS, Budget, registry
+from .models import ActivityEvent, Task, TaskCounter
+from .views import GroupEventsView
+from .pagination import CursorPaginator
+
+User = get_user_model()
+
+# URLconf for AsyncViewTests: the async views next to the regular routes.
+urlpatterns = [
+    path('async/tasks/', AsyncTaskListView.as_view(), name='async_task_list'),
+    path('async/groups/', AsyncGroupListView.as_view(), name='async_group_list'),
+    path('async/groups/<uuid:pk>/', AsyncGroupDetailView.as_view(), name='async_group_detail'),
+    path('', include('task_management.urls')),
+]
+
+
+@TEST_OVERRIDES
+class CacheClearingTestCase(TestCase):
+    # Caches outlive the per-test transaction, and SQLite reuses user IDs.
+    def setUp(self):
+        for backend in caches.all():
+            backend.clear()
+        # So are the activity events waiting to be written.
+        activity.buffer.clear()
+        self.addCleanup(activity.buffer.clear)
+
+    def assertWithinBudget(self, response):
+        """Fail if the request behind response went over its view's budget in tasks/metrics.py."""
+        metrics = response.request_metrics
+        self.assertIn(metrics.view_name, VIEW_BUDGETS, f"no budget declared for {metrics.view_name}")
+        problems = metrics.over_budget()
+        self.assertFalse(problems, f"{metrics.view_name} over budget: {', '.join(problems)}")
+
+
+class EffectiveStatusTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='alice', password='pass')
+        self.today = localdate()
+        self.past = Task.objects.create(title='past', owner=self.user, due_date=self.today - timedelta(days=1))
+        self.future = Task.objects.create(title='future', owner=self.user, due_date=self.today + timedelta(days=1))
+        self.undated = Task.objects.create(title='undated', owner=self.user)
+        self.done = Task.objects.create(title='done', owner=self.user, status='completed',
+                                        due_date=self.today - timedelta(days=3))
+
+    def titles(self, queryset):
+        return set(queryset.values_list('title', flat=True))
+
+    def test_overdue_is_derived_not_stored(self):
+        self.assertEqual(Task.objects.get(pk=self.past.pk).status, 'ongoing')
+        statuses = dict(Task.objects.with_effective_status().values_list('title', 'effective_status'))
+        self.assertEqual(statuses, {'past': 'overdue', 'future': 'ongoing', 'undated': 'ongoing', 'done': 'completed'})
+        self.assertEqual(self.past.effective_status, 'overdue')
+
+    def test_status_filters_match_annotation(self):
+        annotated = Task.objects.with_effective_status()
+        for status in ['ongoing', 'overdue', 'completed']:
+            with self.subTest(status=status):
+                self.assertEqual(
+                    self.titles(Task.objects.with_status(status)),
+                    self.titles(annotated.filter(effective_status=status)),
+                )
+        self.assertEqual(self.titles(Task.objects.with_status('all')), {'past', 'future', 'undated', 'done'})
+
+    def test_overdue_follows_the_date_without_writes(self):
+        tomorrow = self.today + timedelta(days=2)
+        self.assertEqual(self.titles(Task.objects.overdue(today=tomorrow)), {'past', 'future'})
+
+    def test_task_list_filters_and_does_not_write(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('task_list') + '?status=overdue')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t.title for t in response.context['tasks']], ['past'])
+        self.assertContains(response, 'bg-danger')
+        self.assertFalse(Task.objects.exclude(status__in=['ongoing', 'completed']).exists())
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql, params)
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+class VisibilityTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+        self.carol = User.objects.create_user(username='carol', password='pass')
+        self.team = Group.objects.create(name='team', admin=self.bob)
+        Membership.objects.create(group=self.team, user=self.bob)
+        Membership.objects.create(group=self.team, user=self.alice)
+        self.other = Group.objects.create(name='other', admin=self.alice)
+        Membership.objects.create(group=self.other, user=self.carol)
+
+        Task.objects.create(title='own', owner=self.alice)
+        Task.objects.create(title='assigned', owner=self.bob, assignee=self.alice)
+        Task.objects.create(title='member', owner=self.bob, group=self.team)
+        Task.objects.create(title='admin', owner=self.carol, group=self.other)
+        Task.objects.create(title='both', owner=self.alice, assignee=self.alice, group=self.team)
+        Task.objects.create(title='hidden', owner=self.carol)
+
+    def legacy_visible(self, user):
+        return Task.objects.filter(
+            Q(owner=user) | Q(assignee=user) | Q(group__members__user=user) | Q(group__admin=user)
+        ).distinct()
+
+    def test_matches_legacy_query_without_distinct(self):
+        for user in [self.alice, self.bob, self.carol]:
+            with self.subTest(user=user.username):
+                visible = Task.objects.visible_to(user)
+                self.assertEqual(sorted(visible.values_list('title', flat=True)),
+                                 sorted(self.legacy_visible(user).values_list('title', flat=True)))
+                self.assertNotIn('DISTINCT', str(visible.query))
+        self.assertEqual(Task.objects.visible_to(self.alice).count(), 5)
+
+
+class QueryPlanTests(CacheClearingTestCase):
+    # Runs on a small generated dataset by default; set PLAN_TEST_USERS=100000
+    # and PLAN_TEST_TASKS=1000000 to check the plan at production scale.
+    @classmethod
+    def setUpTestData(cls):
+        users = int(os.getenv('PLAN_TEST_USERS', '200'))
+        tasks = int(os.getenv('PLAN_TEST_TASKS', '2000'))
+        call_command('seed_tasks', users=users, groups=max(1, users // 10), tasks=tasks, stdout=StringIO())
+        cls.small = tasks < 100000
+        cls.user = User.objects.get(username='bench_user_0')
+
+    def setUp(self):
+        super().setUp()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE')
+                if self.small:
+                    # Tiny tables are cheaper to scan; only check indexes are usable.
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_task_list_uses_composite_indexes_for_every_status_filter(self):
+        for status in ['ongoing', 'overdue', 'completed', 'all']:
+            with self.subTest(status=status):
+                queryset = Task.objects.with_status(status).visible_to(self.user).order_by('due_date', '-created_at')
+                plan = explain(queryset)
+                self.assertNotRegex(plan, r'Seq Scan on tasks_task|SCAN (tasks_task|U0)\b')
+                self.assertIn('task_owner_status_due_idx', plan)
+                self.assertIn('task_assignee_status_due_idx', plan)
+                self.assertIn('task_group_due_created_idx', plan)
+
+    def test_group_tasks_use_group_index(self):
+        group = Group.objects.get(name='bench_group_0')
+        plan = explain(group.tasks.order_by('due_date', '-created_at'))
+        self.assertIn('task_group_due_created_idx', plan)
+
+    def test_open_tasks_use_partial_index(self):
+        plan = explain(Task.objects.ongoing().order_by('due_date', '-created_at')[:10])
+        self.assertIn('task_open_due_idx', plan)
+
+
+class CursorPaginationTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='alice', password='pass')
+        today = localdate()
+        tasks = []
+        for i in range(23):
+            due_date = None if i % 5 == 0 else today + timedelta(days=i % 4)
+            tasks.append(Task(title=f"task {i}", owner=self.user, due_date=due_date))
+        Task.objects.bulk_create(tasks)
+        self.expected = [t.title for t in Task.objects.order_by(
+            F('due_date').asc(nulls_last=True), '-created_at', '-id')]
+
+    def walk(self, paginator):
+        titles, page = [], paginator.page()
+        pages = [page]
+        while True:
+            titles += [t.title for t in page]
+            if not page.has_next():
+                return titles, pages
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+
+    def test_forward_and_backward_walks_cover_every_row_once(self):
+        paginator = CursorPaginator(Task.objects.all(), ('due_date', '-created_at', '-id'), 5)
+        titles, pages = self.walk(paginator)
+        self.assertEqual(titles, self.expected)
+        self.assertEqual(len(pages), 5)
+
+        page, backwards = pages[-1], []
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backwards = [t.title for t in page] + backwards
+        self.assertEqual(backwards, self.expected[:20])
+
+    def test_deep_pages_use_keyset_not_offset(self):
+        paginator = CursorPaginator(Task.objects.all(), ('due_date', '-created_at', '-id'), 5)
+        cursor = self.walk(paginator)[1][3].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.page(cursor))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_only_nullable_keys_get_a_nulls_clause(self):
+        paginator = CursorPaginator(Task.objects.all(), ('due_date', '-created_at', '-id'), 5)
+        backwards = paginator.page(self.walk(paginator)[1][1].previous_cursor)
+        for page, expected in [(paginator.page(), '"due_date" ASC NULLS LAST'),
+                               (backwards, '"due_date" DESC NULLS FIRST')]:
+            order_by = str(page._queryset.query).split('ORDER BY')[1]
+            self.assertIn(expected, order_by)
+            self.assertEqual(order_by.count('NULLS'), 1)
+
+    def test_views_paginate_with_cursor_tokens(self):
+        group = Group.objects.create(name='team', admin=self.user)
+        Membership.objects.create(group=group, user=self.user)
+        Task.objects.update(group=group)
+        self.client.force_login(self.user)
+
+        for url in [reverse('task_list') + '?status=all', reverse('group_detail', args=[group.pk])]:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertEqual(len(first.context['tasks']), 10)
+                separator = '&' if '?' in url else '?'
+                second = self.client.get(f"{url}{separator}cursor={first.context['page_obj'].next_cursor}")
+                self.assertEqual([t.title for t in second.context['tasks']], self.expected[10:20])
+                self.assertEqual(self.client.get(f"{url}{separator}cursor=bogus").status_code, 404)
+
+    def test_group_task_count_is_exact_up_to_the_cap(self):
+        group = Group.objects.create(name='team', admin=self.user)
+        Task.objects.filter(title__in=['task 1', 'task 2', 'task 3']).update(group=group)
+        self.client.force_login(self.user)
+        url = reverse('group_detail', args=[group.pk])
+        self.assertContains(self.client.get(url), 'Group Tasks (3)')
+        with mock.patch('tasks.pagination.APPROXIMATE_COUNT_CAP', 2):
+            caches['fragments'].clear()
+            self.assertContains(self.client.get(url), 'Group Tasks (2+)')
+
+
+class QueryCountTests(CacheClearingTestCase):
+    """Each list page issues the same number of queries however many rows it shows."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for i in range(count):
+            member = User.objects.create(username=f"member{Membership.objects.count()}")
+            Membership.objects.create(group=self.group, user=member)
+            Task.objects.create(title=f"task {i}", owner=self.admin, assignee=member, group=self.group,
+                                due_date=localdate() - timedelta(days=i))
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url):
+        self.count_queries(url)  # warm the group-access cache
+        self.add_rows(1)
+        baseline = self.count_queries(url)
+        self.add_rows(9)
+        self.assertEqual(self.count_queries(url), baseline, f"query count grows with rows on {url}")
+
+    def test_task_list(self):
+        for status in ['ongoing', 'overdue', 'all']:
+            with self.subTest(status=status):
+                self.assertConstantQueries(reverse('task_list') + f'?status={status}')
+
+    def test_group_detail(self):
+        self.assertConstantQueries(reverse('group_detail', args=[self.group.pk]))
+
+    def test_group_list(self):
+        for i in range(3):
+            Group.objects.create(name=f"extra {i}", admin=self.admin)
+        self.assertConstantQueries(reverse('group_list'))
+
+
+class GroupAccessCacheTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.member = User.objects.create_user(username='member', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        self.membership = Membership.objects.create(group=self.group, user=self.member)
+        self.client.force_login(self.member)
+
+    def permission_queries(self, queries):
+        # The GroupAccess query, not the counters' lookups of other users' access.
+        return [q['sql'] for q in queries if '"is_admin"' in q['sql']]
+
+    def test_writes_read_group_access_from_the_database(self):
+        url = reverse('task_create_for_group', args=[self.group.pk])
+        data = {'title': 'Write report', 'status': 'ongoing'}
+        self.client.get(url)  # warm the cache
+
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.post(url, data).status_code, 302)
+            # Once per request, however many checks use it.
+            self.assertEqual(len(self.permission_queries(queries)), 1)
+        self.assertEqual(Task.objects.filter(group=self.group, assignee=self.member).count(), 2)
+
+    def test_writes_ignore_stale_cache_from_other_workers(self):
+        task = Task.objects.create(title='t', owner=self.member, group=self.group)
+        self.client.force_login(self.admin)
+        get_group_access(User.objects.get(pk=self.admin.pk))  # warm the cache
+        # Another worker demotes the admin: this process's cache isn't told.
+        other = User.objects.create_user(username='other')
+        with mock.patch('users.signals.invalidate_group_access'):
+            Group.objects.filter(pk=self.group.pk).update(admin=other)
+            Membership.objects.filter(user=self.admin).delete()
+        self.assertTrue(get_group_access(User.objects.get(pk=self.admin.pk)).is_admin(self.group.pk))
+
+        response = self.client.post(reverse('task_update', args=[task.pk]), {'title': 'x', 'status': 'ongoing'})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse('task_delete', args=[task.pk]))
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse('group_edit', args=[self.group.pk]), {'name': 'renamed'})
+        self.assertRedirects(response, reverse('group_list'), fetch_redirect_response=False)
+        self.assertEqual(apply_bulk_action(User.objects.get(pk=self.admin.pk), 'delete', [str(task.pk)]),
+                         {str(task.pk): 'forbidden'})
+        response = self.client.post(reverse('task_create_for_group', args=[self.group.pk]),
+                                    {'title': 'y', 'status': 'ongoing'})
+        self.assertRedirects(response, reverse('group_list'), fetch_redirect_response=False)
+        task.refresh_from_db()
+        self.assertEqual((task.title, Group.objects.get(pk=self.group.pk).name), ('t', 'team'))
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_only_the_owner_or_group_admin_can_delete_a_task(self):
+        task = Task.objects.create(title='t', owner=self.admin, group=self.group)
+        outsider = User.objects.create_user(username='outsider', password='pass')
+        for user in (self.member, outsider):
+            self.client.force_login(user)
+            self.client.post(reverse('task_delete', args=[task.pk]))
+            self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+        self.client.force_login(self.admin)
+        self.client.post(reverse('task_delete', args=[task.pk]))
+        self.assertFalse(Task.objects.filter(pk=task.pk).exists())
+
+    def test_membership_changes_invalidate_cache(self):
+        self.assertTrue(get_group_access(User.objects.get(pk=self.member.pk)).is_member(self.group.pk))
+        self.membership.delete()
+        self.assertFalse(get_group_access(User.objects.get(pk=self.member.pk)).can_access(self.group.pk))
+
+        response = self.client.get(reverse('task_create_for_group', args=[self.group.pk]))
+        self.assertRedirects(response, reverse('group_list'), fetch_redirect_response=False)
+
+    def test_admin_changes_invalidate_cache(self):
+        self.assertTrue(get_group_access(User.objects.get(pk=self.admin.pk)).is_admin(self.group.pk))
+        group = Group.objects.get(pk=self.group.pk)
+        group.admin = self.member
+        group.save()
+        self.assertFalse(get_group_access(User.objects.get(pk=self.admin.pk)).is_admin(self.group.pk))
+        self.assertTrue(get_group_access(User.objects.get(pk=self.member.pk)).is_admin(self.group.pk))
+
+
+class UserPickerTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        self.client.force_login(self.admin)
+
+    def add_users(self, count):
+        start = User.objects.count()
+        User.objects.bulk_create([User(username=f"user{start + i}") for i in range(count)])
+
+    def render(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), len(queries)
+
+    def test_forms_render_only_selected_users(self):
+        member = User.objects.create(username='member')
+        Membership.objects.create(group=self.group, user=member)
+        for url in [reverse('task_create'), reverse('group_members_manage', args=[self.group.pk])]:
+            with self.subTest(url=url):
+                self.render(url)  # warm the group-access cache
+                self.add_users(5)
+                small_html, small_queries = self.render(url)
+                self.add_users(200)
+                large_html, large_queries = self.render(url)
+                self.assertEqual(large_queries, small_queries)
+                self.assertEqual(large_html.count('<option'), small_html.count('<option'))
+                self.assertIn('data-user-search-url', large_html)
+        self.assertIn('selected>member</option>', large_html)
+
+    def test_posted_ids_are_still_validated(self):
+        outsider = User.objects.create(username='outsider')
+        url = reverse('task_create_for_group', args=[self.group.pk])
+        response = self.client.post(url, {'title': 'x', 'status': 'ongoing', 'assignee': outsider.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('assignee', response.context['form'].errors)
+
+        response = self.client.post(reverse('group_members_manage', args=[self.group.pk]),
+                                    {'members': [outsider.pk]})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Membership.objects.filter(group=self.group, user=outsider).exists())
+
+    def test_invalid_ids_rerender_the_form(self):
+        response = self.client.post(reverse('task_create'), {'title': 'x', 'status': 'ongoing', 'assignee': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('assignee', response.context['form'].errors)
+
+        response = self.client.post(reverse('group_members_manage', args=[self.group.pk]),
+                                    {'members': ['abc', '']})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('members', response.context['form'].errors)
+
+
+class GroupMemberSyncTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        self.client.force_login(self.admin)
+        self.url = reverse('group_members_manage', args=[self.group.pk])
+        self.client.get(self.url)  # warm the group-access cache
+
+    def sync(self, users):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'members': [u.pk for u in users]})
+        self.assertEqual(response.status_code, 302)
+        return len(queries)
+
+    def make_users(self, prefix, count):
+        return User.objects.bulk_create([User(username=f"{prefix}{i}") for i in range(count)])
+
+    def member_ids(self):
+        return set(self.group.members.values_list('user_id', flat=True))
+
+    def test_diff_is_applied(self):
+        keep, drop, add = self.make_users('keep', 2), self.make_users('drop', 2), self.make_users('add', 2)
+        self.sync(keep + drop)
+        self.sync(keep + add)
+        self.assertEqual(self.member_ids(), {u.pk for u in [self.admin] + keep + add})
+
+    def test_query_count_is_constant(self):
+        add_small = self.sync(self.make_users('a', 5))
+        remove_small = self.sync([])
+        add_large = self.sync(self.make_users('b', 100))
+        remove_large = self.sync([])
+        self.assertEqual(add_small, add_large)
+        self.assertEqual(remove_small, remove_large)
+
+
+class FragmentCacheTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        self.task = Task.objects.create(title='first', owner=self.admin, group=self.group, due_date=localdate())
+        self.client.force_login(self.admin)
+        self.url = reverse('group_detail', args=[self.group.pk])
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), len(queries)
+
+    def test_cached_render_skips_fragment_queries(self):
+        _, cold = self.get(self.url)
+        content, warm = self.get(self.url)
+        self.assertLess(warm, cold)
+        self.assertIn('first', content)
+
+    def test_writes_are_visible_on_next_render(self):
+        self.get(self.url)
+        Task.objects.create(title='second', owner=self.admin, group=self.group, due_date=localdate())
+        self.assertIn('second', self.get(self.url)[0])
+
+        complete_url = reverse('task_complete', args=[self.task.pk])
+        self.assertIn(complete_url, self.get(self.url)[0])
+        self.client.post(complete_url)
+        self.assertNotIn(complete_url, self.get(self.url)[0])
+
+        newcomer = User.objects.create(username='newcomer')
+        self.client.post(reverse('group_members_manage', args=[self.group.pk]), {'members': [newcomer.pk]})
+        self.assertIn('newcomer', self.get(self.url)[0])
+
+    def test_task_list_follows_group_changes(self):
+        url = reverse('task_list') + '?status=all'
+        self.get(url)
+        self.assertIn('<h6 class="mb-0">first</h6>', self.get(url)[0])
+        self.task.delete()
+        self.assertNotIn('<h6 class="mb-0">first</h6>', self.get(url)[0])
+
+    def test_renaming_a_user_refreshes_their_fragments(self):
+        other = User.objects.create_user(username='other', password='pass')
+        Membership.objects.create(group=self.group, user=other)
+        self.task.assignee = other
+        self.task.save()
+        list_url = reverse('task_list') + '?status=all'
+        self.get(self.url)
+        self.get(list_url)
+
+        other.last_login = timezone.now()
+        other.save(update_fields=['last_login'])
+        content, warm = self.get(self.url)
+        self.assertIn('other', content)
+
+        other.username = 'renamed'
+        other.save()
+        content, cold = self.get(self.url)
+        self.assertGreater(cold, warm)
+        self.assertIn('renamed', content)
+        self.assertIn('renamed', self.get(list_url)[0])
+
+    def test_task_list_version_follows_memberships_changed_by_other_workers(self):
+        joiner = User.objects.create(username='joiner')
+        get_group_access(joiner)
+        stale = cache.get(group_access_key(joiner.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            Membership.objects.create(group=self.group, user=joiner)
+        # Another worker's per-process access cache still has the old groups.
+        cache.set(group_access_key(joiner.pk), stale)
+        version = task_list_fragment_version(User.objects.get(pk=joiner.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='second', owner=self.admin, group=self.group)
+        self.assertNotEqual(task_list_fragment_version(User.objects.get(pk=joiner.pk)), version)
+
+    def test_cached_fragments_hold_no_csrf_token(self):
+        # Members share the group's fragments; each must still get their own token.
+        tokens = []
+        for username in ['one', 'two']:
+            member = User.objects.create(username=username)
+            Membership.objects.create(group=self.group, user=member)
+        self.get(self.url)
+        for username in ['one', 'two']:
+            self.client.force_login(User.objects.get(username=username))
+            content, _ = self.get(self.url)
+            self.assertIn('form="task-action-form"', content)
+            tokens.append(set(re.findall(r'name="csrfmiddlewaretoken" value="([^"]+)"', content)))
+        self.assertEqual(len(tokens[0]), 1)
+        self.assertEqual(len(tokens[1]), 1)
+        self.assertNotEqual(tokens[0], tokens[1])
+
+
+class BulkActionTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.member = User.objects.create(username='member')
+        self.outsider = User.objects.create(username='outsider')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        Membership.objects.create(group=self.group, user=self.member)
+        self.url = reverse('task_bulk')
+
+    def make_tasks(self, count, **kwargs):
+        return Task.objects.bulk_create([Task(title=f"task {i}", **kwargs) for i in range(count)])
+
+    def post(self, user, data):
+        self.client.force_login(user)
+        self.client.get(reverse('task_list'))  # warm the group-access cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, json.dumps(data), content_type='application/json')
+        return response, queries
+
+    def test_complete_follows_single_task_rules(self):
+        group_task, = self.make_tasks(1, owner=self.admin, group=self.group)
+        own_task, = self.make_tasks(1, owner=self.member)
+        foreign_task, = self.make_tasks(1, owner=self.outsider)
+        done_task, = self.make_tasks(1, owner=self.member, status='completed')
+        ids = [str(t.pk) for t in (group_task, own_task, foreign_task, done_task)] + ['nonsense', str(uuid.uuid4())]
+
+        response, _ = self.post(self.member, {'action': 'complete', 'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['results'].values()),
+                         ['ok', 'ok', 'forbidden', 'unchanged', 'invalid', 'not_found'])
+        self.assertEqual(Task.objects.filter(status='completed').count(), 3)
+
+    def test_members_cannot_delete_group_tasks(self):
+        tasks = self.make_tasks(2, owner=self.admin, group=self.group)
+        response, _ = self.post(self.member, {'action': 'delete', 'ids': [str(t.pk) for t in tasks]})
+        self.assertEqual(set(response.json()['results'].values()), {'forbidden'})
+        response, _ = self.post(self.admin, {'action': 'delete', 'ids': [str(t.pk) for t in tasks]})
+        self.assertEqual(set(response.json()['results'].values()), {'ok'})
+        self.assertFalse(Task.objects.exists())
+
+    def test_reassign_requires_group_membership(self):
+        group_task, = self.make_tasks(1, owner=self.admin, group=self.group)
+        personal_task, = self.make_tasks(1, owner=self.admin)
+        ids = [str(group_task.pk), str(personal_task.pk)]
+        response, _ = self.post(self.admin, {'action': 'reassign', 'ids': ids, 'assignee': self.outsider.pk})
+        self.assertEqual(list(response.json()['results'].values()), ['invalid', 'ok'])
+        response, _ = self.post(self.admin, {'action': 'reassign', 'ids': ids, 'assignee': self.member.pk})
+        self.assertEqual(list(response.json()['results'].values()), ['ok', 'ok'])
+        self.assertEqual(set(Task.objects.values_list('assignee_id', flat=True)), {self.member.pk})
+
+    def test_move_group_needs_access_to_target(self):
+        tasks = self.make_tasks(2, owner=self.member)
+        other = Group.objects.create(name='other', admin=self.outsider)
+        response, _ = self.post(self.member, {'action': 'move_group', 'ids': [str(t.pk) for t in tasks],
+                                              'group': str(other.pk)})
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.post(self.member, {'action': 'move_group', 'ids': [str(t.pk) for t in tasks],
+                                              'group': str(self.group.pk)})
+        self.assertEqual(set(response.json()['results'].values()), {'ok'})
+        self.assertEqual(self.group.tasks.count(), 2)
+
+    def test_single_select_and_single_write(self):
+        for action in ['complete', 'delete']:
+            counts = []
+            for size in [2, 150]:
+                ids = [str(t.pk) for t in self.make_tasks(size, owner=self.admin)]
+                response, queries = self.post(self.admin, {'action': action, 'ids': ids})
+                self.assertEqual(set(response.json()['results'].values()), {'ok'})
+                writes = [q['sql'] for q in queries if q['sql'].startswith(('UPDATE "tasks_task"', 'DELETE'))]
+                self.assertEqual(len(writes), 1, writes)
+                counts.append(len(queries))
+            self.assertEqual(counts[0], counts[1], action)
+
+    def test_form_post_redirects_with_summary(self):
+        task, = self.make_tasks(1, owner=self.admin)
+        self.client.force_login(self.admin)
+        self.assertContains(self.client.get(reverse('task_list')), '<h6 class="mb-0">task 0</h6>')
+        response = self.client.post(self.url, {'action': 'complete', 'ids': [str(task.pk)]}, follow=True)
+        self.assertContains(response, '1 task(s) updated.')
+        # The cached ongoing list must not still show the completed task.
+        self.assertNotContains(response, '<h6 class="mb-0">task 0</h6>')
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'completed')
+
+
+class ExportTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.outsider = User.objects.create(username='outsider')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        Task.objects.create(title='mine, "quoted"', owner=self.admin, due_date=localdate() - timedelta(days=1))
+        Task.objects.create(title='group task', owner=self.outsider, group=self.group)
+        Task.objects.create(title='hidden', owner=self.outsider)
+        self.client.force_login(self.admin)
+
+    def export(self, **params):
+        response = self.client.get(reverse('task_export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_contains_visible_tasks_only(self):
+        rows = list(csv.DictReader(StringIO(self.export())))
+        self.assertEqual(sorted(row['title'] for row in rows), ['group task', 'mine, "quoted"'])
+        mine = next(row for row in rows if row['title'].startswith('mine'))
+        self.assertEqual((mine['status'], mine['owner']), ('overdue', 'admin'))
+
+    def test_ndjson_group_export(self):
+        rows = [json.loads(line) for line in self.export(format='ndjson', group=self.group.pk).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['group task'])
+        self.assertEqual(rows[0]['group'], 'team')
+
+    def test_group_export_requires_access(self):
+        self.client.force_login(self.outsider)
+        response = self.client.get(reverse('task_export'), {'group': self.group.pk})
+        self.assertEqual(response.status_code, 404)
+
+    def test_removed_member_cannot_export_the_group(self):
+        membership = Membership.objects.create(group=self.group, user=self.outsider)
+        self.client.force_login(self.outsider)
+        self.export(group=self.group.pk)
+        stale = cache.get(group_access_key(self.outsider.pk))
+        membership.delete()
+        # Another worker's per-process access cache still has the membership.
+        cache.set(group_access_key(self.outsider.pk), stale)
+        response = self.client.get(reverse('task_export'), {'group': self.group.pk})
+        self.assertEqual(response.status_code, 404)
+
+    def test_command_matches_view(self):
+        out = StringIO()
+        call_command('export_tasks', username='admin', format='ndjson', stdout=out)
+        self.assertEqual(out.getvalue(), self.export(format='ndjson'))
+
+
+class ImportTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin')
+        self.member = User.objects.create(username='member')
+        self.outsider = User.objects.create(username='outsider')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        Membership.objects.create(group=self.group, user=self.member)
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        out = StringIO()
+        call_command('import_tasks', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_csv_import_with_rejects(self):
+        yesterday = (localdate() - timedelta(days=1)).isoformat()
+        path = self.write('tasks.csv', (
+            "title,status,due_date,owner,assignee,group\n"
+            f"late,overdue,{yesterday},admin,member,team\n"
+            f'"with, comma",completed,,member,,{self.group.pk}\n'
+            "personal,,,outsider,admin,\n"
+            "nobody,ongoing,,ghost,,\n"
+            "lost,ongoing,,admin,,nowhere\n"
+            "stranger,ongoing,,admin,outsider,team\n"
+            "bad date,ongoing,tomorrow,admin,,\n"
+        ))
+        output = self.run_import(path, batch_size=2)
+        self.assertIn('Imported 3 of 7 rows', output)
+
+        late = Task.objects.get(title='late')
+        self.assertEqual((late.status, late.effective_status, late.group_id), ('ongoing', 'overdue', self.group.pk))
+        self.assertEqual(Task.objects.get(title='with, comma').group_id, self.group.pk)
+        self.assertEqual(Task.objects.get(title='personal').assignee_id, self.admin.pk)
+
+        with open(path + '.rejects.csv', newline='') as f:
+            rejects = {row['title']: row['error'] for row in csv.DictReader(f)}
+        self.assertEqual(set(rejects), {'nobody', 'lost', 'stranger', 'bad date'})
+        self.assertEqual(rejects['stranger'], 'assignee is not a member of the group')
+
+    def test_round_trip_from_export(self):
+        Task.objects.create(title='one', owner=self.admin, group=self.group, assignee=self.member)
+        Task.objects.create(title='two', owner=self.admin, due_date=localdate())
+        out = StringIO()
+        call_command('export_tasks', username='admin', format='ndjson', stdout=out)
+        path = self.write('tasks.ndjson', out.getvalue() + "not json\n")
+
+        output = self.run_import(path)
+        self.assertIn('Imported 2 of 3 rows', output)
+        self.assertEqual(Task.objects.filter(title='one', group=self.group, assignee=self.member).count(), 2)
+        with open(path + '.rejects.ndjson') as f:
+            self.assertEqual(json.loads(f.read())['error'], 'not a JSON object')
+
+    def test_clean_import_leaves_no_rejects_file(self):
+        path = self.write('tasks.csv', "title,owner\nonly,admin\n")
+        self.run_import(path)
+        self.assertFalse(os.path.exists(path + '.rejects.csv'))
+
+    def test_unreadable_paths(self):
+        missing = os.path.join(self.dir.name, 'missing.csv')
+        with self.assertRaisesMessage(CommandError, f"Can't read {missing}"):
+            self.run_import(missing)
+        path = self.write('tasks.csv', "title,owner\nonly,admin\n")
+        rejects = os.path.join(self.dir.name, 'no', 'such', 'dir.csv')
+        with self.assertRaisesMessage(CommandError, f"Can't write {rejects}"):
+            self.run_import(path, rejects=rejects)
+
+    def test_copy_writes_csv_rows(self):
+        importer = TaskImporter(use_copy=True)
+        task = Task(title='with, comma', description=None, owner=self.admin, group=self.group,
+                    due_date=localdate())
+        expected_sql = f"COPY tasks_task ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        for psycopg3 in (True, False):
+            with self.subTest(psycopg3=psycopg3), \
+                    mock.patch('django.db.backends.postgresql.psycopg_any.is_psycopg3', psycopg3), \
+                    mock.patch.object(connections['default'], 'cursor') as cursor:
+                cursor = cursor.return_value.__enter__.return_value
+                importer._copy([task])
+                if psycopg3:
+                    cursor.copy.assert_called_once_with(expected_sql)
+                    data = cursor.copy.return_value.__enter__.return_value.write.call_args.args[0]
+                else:
+                    sql, buffer = cursor.copy_expert.call_args.args
+                    self.assertEqual(sql, expected_sql)
+                    data = buffer.getvalue()
+                row = next(csv.reader(StringIO(data)))
+                values = dict(zip(COPY_COLUMNS, row))
+                self.assertEqual((values['id'], values['title'], values['description'], values['owner_id']),
+                                 (str(task.pk), 'with, comma', '', str(self.admin.pk)))
+                self.assertEqual((values['assignee_id'], values['due_date']), ('', localdate().isoformat()))
+
+
+class ApiTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.member = User.objects.create(username='member')
+        self.outsider = User.objects.create(username='outsider')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        Membership.objects.create(group=self.group, user=self.member)
+        self.task = Task.objects.create(title='group task', owner=self.admin, group=self.group)
+        Task.objects.create(title='hidden', owner=self.outsider)
+        self.client.force_login(self.member)
+
+    def get(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers=headers)
+        return response, [q['sql'] for q in queries]
+
+    def send(self, method, url, data):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+    def test_task_list_matches_html_visibility(self):
+        response, _ = self.get(reverse('api_task_list') + '?status=all')
+        self.assertEqual([row['title'] for row in response.json()['results']], ['group task'])
+        self.assertEqual(response.json()['results'][0]['group'], {'id': str(self.group.pk), 'name': 'team'})
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_unchanged_polls_return_304_without_loading_rows(self):
+        for url in [reverse('api_task_list'), reverse('api_task_detail', args=[self.task.pk]),
+                    reverse('api_group_list'), reverse('api_group_detail', args=[self.group.pk])]:
+            with self.subTest(url=url):
+                first, _ = self.get(url)
+                self.assertEqual(first.status_code, 200)
+                response, queries = self.get(url, if_none_match=first['ETag'])
+                self.assertEqual(response.status_code, 304)
+                # At most the single updated_at lookup of the task detail.
+                self.assertLessEqual(len([sql for sql in queries if 'tasks_task' in sql]), 1)
+                self.assertFalse([sql for sql in queries if '"title"' in sql or 'users_membership' in sql])
+                response, _ = self.get(url, if_modified_since=first['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        list_url, detail_url = reverse('api_task_list'), reverse('api_task_detail', args=[self.task.pk])
+        list_etag, detail_etag = self.get(list_url)[0]['ETag'], self.get(detail_url)[0]['ETag']
+        self.client.post(reverse('api_task_complete', args=[self.task.pk]))
+        self.assertEqual(self.get(list_url, if_none_match=list_etag)[0].status_code, 200)
+        response, _ = self.get(detail_url, if_none_match=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'completed')
+
+    def test_create_and_update(self):
+        response = self.send('post', reverse('api_task_list'), {'title': 'new', 'group': str(self.group.pk)})
+        self.assertEqual(response.status_code, 201)
+        created = response.json()
+        self.assertEqual((created['assignee']['username'], created['status']), ('member', 'ongoing'))
+        self.assertEqual(response['Location'], reverse('api_task_detail', args=[created['id']]))
+
+        response = self.send('post', reverse('api_task_list'), {'title': 'x', 'group': str(uuid.uuid4())})
+        self.assertIn('group', response.json()['errors'])
+
+        url = reverse('api_task_detail', args=[created['id']])
+        response = self.send('patch', url, {'title': 'renamed'})
+        self.assertEqual((response.status_code, response.json()['title']), (200, 'renamed'))
+        self.assertEqual(response.json()['group']['id'], str(self.group.pk))
+
+    def test_update_follows_owner_or_admin_rule(self):
+        url = reverse('api_task_detail', args=[self.task.pk])
+        self.assertEqual(self.send('patch', url, {'title': 'nope'}).status_code, 403)
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.send('patch', url, {'title': 'nope'}).status_code, 404)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.send('patch', url, {'title': 'yes'}).json()['title'], 'yes')
+
+    def test_group_endpoints(self):
+        response, _ = self.get(reverse('api_group_detail', args=[self.group.pk]))
+        data = response.json()
+        self.assertEqual([m['username'] for m in data['members']], ['admin', 'member'])
+        self.assertEqual([t['title'] for t in data['tasks']['results']], ['group task'])
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.get(reverse('api_group_detail', args=[self.group.pk]))[0].status_code, 404)
+        self.assertEqual(self.get(reverse('api_group_list'))[0].json(), {'results': []})
+
+    def test_anonymous_gets_401(self):
+        self.client.logout()
+        self.assertEqual(self.get(reverse('api_task_list'))[0].status_code, 401)
+
+
+class RecordingBroker(BaseBroker):
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, channel, message):
+        self.messages.append((channel, json.loads(message)))
+
+
+@override_settings(TASK_EVENTS_BROKER='tasks.tests.RecordingBroker')
+class GroupEventTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        self.other = Group.objects.create(name='other', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+
+    def events(self, action):
+        get_broker().messages.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        return [(channel, message['type']) for channel, message in get_broker().messages]
+
+    def test_task_lifecycle(self):
+        channel, other = group_channel(self.group.pk), group_channel(self.other.pk)
+        task = Task(title='t', owner=self.admin, group=self.group)
+        self.assertEqual(self.events(task.save), [(channel, 'task.created')])
+        task.title = 'renamed'
+        self.assertEqual(self.events(task.save), [(channel, 'task.updated')])
+        self.assertEqual(get_broker().messages[0][1]['task']['title'], 'renamed')
+        task.status = 'completed'
+        self.assertEqual(self.events(task.save), [(channel, 'task.completed')])
+        task.group = self.other
+        self.assertEqual(self.events(task.save), [(channel, 'task.deleted'), (other, 'task.created')])
+        self.assertEqual(self.events(task.delete), [(other, 'task.deleted')])
+        self.assertEqual(self.events(lambda: Task.objects.create(title='p', owner=self.admin)), [])
+
+    def test_rolled_back_changes_are_not_published(self):
+        def fail():
+            with transaction.atomic():
+                Task.objects.create(title='t', owner=self.admin, group=self.group)
+                transaction.set_rollback(True)
+        self.assertEqual(self.events(fail), [])
+
+    def test_bulk_and_membership_events(self):
+        tasks = Task.objects.bulk_create([Task(title=f"t{i}", owner=self.admin, group=self.group) for i in range(3)])
+        events = self.events(lambda: apply_bulk_action(self.admin, 'complete', [str(t.pk) for t in tasks]))
+        self.assertEqual(events, [(group_channel(self.group.pk), 'task.completed')] * 3)
+        member = User.objects.create(username='member')
+        self.client.force_login(self.admin)
+        events = self.events(lambda: self.client.post(reverse('group_members_manage', args=[self.group.pk]),
+                                                      {'members': [member.pk]}))
+        self.assertIn((group_channel(self.group.pk), 'member.added'), events)
+
+
+class InProcessBrokerTests(SimpleTestCase):
+    async def test_publish_from_another_thread(self):
+        broker = InProcessBroker()
+        subscription = broker.subscribe('group:1')
+        await sync_to_async(broker.publish, thread_sensitive=False)('group:1', 'hello')
+        broker.publish('group:2', 'elsewhere')
+        self.assertEqual(await subscription.get(timeout=1), 'hello')
+        self.assertIsNone(await subscription.get(timeout=0.01))
+        subscription.close()
+        broker.publish('group:1', 'after close')
+        self.assertEqual(broker._subscriptions, {})
+
+    async def test_slow_subscriber_gets_resync(self):
+        broker = InProcessBroker(max_queue=2)
+        subscription = broker.subscribe('group:1')
+        for i in range(5):
+            broker.publish('group:1', str(i))
+        await asyncio.sleep(0)
+        self.assertEqual([await subscription.get(timeout=1) for _ in range(3)], ['0', '1', RESYNC])
+
+
+class GroupEventsViewTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.outsider = User.objects.create(username='outsider')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        self.url = reverse('group_events', args=[self.group.pk])
+
+    def test_wsgi_is_refused(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+    async def test_streams_group_events(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        # Subscribed by now; anything published reaches this client.
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        get_broker().publish(group_channel(self.group.pk), json.dumps({'type': 'task.deleted', 'task': {'id': 'x'}}))
+        chunk = await asyncio.wait_for(pending, 1)
+        self.assertEqual(chunk, b'event: task.deleted\ndata: {"type": "task.deleted", "task": {"id": "x"}}\n\n')
+        await stream.aclose()
+
+    async def test_stream_unsubscribes_on_disconnect_and_removal(self):
+        channel = group_channel(self.group.pk)
+        stream = GroupEventsView().stream(self.group.pk, self.admin.pk)
+        await anext(stream)
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        self.assertIn(channel, get_broker()._subscriptions)
+        pending.cancel()  # what the ASGI handler does when the client goes away
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertNotIn(channel, get_broker()._subscriptions)
+
+        stream = GroupEventsView().stream(self.group.pk, self.admin.pk)
+        await anext(stream)
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        get_broker().publish(channel, json.dumps({'type': 'member.removed', 'user_id': self.admin.pk}))
+        self.assertIn(b'member.removed', (await pending).encode())
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertNotIn(channel, get_broker()._subscriptions)
+
+    @override_settings(TASK_EVENTS_HEARTBEAT=0.05)
+    async def test_stream_ends_once_access_is_gone(self):
+        # A removal made in another process sends this one no event.
+        member = await User.objects.acreate(username='member')
+        membership = await Membership.objects.acreate(group=self.group, user=member)
+        stream = GroupEventsView().stream(self.group.pk, member.pk)
+        await anext(stream)
+        self.assertEqual(await anext(stream), ': keep-alive\n\n')
+        await Membership.objects.filter(pk=membership.pk).adelete()
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(anext(stream), 1)
+
+    async def test_requires_access_in_the_database(self):
+        member = await User.objects.acreate(username='member')
+        await self.async_client.aforce_login(member)
+        membership = await Membership.objects.acreate(group=self.group, user=member)
+        await sync_to_async(get_group_access)(await User.objects.aget(pk=member.pk))
+        stale = await cache.aget(group_access_key(member.pk))
+        await Membership.objects.filter(pk=membership.pk).adelete()
+        # Another worker's per-process access cache still has the membership.
+        await cache.aset(group_access_key(member.pk), stale)
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 404)
+
+    async def test_requires_access(self):
+        await self.async_client.aforce_login(self.outsider)
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 404)
+        await self.async_client.alogout()
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 401)
+
+
+@override_settings(ROOT_URLCONF='tasks.tests')
+class AsyncViewTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.member = User.objects.create(username='member')
+        self.outsider = User.objects.create(username='outsider')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        Membership.objects.create(group=self.group, user=self.member)
+        for i in range(12):
+            Task.objects.create(title=f'task {i:02}', owner=self.admin, group=self.group,
+                                due_date=localdate() + timedelta(days=i))
+        Task.objects.create(title='private', owner=self.admin)
+        self.client.force_login(self.admin)
+
+    async def get(self, url, user=None):
+        await self.async_client.aforce_login(user or self.admin)
+        # The ORM runs on the test's sync thread, so capture its connection there.
+        queries = CaptureQueriesContext(connection)
+        await sync_to_async(queries.__enter__)()
+        response = await self.async_client.get(url)
+        await sync_to_async(queries.__exit__)(None, None, None)
+        return response, await sync_to_async(lambda: [query['sql'] for query in queries])()
+
+    def titles(self, response):
+        return re.findall(r'task \d\d|private', response.content.decode())
+
+    async def test_pages_match_sync_views(self):
+        pages = [
+            ('async_task_list', 'task_list', [], '?status=all'),
+            ('async_group_list', 'group_list', [], ''),
+            ('async_group_detail', 'group_detail', [self.group.pk], ''),
+        ]
+        for async_name, sync_name, args, query in pages:
+            response, _ = await self.get(reverse(async_name, args=args) + query)
+            self.assertEqual(response.status_code, 200)
+            # Cleared so the sync view renders the fragments itself.
+            await sync_to_async(caches['fragments'].clear)()
+            expected = await sync_to_async(self.client.get)(reverse(sync_name, args=args) + query)
+            self.assertEqual(self.titles(response), self.titles(expected))
+        response, _ = await self.get(reverse('async_group_list'))
+        self.assertContains(response, '2 Members')
+        self.assertContains(response, '12 Tasks')
+
+    async def test_cached_fragments_skip_task_queries(self):
+        url = reverse('async_group_detail', args=[self.group.pk])
+        response, cold = await self.get(url)
+        self.assertContains(response, 'member')
+        self.assertTrue(any('"tasks_task"' in sql for sql in cold))
+        response, warm = await self.get(url)
+        self.assertContains(response, 'task 00')
+        self.assertFalse(any('"tasks_task"' in sql or '"users_membership"."date_joined"' in sql for sql in warm))
+
+    async def test_fragment_keys_match_templates(self):
+        # A render by the sync view is found by the async one.
+        for async_name, sync_name, args in [('async_task_list', 'task_list', []),
+                                            ('async_group_detail', 'group_detail', [self.group.pk])]:
+            await sync_to_async(self.client.get)(reverse(sync_name, args=args))
+            _, queries = await self.get(reverse(async_name, args=args))
+            self.assertFalse(any('"tasks_task"' in sql for sql in queries), async_name)
+
+    async def test_pagination(self):
+        url = reverse('async_group_detail', args=[self.group.pk])
+        response, _ = await self.get(url)
+        cursor = response.context['page_obj'].next_cursor
+        self.assertEqual(self.titles(response), [f'task {i:02}' for i in range(10)])
+        response, _ = await self.get(f'{url}?cursor={cursor}')
+        self.assertEqual(self.titles(response), ['task 10', 'task 11'])
+        response, _ = await self.get(f'{url}?cursor=bogus')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_access(self):
+        url = reverse('async_group_detail', args=[self.group.pk])
+        response, _ = await self.get(url, self.outsider)
+        self.assertEqual(response.status_code, 404)
+        response, _ = await self.get(reverse('async_task_list') + '?status=all', self.member)
+        self.assertNotIn('private', self.titles(response))
+        await self.async_client.alogout()
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(settings.LOGIN_URL))
+
+
+class TaskCounterTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = localdate()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.member = User.objects.create_user(username='member', password='pass')
+        self.outsider = User.objects.create_user(username='outsider', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        self.other = Group.objects.create(name='other', admin=self.outsider)
+        for user, group in [(self.admin, self.group), (self.member, self.group), (self.outsider, self.other)]:
+            Membership.objects.create(user=user, group=group)
+        self.tasks = [
+            Task.objects.create(title='mine', owner=self.member, due_date=self.today),
+            Task.objects.create(title='late', owner=self.member, due_date=self.today - timedelta(days=1)),
+            Task.objects.create(title='shared', owner=self.admin, assignee=self.member, group=self.group),
+            Task.objects.create(title='lent', owner=self.member, assignee=self.outsider, group=self.other,
+                                due_date=self.today + timedelta(days=1)),
+            Task.objects.create(title='done', owner=self.admin, group=self.group, status='completed'),
+        ]
+        self.users = [self.admin, self.member, self.outsider]
+
+    def live_counts(self, user, today=None):
+        visible = Task.objects.visible_to(user)
+        return {status: visible.with_status(status, today or self.today).count()
+                for status in ('ongoing', 'overdue', 'completed', 'all')}
+
+    def assertCountsMatch(self, today=None):
+        for user in User.objects.filter(pk__in=[user.pk for user in self.users]):
+            self.assertEqual(task_counts(user, today), self.live_counts(user, today), user.username)
+
+    def test_counts_follow_task_writes(self):
+        self.assertCountsMatch()
+        self.assertTrue(TaskCounter.objects.exists())
+        mine, late, shared, lent, done = self.tasks
+        mine.status = 'completed'
+        mine.save()
+        late.due_date = self.today + timedelta(days=3)
+        late.save()
+        shared.group = None
+        shared.save()
+        lent.assignee = None
+        lent.save()
+        done.delete()
+        Task.objects.create(title='new', owner=self.outsider, group=self.group)
+        self.assertCountsMatch()
+
+    def test_counts_follow_bulk_writes(self):
+        self.assertCountsMatch()
+        ids = [str(task.pk) for task in self.tasks]
+        apply_bulk_action(self.admin, 'complete', ids)
+        self.assertCountsMatch()
+        apply_bulk_action(self.member, 'move_group', ids[:2], group_id=self.group.pk)
+        self.assertCountsMatch()
+        apply_bulk_action(self.admin, 'reassign', ids, assignee_id=self.admin.pk)
+        self.assertCountsMatch()
+        apply_bulk_action(self.admin, 'delete', ids)
+        self.assertCountsMatch()
+
+    def test_counts_follow_access_changes(self):
+        self.assertCountsMatch()
+        Membership.objects.filter(user=self.member).delete()
+        self.assertCountsMatch()
+        Membership.objects.create(user=self.member, group=self.other)
+        self.assertCountsMatch()
+        self.client.force_login(self.admin)
+        self.client.post(reverse('group_members_manage', args=[self.group.pk]),
+                         {'members': [self.member.pk, self.outsider.pk]})
+        self.assertCountsMatch()
+        self.other.admin = self.member
+        self.other.save()
+        self.assertCountsMatch()
+        self.group.delete()
+        self.assertCountsMatch()
+
+    def test_day_rollover(self):
+        self.assertCountsMatch()
+        later = self.today + timedelta(days=2)
+        live = self.live_counts(self.member, later)
+        get_current_group_access(self.member)
+        with self.assertNumQueries(5):  # the rows, then a count and an update per row
+            self.assertEqual(task_counts(self.member, later), live)
+        rows = TaskCounter.objects.filter(Q(user=self.member) | Q(group=self.group))
+        self.assertEqual(set(rows.values_list('as_of', flat=True)), {later})
+        self.assertCountsMatch(later)
+
+    def test_queries_dont_grow_with_groups(self):
+        def queries(today):
+            member = User.objects.get(pk=self.member.pk)
+            get_current_group_access(member)
+            with CaptureQueriesContext(connection) as captured:
+                counts = task_counts(member, today)
+            self.assertEqual(counts, self.live_counts(member, today))
+            return len(captured)
+
+        later = self.today + timedelta(days=2)
+        one_group = (queries(self.today), queries(later))
+        for i in range(4):
+            group = Group.objects.create(name=f'extra{i}', admin=self.admin)
+            Membership.objects.create(user=self.member, group=group)
+            Task.objects.create(title=f'extra{i}', owner=self.admin, group=group, due_date=self.today)
+        TaskCounter.objects.all().delete()
+        self.assertEqual((queries(self.today), queries(later)), one_group)
+
+    def test_stale_group_access_cache_isnt_saved_in_counters(self):
+        self.assertCountsMatch()
+        get_group_access(User.objects.get(pk=self.member.pk))
+        # Another worker removes the member: this process's cache isn't told.
+        with mock.patch('users.signals.invalidate_group_access'):
+            Membership.objects.filter(user=self.member).delete()
+        self.assertTrue(get_group_access(User.objects.get(pk=self.member.pk)).can_access(self.group.pk))
+        # Rebuilds the member's dropped row, and doesn't add the group's on top.
+        self.assertEqual(task_counts(User.objects.get(pk=self.member.pk)), self.live_counts(self.member))
+        Task.objects.create(title='handed over', owner=self.admin, assignee=self.member, group=self.group)
+        self.assertEqual(task_counts(User.objects.get(pk=self.member.pk)), self.live_counts(self.member))
+        cache.clear()
+        self.assertCountsMatch()
+
+    def test_reads_are_one_query_once_built(self):
+        task_counts(self.member)
+        member = User.objects.get(pk=self.member.pk)
+        # The request has usually read the user's access already.
+        get_current_group_access(member)
+        with self.assertNumQueries(1):
+            task_counts(member)
+
+    def test_tabs_show_counts(self):
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('task_list'))
+        self.assertEqual(response.context['status_counts'], self.live_counts(self.member))
+
+    def test_reconcile_command(self):
+        self.assertCountsMatch()
+        TaskCounter.objects.filter(user=self.member).update(ongoing=F('ongoing') + 5)
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('reconcile_task_counters', '--check', stdout=StringIO(), stderr=err)
+        self.assertIn("'ongoing': 7", err.getvalue())
+
+        out = StringIO()
+        call_command('reconcile_task_counters', '--verify-users', '3', stdout=out, stderr=StringIO())
+        self.assertIn('1 drifted', out.getvalue())
+        self.assertIn('0 mismatched', out.getvalue())
+        self.assertIn('Rebuilt 3 rows', out.getvalue())  # both groups and member's own tasks
+        call_command('reconcile_task_counters', '--check', stdout=StringIO(), stderr=StringIO())
+        self.assertCountsMatch()
+
+
+class SearchTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.member = User.objects.create_user(username='member', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.owner)
+        Membership.objects.create(user=self.member, group=self.group)
+        today = localdate()
+        self.budget = Task.objects.create(title='Review quarterly budget', owner=self.owner, group=self.group)
+        self.report = Task.objects.create(title='Write report', description='Summarise the budgeting meeting',
+                                          owner=self.owner, status='completed')
+        self.late = Task.objects.create(title='Budget sign-off', owner=self.member,
+                                        due_date=today - timedelta(days=1))
+
+    def titles(self, queryset):
+        return set(queryset.values_list('title', flat=True))
+
+    def test_matches_title_and_description_prefixes(self):
+        self.assertEqual(self.titles(Task.objects.search('budget')),
+                         {'Review quarterly budget', 'Write report', 'Budget sign-off'})
+        self.assertEqual(self.titles(Task.objects.search('quart BUDG')), {'Review quarterly budget'})
+        self.assertEqual(self.titles(Task.objects.search('summ meeting')), {'Write report'})
+        self.assertEqual(self.titles(Task.objects.search('nothing')), set())
+
+    def test_query_syntax_is_neutralised(self):
+        for query in ['"budget', 'budget OR report', 'budget*)', 'NEAR(', "sign-off'", '   ']:
+            list(Task.objects.search(query))
+        self.assertEqual(Task.objects.search('!!!').count(), 3)
+
+    def test_index_follows_writes(self):
+        self.budget.title = 'Plan offsite'
+        self.budget.save()
+        self.assertEqual(self.titles(Task.objects.search('offsite')), {'Plan offsite'})
+        self.assertNotIn('Plan offsite', self.titles(Task.objects.search('quarterly')))
+        apply_bulk_action(self.owner, 'delete', [str(self.budget.pk)])
+        self.assertEqual(Task.objects.search('offsite').count(), 0)
+
+    def test_migrate_repairs_an_index_that_lost_its_triggers(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        # What a migration that rebuilds the task table leaves behind.
+        with connection.cursor() as cursor:
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER tasks_task_fts_{trigger}')
+        Task.objects.create(title='Plan offsite', owner=self.owner)
+        self.assertEqual(Task.objects.search('offsite').count(), 0)
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+        self.assertEqual(self.titles(Task.objects.search('offsite')), {'Plan offsite'})
+        self.budget.delete()
+        self.assertEqual(Task.objects.search('quarterly').count(), 0)
+
+    def test_respects_visibility_and_status(self):
+        visible = Task.objects.visible_to(self.member)
+        self.assertEqual(self.titles(visible.search('budget')), {'Review quarterly budget', 'Budget sign-off'})
+        self.assertEqual(self.titles(visible.with_status('overdue').search('budget')), {'Budget sign-off'})
+        # Applied first, the search is pushed into every visible_to() branch.
+        self.assertEqual(self.titles(Task.objects.search('budget').visible_to(self.member)),
+                         {'Review quarterly budget', 'Budget sign-off'})
+
+    def test_task_list_search(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('task_list'), {'q': 'budget', 'status': 'all'})
+        self.assertEqual({task.title for task in response.context['tasks']}, {'Review quarterly budget', 'Write report'})
+        self.assertContains(response, 'value="budget"')
+        # Tabs keep the search; a cached render of another search isn't reused.
+        self.assertContains(response, '?q=budget&amp;status=ongoing')
+        response = self.client.get(reverse('task_list'), {'q': 'report', 'status': 'all'})
+        self.assertEqual([task.title for task in response.context['tasks']], ['Write report'])
+        self.assertNotContains(response, 'quarterly')
+        response = self.client.get(reverse('api_task_list'), {'q': 'quarterly'})
+        self.assertEqual([task['title'] for task in response.json()['results']], ['Review quarterly budget'])
+
+
+class RequestMetricsTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        for i in range(3):
+            Task.objects.create(title=f'task {i}', owner=self.admin, group=self.group)
+        self.task = Task.objects.create(title='private', owner=self.admin)
+        self.client.force_login(self.admin)
+        registry.clear()
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=True)
+    def test_server_timing_counts_the_requests_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('task_list'))
+        metrics = response.request_metrics
+        self.assertEqual(metrics.view_name, 'task_list')
+        self.assertEqual(metrics.queries, len(queries))
+        self.assertGreater(metrics.render_time, 0)
+        self.assertLessEqual(metrics.render_time, metrics.duration)
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    @override_settings(ROOT_URLCONF='tasks.tests')
+    async def test_async_views_are_measured(self):
+        await self.async_client.aforce_login(self.admin)
+        queries = CaptureQueriesContext(connection)
+        await sync_to_async(queries.__enter__)()
+        response = await self.async_client.get(reverse('async_task_list'))
+        await sync_to_async(queries.__exit__)(None, None, None)
+        self.assertEqual(response.request_metrics.view_name, 'async_task_list')
+        # Counted across the threads the async ORM runs queries on.
+        self.assertEqual(response.request_metrics.queries, await sync_to_async(len)(queries))
+        self.assertGreater(response.request_metrics.render_time, 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('task_list'))
+        self.client.get(reverse('task_list'))
+        self.client.get(reverse('group_detail', args=[self.group.pk]))
+        # Staff or a bearer token only.
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer wrong'})
+                             .status_code, 403)
+            response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('django_view_requests_total{view="task_list"} 2', body)
+        self.assertIn('django_view_requests_total{view="group_detail"} 1', body)
+        self.assertIn('django_view_duration_seconds_bucket{view="task_list",le="+Inf"} 2', body)
+        self.assertRegex(body, r'django_view_db_queries_max\{view="group_detail"\} [1-9]')
+        User.objects.filter(pk=self.admin.pk).update(is_staff=True)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_over_budget_requests_are_logged_and_counted(self):
+        with mock.patch.dict(VIEW_BUDGETS, {'task_list': Budget(queries=1, ms=10000)}):
+            with self.assertLogs('tasks.metrics', 'WARNING') as logs:
+                response = self.client.get(reverse('task_list'))
+            with self.assertRaises(AssertionError):
+                self.assertWithinBudget(response)
+        self.assertIn('task_list over budget', logs.output[0])
+        self.assertEqual(registry.snapshot()['task_list']['over_budget'], 1)
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=False)
+    def test_no_server_timing_unless_enabled(self):
+        response = self.client.get(reverse('task_list'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_METRICS_TRACEMALLOC=True, REQUEST_METRICS_SERVER_TIMING=True)
+    def test_peak_allocations(self):
+        import tracemalloc
+        try:
+            response = self.client.get(reverse('task_list'))
+            self.assertGreater(response.request_metrics.peak_alloc, 0)
+            self.assertIn('mem;desc="peak', response['Server-Timing'])
+        finally:
+            tracemalloc.stop()
+
+    def test_connection_and_pool_metrics(self):
+        connection_created.send(sender=type(connections['default']), connection=connections['default'])
+        body = registry.render()
+        self.assertIn('django_db_connections_total{alias="default"} 1', body)
+        self.assertNotIn('django_db_pool_', body)
+
+        pool = mock.Mock()
+        pool.get_stats.return_value = {'pool_size': 3, 'pool_available': 1, 'requests_num': 40,
+                                       'requests_queued': 2, 'requests_wait_ms': 1500}
+        with mock.patch.object(type(connections['default']), '_connection_pools', {'default': pool}, create=True):
+            body = registry.render()
+        self.assertIn('django_db_pool_size{alias="default"} 3', body)
+        self.assertIn('django_db_pool_checkouts_total{alias="default"} 40', body)
+        self.assertIn('django_db_pool_checkouts_queued_total{alias="default"} 2', body)
+        self.assertIn('django_db_pool_wait_seconds_total{alias="default"} 1.5', body)
+        self.assertIn('django_db_pool_checkout_errors_total{alias="default"} 0', body)
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def load_settings(self, **env):
+        env.setdefault('DATABASE_URL', 'postgres://app:secret@db:5432/tasks')
+        with mock.patch.dict(os.environ, env):
+            for name in ('DB_POOL', 'DB_CONN_MAX_AGE'):
+                if name not in env:
+                    os.environ.pop(name, None)
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'task_management', 'settings.py'))['DATABASES']
+
+    def test_persistent_connections_by_default(self):
+        database = self.load_settings()['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('pool', database.get('OPTIONS', {}))
+        self.assertEqual(self.load_settings(DB_CONN_MAX_AGE='0')['default']['CONN_MAX_AGE'], 0)
+
+    def test_pool(self):
+        database = self.load_settings(DB_POOL='1', DB_POOL_MAX_SIZE='8')['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool'], {'min_size': 2, 'max_size': 8, 'timeout': 10.0})
+        # Postgres only.
+        database = self.load_settings(DB_POOL='1', DATABASE_URL='sqlite://:memory:')['default']
+        self.assertNotIn('pool', database.get('OPTIONS', {}))
+
+
+class ViewBudgetTests(CacheClearingTestCase):
+    """Every budgeted view stays within budget, with cold and with warm caches."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        for i in range(5):
+            member = User.objects.create(username=f'member{i}')
+            Membership.objects.create(group=self.group, user=member)
+            Task.objects.create(title=f'task {i}', owner=self.admin, assignee=member, group=self.group,
+                                due_date=localdate() - timedelta(days=i))
+        self.task = Task.objects.create(title='private', owner=self.admin)
+        self.client.force_login(self.admin)
+
+    def test_views_within_budget(self):
+        urls = [
+            reverse('task_list'), reverse('task_list') + '?status=all&q=task',
+            reverse('group_list'), reverse('group_detail', args=[self.group.pk]),
+            reverse('api_task_list'), reverse('api_task_detail', args=[self.task.pk]),
+            reverse('api_group_list'), reverse('api_group_detail', args=[self.group.pk]),
+            reverse('user_search') + '?q=mem',
+        ]
+        for url in urls:
+            self.client.get(url)  # load templates and code paths once, outside the timing
+        for url in urls:
+            for backend in caches.all():
+                backend.clear()
+            self.client.force_login(self.admin)
+            TaskCounter.objects.all().delete()
+            with self.subTest(url=url, caches='cold'):
+                self.assertWithinBudget(self.client.get(url))
+            with self.subTest(url=url, caches='warm'):
+                self.assertWithinBudget(self.client.get(url))
+
+
+class BenchViewsCommandTests(CacheClearingTestCase):
+    @mock.patch.dict('tasks.management.commands.bench_views.SCALES',
+                     {'10k': {'users': 30, 'groups': 3, 'members_per_group': 5, 'tasks': 200}})
+    def test_writes_comparable_json_and_leaves_data_unchanged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            # Tasks of other datasets aren't counted.
+            Task.objects.create(title='not benched', owner=User.objects.create(username='other'))
+            # Every request, warm-up included, within its view's budget.
+            with self.assertNoLogs('tasks.metrics', 'WARNING'):
+                call_command('bench_views', requests=3, warmup=1, output=path, stderr=StringIO())
+                tasks = Task.objects.count()
+                memberships = Membership.objects.count()
+                stderr = StringIO()
+                call_command('bench_views', requests=3, warmup=1, compare=path, stdout=StringIO(), stderr=stderr)
+            with open(path) as f:
+                results = json.load(f)
+        self.assertEqual((Task.objects.count(), Membership.objects.count()), (tasks, memberships))
+        self.assertEqual(results['dataset']['tasks'], 200)
+        self.assertEqual(set(results['scenarios']), {
+            'task_list_ongoing', 'task_list_overdue', 'task_list_completed', 'task_list_all',
+            'group_detail', 'task_create', 'task_complete', 'group_member_manage',
+        })
+        for scenario in results['scenarios'].values():
+            self.assertLessEqual(scenario['p50_ms'], scenario['p99_ms'])
+            self.assertGreater(scenario['queries']['min'], 0)
+        self.assertIn('group_member_manage', stderr.getvalue())
+
+
+class SessionStorageTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='pass')
+
+    def complete_round_trip(self):
+        task = Task.objects.create(title='task', owner=self.user)
+        self.client.get(reverse('task_list'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('task_complete', args=[task.pk]), follow=True)
+        self.assertContains(response, 'Task marked as completed.')
+        return [query['sql'] for query in queries if 'django_session' in query['sql']]
+
+    def test_messages_do_not_write_the_session(self):
+        self.client.force_login(self.user)
+        self.assertFalse([sql for sql in self.complete_round_trip() if not sql.startswith('SELECT')])
+
+    def test_cookie_backends_skip_the_session_table(self):
+        for backend, storage in [('cached_db', 'fallback'), ('signed_cookies', 'cookie')]:
+            with self.subTest(backend=backend), override_settings(
+                    SESSION_ENGINE=settings.SESSION_ENGINES[backend],
+                    MESSAGE_STORAGE=settings.MESSAGE_STORAGES[storage]):
+                # SessionMiddleware picks its engine when a client first loads it.
+                self.client = self.client_class()
+                self.client.login(username='owner', password='pass')
+                self.assertEqual(self.complete_round_trip(), [])
+
+    def test_compact_sessions_deletes_expired_sessions_in_batches(self):
+        from django.contrib.sessions.models import Session
+
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+             for i in range(5)]
+            + [Session(session_key='live', session_data='', expire_date=now + timedelta(days=1))]
+        )
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('compact_sessions', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired sessions.', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 3)
+        with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES['signed_cookies']):
+            call_command('compact_sessions', stdout=out)
+        self.assertIn('nothing to do', out.getvalue())
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+})
+class ReleaseTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.static_root = os.path.join(directory.name, 'static')
+        settings_override = override_settings(STATIC_ROOT=self.static_root,
+                                              RELEASE_STAMP_FILE=os.path.join(directory.name, 'release.json'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_release_collects_static_files_once(self):
+        from .release import unapplied_migrations
+        self.assertEqual(unapplied_migrations(), [])
+        with self.assertRaisesMessage(CommandError, 'static files changed'):
+            call_command('release', check=True)
+
+        out = StringIO()
+        call_command('release', verbosity=0, stdout=out)
+        self.assertIn('static files collected', out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.static_root, 'staticfiles.json')))
+        out = StringIO()
+        call_command('release', check=True, stdout=out)
+        self.assertIn('Release is current', out.getvalue())
+        out = StringIO()
+        call_command('release', stdout=out)
+        self.assertIn('static files already collected', out.getvalue())
+
+        with mock.patch('tasks.management.commands.release.static_fingerprint', return_value='changed'):
+            with self.assertRaisesMessage(CommandError, 'static files changed'):
+                call_command('release', check=True)
+        os.remove(os.path.join(self.static_root, 'staticfiles.json'))
+        with self.assertRaisesMessage(CommandError, 'static files changed'):
+            call_command('release', check=True)
+
+    def test_check_reports_unapplied_migrations(self):
+        with mock.patch('tasks.release.MigrationRecorder.applied_migrations', return_value={}):
+            with self.assertRaisesMessage(CommandError, 'unapplied migration(s) (admin.0001_initial'):
+                call_command('release', check=True)
+
+    def test_warm_up_runs_no_queries(self):
+        from .release import warm_up
+        with self.assertNumQueries(0):
+            warm_up()
+
+
+class BenchStartupCommandTests(SimpleTestCase):
+    def test_times_the_first_response(self):
+        out = StringIO()
+        call_command('bench_startup', command=f'{sys.executable} -m http.server $PORT --bind 127.0.0.1',
+                     path='/', runs=1, timeout=30, stdout=out)
+        self.assertRegex(out.getvalue(), r'median \d+ ms to the first response, which took \d+ ms')
+
+
+class FormRenderingTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.member = User.objects.create_user(username='member', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        Membership.objects.create(group=self.group, user=self.admin)
+        Membership.objects.create(group=self.group, user=self.member)
+        self.task = Task.objects.create(title='<b>escaped</b>', owner=self.admin, assignee=self.member,
+                                        group=self.group, due_date=localdate())
+        form_rendering._skeletons.clear()
+
+    def assertRendersLikeFull(self, make_form, style):
+        render = form_rendering.FORM_STYLES[style][0]
+        # The first render builds the skeleton, the second fills it in.
+        for _ in range(2):
+            self.assertEqual(str(render_form(make_form(), style)), str(render(make_form())))
+
+    def test_matches_the_full_render(self):
+        group_form = modelform_factory(Group, fields=['name'])
+        self.assertRendersLikeFull(lambda: TaskForm(request_user=self.admin), 'p')
+        self.assertRendersLikeFull(lambda: TaskForm(request_user=self.admin, instance=self.task), 'p')
+        self.assertRendersLikeFull(lambda: TaskForm(request_user=self.admin, specific_group=self.group), 'p')
+        self.assertRendersLikeFull(lambda: TaskForm(request_user=self.admin, instance=self.task), 'crispy')
+        self.assertRendersLikeFull(lambda: GroupMemberForm(group=self.group), 'crispy')
+        self.assertRendersLikeFull(lambda: group_form(instance=self.group), 'crispy')
+        # Valid bound data renders the submitted values.
+        self.assertRendersLikeFull(lambda: GroupMemberForm({'members': [self.member.pk]}, group=self.group), 'crispy')
+
+    def test_forms_with_errors_render_in_full(self):
+        def make_form():
+            return TaskForm({'title': '', 'status': 'ongoing'}, request_user=self.admin)
+
+        with mock.patch('tasks.form_rendering._build_skeleton') as build:
+            html = str(render_form(make_form(), 'p'))
+        build.assert_not_called()
+        self.assertIn('This field is required.', html)
+        self.assertEqual(html, str(make_form().as_p()))
+
+    def test_skeleton_is_reused(self):
+        group_form = modelform_factory(Group, fields=['name'])
+        for _ in range(3):
+            render_form(TaskForm(request_user=self.admin), 'p')
+            # A new class per call, as generic views make them.
+            render_form(modelform_factory(Group, fields=['name'])(instance=self.group), 'crispy')
+        render_form(group_form(), 'crispy')
+        self.assertEqual(len(form_rendering._skeletons), 2)
+
+    def test_warm_up_builds_skeletons_without_queries(self):
+        with self.assertNumQueries(0):
+            form_rendering.warm_up_forms()
+        with mock.patch('tasks.form_rendering._build_skeleton') as build:
+            render_form(TaskForm(request_user=self.admin), 'p')
+            render_form(GroupMemberForm(group=self.group), 'crispy')
+        build.assert_not_called()
+
+    def test_form_pages(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('group_members_manage', args=[self.group.pk]))
+        self.assertContains(response, f'<option value="{self.member.pk}" selected>member</option>', html=True)
+        response = self.client.get(reverse('task_create'))
+        self.assertContains(response, '<label for="id_title">Task Title:</label>', html=True)
+
+
+class BenchFormsCommandTests(CacheClearingTestCase):
+    def test_reports_forms_and_pages(self):
+        admin = User.objects.create_user(username='admin', password='pass')
+        group = Group.objects.create(name='team', admin=admin)
+        Membership.objects.create(group=group, user=admin)
+        out = StringIO()
+        call_command('bench_forms', iterations=2, stdout=out)
+        self.assertIn('group_member_form', out.getvalue())
+        self.assertIn('tasks/task_form.html', out.getvalue())
+
+
+class ActivityLogTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.group = Group.objects.create(name='team', admin=self.admin)
+        self.other = Group.objects.create(name='other', admin=self.admin)
+
+    def timeline(self, events):
+        return [(event.verb, event.data) for event in reversed(events)]
+
+    def test_task_lifecycle(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title='t', owner=self.admin, group=self.group)
+            task.title = 'renamed'
+            task.save()
+            task.status = 'completed'
+            task.save()
+            task.group = self.other
+            task.save()
+            task_id = task.pk
+            task.delete()
+        # Nothing is written until the buffer is flushed.
+        self.assertFalse(ActivityEvent.objects.exists())
+        self.assertEqual(activity.buffer.flush(), 6)
+        moved = {'group_id': [str(self.group.pk), str(self.other.pk)]}
+        self.assertEqual(self.timeline(ActivityEvent.objects.for_task(task_id)), [
+            ('task.created', {}),
+            ('task.updated', {}),
+            ('task.completed', {'status': ['ongoing', 'completed']}),
+            ('task.moved_out', moved),
+            ('task.moved', moved),
+            ('task.deleted', {}),
+        ])
+        self.assertEqual([event.verb for event in ActivityEvent.objects.for_group(self.other.pk)],
+                         ['task.deleted', 'task.moved'])
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Task.objects.create(title='t', owner=self.admin, group=self.group)
+                transaction.set_rollback(True)
+        self.assertEqual(activity.buffer.flush(), 0)
+
+    def test_requests_record_the_actor_without_writing(self):
+        member = User.objects.create(username='member')
+        tasks = Task.objects.bulk_create([Task(title=f"t{i}", owner=self.admin, group=self.group) for i in range(2)])
+        self.client.force_login(self.admin)
+        url = reverse('group_members_manage', args=[self.group.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'members': [member.pk]})
+            apply_bulk_action(self.admin, 'complete', [str(task.pk) for task in tasks])
+        self.assertFalse(ActivityEvent.objects.exists())
+        activity.buffer.flush()
+        events = ActivityEvent.objects.for_group(self.group.pk)
+        self.assertEqual(sorted(event.verb for event in events),
+                         ['member.added', 'task.completed', 'task.completed'])
+        member_event = events.get(verb='member.added')
+        self.assertEqual((member_event.actor_id, member_event.data), (self.admin.pk, {'user_id': member.pk}))
+        # Outside a request there is no actor.
+        self.assertIsNone(events.filter(verb='task.completed')[0].actor_id)
+
+    def test_group_and_membership_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            group = Group.objects.create(name='new', admin=self.admin)
+            membership = Membership.objects.create(group=group, user=self.admin)
+            membership.delete()
+        activity.buffer.flush()
+        self.assertEqual(self.timeline(ActivityEvent.objects.for_group(group.pk)), [
+            ('group.created', {'name': 'new'}),
+            ('member.added', {'user_id': self.admin.pk}),
+            ('member.removed', {'user_id': self.admin.pk}),
+        ])
+
+    @override_settings(ACTIVITY_LOG=False)
+    def test_disabled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='t', owner=self.admin, group=self.group)
+        self.assertEqual(activity.buffer.flush(), 0)
+
+    def test_failed_flush_keeps_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='t', owner=self.admin, group=self.group)
+        with mock.patch.object(ActivityEvent.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('tasks.activity', 'ERROR'):
+            self.assertEqual(activity.buffer.flush(), 0)
+        self.assertEqual(activity.buffer.flush(), 1)
+
+    @override_settings(ACTIVITY_LOG_BATCH_SIZE=2, ACTIVITY_LOG_FLUSH_INTERVAL=60)
+    def test_background_flush_on_batch_size(self):
+        buffer = activity.ActivityBuffer()
+        flushed = threading.Event()
+        with mock.patch.object(buffer, 'flush', side_effect=flushed.set), \
+                mock.patch.object(activity, 'close_old_connections'):
+            buffer.add(('event', 1))
+            self.assertFalse(flushed.wait(0.2))
+            buffer.add(('event', 2))
+            # Long before the 60 s interval.
+            self.assertTrue(flushed.wait(5))
+
+    @override_settings(ACTIVITY_LOG_BATCH_SIZE=2)
+    def test_full_batch_is_written_without_a_flusher(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='t', owner=self.admin, group=self.group)
+        self.assertFalse(ActivityEvent.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='t', owner=self.admin, group=self.group)
+        self.assertEqual(ActivityEvent.objects.count(), 2)
+        self.assertIsNone(activity.buffer._flusher)
+
+    @mock.patch.object(activity, 'MAX_PENDING', 3)
+    def test_queue_is_capped(self):
+        buffer = activity.ActivityBuffer()
+        with self.assertLogs('tasks.activity', 'ERROR'):
+            for i in range(5):
+                buffer.add(('event', i))
+        self.assertEqual(buffer._events, [('event', 2), ('event', 3), ('event', 4)])
+
+    def test_compact_activity(self):
+        now = timezone.now()
+        ActivityEvent.objects.bulk_create([
+            ActivityEvent(created_at=now - timedelta(days=days), verb='task.updated', group=self.group)
+            for days in (100, 95, 91, 30, 1)
+        ])
+        out = StringIO()
+        call_command('compact_activity', '--batch-size', '2', stdout=out)
+        self.assertIn("Deleted 3 activity events older than 90 days", out.getvalue())
+        call_command('compact_activity', '--days', '7', stdout=out)
+        self.assertEqual(ActivityEvent.objects.count(), 1)
+
+
+@TEST_OVERRIDES
+class ActivityFlusherTests(TransactionTestCase):
+    # The flusher writes through its own connection, which would wait on the
+    # transaction a TestCase holds open.
+    def test_flusher_writes_in_the_background(self):
+        buffer = activity.ActivityBuffer()
+        with override_settings(ACTIVITY_LOG_FLUSH_INTERVAL=0.05):
+            buffer.add((timezone.now(), None, 'group.created', None, None, {}))
+            flusher = buffer._flusher
+            self.assertIsNotNone(flusher)
+            deadline = time.monotonic() + 5
+            while not ActivityEvent.objects.exists() and time.monotonic() < deadline:
+                time.sleep(0.05)
+        self.assertEqual(ActivityEvent.objects.get().verb, 'group.created')
+        # An interval of 0 stops it.
+        buffer._wake.set()
+        flusher.join(5)
+        self.assertFalse(flusher.is_alive())
+        self.assertIsNone(buffer._flusher)
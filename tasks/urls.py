@@ -1,6 +1,11 @@
 
+from django.conf import settings
 from django.urls import path
-from .views import GroupCreateView, GroupDeleteView, GroupDetailView, GroupMemberManageView, GroupUpdateView, TaskCreateView, TaskListView, TaskUpdateView, TaskMarkCompleteView, TaskDeleteView, GroupListView
+from .async_views import AsyncGroupDetailView, AsyncGroupListView, AsyncTaskListView
+from .views import GroupCreateView, GroupDeleteView, GroupDetailView, GroupEventsView, GroupMemberManageView, GroupUpdateView, TaskCreateView, TaskListView, TaskUpdateView, TaskMarkCompleteView, TaskDeleteView, TaskBulkActionView, TaskExportView, GroupListView
+
+if settings.ASYNC_VIEWS:
+    TaskListView, GroupListView, GroupDetailView = AsyncTaskListView, AsyncGroupListView, AsyncGroupDetailView
 
 urlpatterns = [
     path('', TaskListView.as_view(), name='task_list'),
@@ -9,12 +14,15 @@ urlpatterns = [
     path('<uuid:pk>/update/', TaskUpdateView.as_view(), name='task_update'),
     path('<uuid:pk>/complete/', TaskMarkCompleteView.as_view(), name='task_complete'),
     path('<uuid:pk>/delete/', TaskDeleteView.as_view(), name='task_delete'),
+    path('bulk/', TaskBulkActionView.as_view(), name='task_bulk'),
+    path('export/', TaskExportView.as_view(), name='task_export'),
 
     #groups urls
     path('groups/', GroupListView.as_view(), name='group_list'),
 
     path('groups/create/', GroupCreateView.as_view(), name='group_create'),
     path('groups/<uuid:pk>/', GroupDetailView.as_view(), name='group_detail'), # New detail view
+    path('groups/<uuid:pk>/events/', GroupEventsView.as_view(), name='group_events'),
     path('groups/<uuid:pk>/edit/', GroupUpdateView.as_view(), name='group_edit'), # New edit view
     path('groups/<uuid:pk>/delete/', GroupDeleteView.as_view(), name='group_delete'), # New delete view
     path('groups/<uuid:pk>/members/', GroupMemberManageView.as_view(), name='group_members_manage'), # New member management
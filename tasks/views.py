@@ -1,24 +1,47 @@
+import json
+
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.mixins import LoginRequiredMixin
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.contrib import messages
+from users.access import current_group_access_for, get_current_group_access, invalidate_group_access
 from users.models import Group, Membership
+from .activity import record as record_activity
+from .bulk import BulkActionError, apply_bulk_action
+from .counters import drop_user_counters, task_counts
+from .events import RESYNC, get_broker, group_channel, publish_group_event
+from .export import EXPORT_FORMATS, export_queryset, iter_rows
 from .forms import GroupMemberForm, TaskForm
-from .models import Task
-from django.db import models
-from datetime import date
+from .fragments import group_fragment_version, invalidate_groups, invalidate_memberships, task_list_fragment_version
+from .models import Task, delete_rows, effective_status_for
+from .pagination import CursorPaginationMixin
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.urls import reverse, reverse_lazy
+from django.utils.timezone import localdate
 from django.contrib.auth.mixins import UserPassesTestMixin
 
 class TaskOwnerOrGroupAdminMixin(UserPassesTestMixin):
+    def get_object(self, queryset=None):
+        # test_func() and the view itself both need the task; fetch it once.
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_task'):
+            self._task = super().get_object()
+        return self._task
+
     def test_func(self):
         task = self.get_object()
         # Check if user is the task owner
-        if task.owner == self.request.user:
+        if task.owner_id == self.request.user.pk:
             return True
         # Check if task belongs to a group and user is group admin
-        if task.group and task.group.admin == self.request.user:
+        if task.group_id and get_current_group_access(self.request.user).is_admin(task.group_id):
             return True
         # Check if task belongs to a group and user is a member (allowing deletion/edit for members is a choice)
         # For simplicity, keeping it owner/admin for modify/delete for now.
@@ -29,18 +52,7 @@ class TaskOwnerOrGroupAdminMixin(UserPassesTestMixin):
         return redirect(self.request.META.get('HTTP_REFERER', reverse_lazy('task_list')))
 
 
-# Mixin to ensure only the group admin can access certain group management features
-class GroupAdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
-    def test_func(self):
-        group = self.get_object()
-        return self.request.user == group.admin
-
-    def handle_no_permission(self):
-        messages.error(self.request, "You do not have permission to perform this action.")
-        return redirect(reverse_lazy('group_list')) # Redirect to group list if not admin
-from django.utils.timezone import localdate
-
-class TaskListView(LoginRequiredMixin,ListView):
+class TaskListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Task
     template_name = 'tasks/task_list.html'
     context_object_name = 'tasks'
@@ -49,37 +61,20 @@ class TaskListView(LoginRequiredMixin,ListView):
     def get_queryset(self):
         status_filter = self.request.GET.get('status')
     
-        queryset = Task.objects.filter(
-            models.Q(owner=self.request.user) | 
-            models.Q(assignee=self.request.user) | 
-            models.Q(group__members__user=self.request.user) | 
-            models.Q(group__admin=self.request.user)
-        ).distinct()
-
-        Task.objects.filter(due_date__lt=date.today(), status='ongoing').update(status='overdue')
-
-    
-        if status_filter == 'ongoing':
-            queryset = queryset.filter(status='ongoing').exclude(due_date__lt=date.today())
-    
-        elif status_filter == 'completed':
-            queryset = queryset.filter(status='completed')
-    
-        elif status_filter == 'overdue':
-            queryset = queryset.filter(due_date__lt=date.today(), status__in=['ongoing', 'overdue'])
-
-        elif status_filter == 'all':
-            pass  # Show all tasks (queryset already built)
-    
-        else:
-            queryset = queryset.filter(status='ongoing').exclude(due_date__lt=date.today())
-    
-        queryset = queryset.order_by('due_date', '-created_at')
-        return queryset
+        queryset = Task.objects.with_status(status_filter).visible_to(self.request.user)
+        search_query = self.request.GET.get('q', '').strip()
+        if search_query:
+            queryset = queryset.search(search_query)
+        # Ordered by CursorPaginationMixin.cursor_ordering when paginated.
+        return queryset.for_listing().with_effective_status()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['current_status_filter'] = self.request.GET.get('status', 'ongoing')
+        context['search_query'] = self.request.GET.get('q', '').strip()
+        context['status_counts'] = task_counts(self.request.user)
+        context['fragment_version'] = task_list_fragment_version(self.request.user)
+        context['fragment_timeout'] = settings.FRAGMENT_CACHE_TIMEOUT
         return context
 
 class TaskCreateView(LoginRequiredMixin, CreateView):
@@ -88,39 +83,37 @@ class TaskCreateView(LoginRequiredMixin, CreateView):
     template_name = 'tasks/task_form.html'
     success_url = reverse_lazy('task_list') # Default redirect
 
+    def dispatch(self, request, *args, **kwargs):
+        self.group = None
+        group_id = kwargs.get('group_id')
+        if group_id and request.user.is_authenticated:
+            if not get_current_group_access(request.user).can_access(group_id):
+                messages.error(request, "You do not have permission to add tasks to this group.")
+                return redirect(reverse_lazy('group_list'))
+            self.group = Group.objects.filter(pk=group_id).first()
+            if self.group is None:
+                messages.error(request, "Invalid group specified.")
+                return redirect(reverse_lazy('task_list'))
+        return super().dispatch(request, *args, **kwargs)
+
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs['request_user'] = self.request.user
-        
-        group_id = self.kwargs.get('group_id') 
-        if group_id:
-            try:
-                group = Group.objects.get(pk=group_id)
-                if not (self.request.user == group.admin or Membership.objects.filter(group=group, user=self.request.user).exists()):
-                    messages.error(self.request, "You do not have permission to add tasks to this group.")
-                    return redirect(reverse_lazy('group_list'))
-                kwargs['specific_group'] = group
-            except Group.DoesNotExist:
-                messages.error(self.request, "Invalid group specified.")
-                return redirect(reverse_lazy('task_list'))
+        if self.group:
+            kwargs['specific_group'] = self.group
         return kwargs
 
     def form_valid(self, form):
         task = form.save(commit=False)
         task.owner = self.request.user
 
-        group_id = self.kwargs.get('group_id')
-        if group_id:
-            try:
-                task.group = Group.objects.get(pk=group_id)
-            except Group.DoesNotExist:
-                messages.error(self.request, "Invalid group specified during task creation.")
-                return redirect(reverse_lazy('task_list'))
+        if self.group:
+            task.group = self.group
         
         if not task.assignee:
             if not task.group:
                 task.assignee = self.request.user
-            elif self.request.user == task.group.admin or Membership.objects.filter(group=task.group, user=self.request.user).exists():
+            elif get_current_group_access(self.request.user).can_access(task.group_id):
                  task.assignee = self.request.user
             else:
                 messages.warning(self.request, "Task created for group but no assignee selected, and you are not a member to self-assign. It is unassigned.")
@@ -129,7 +122,7 @@ class TaskCreateView(LoginRequiredMixin, CreateView):
 
         messages.success(self.request, 'Task created successfully!')
         if task.group:
-            return redirect(reverse('group_detail', kwargs={'pk': str(group_id)})) 
+            return redirect(reverse('group_detail', kwargs={'pk': str(task.group_id)}))
         return redirect('task_list')
         
 
@@ -149,7 +142,8 @@ class TaskUpdateView(LoginRequiredMixin, TaskOwnerOrGroupAdminMixin, UpdateView)
     def form_valid(self, form):
         task = form.save(commit=False)
 
-        if 'due_date' in form.changed_data and task.status == 'overdue' and self.request.user != task.owner:
+        was_overdue = effective_status_for(form.initial.get('status'), form.initial.get('due_date')) == 'overdue'
+        if 'due_date' in form.changed_data and was_overdue and self.request.user != task.owner:
             messages.error(self.request, "Only the task owner can change the due date of an overdue task.")
             return self.form_invalid(form) 
 
@@ -164,24 +158,24 @@ class TaskUpdateView(LoginRequiredMixin, TaskOwnerOrGroupAdminMixin, UpdateView)
 class TaskMarkCompleteView(LoginRequiredMixin, View):
     def post(self, request, pk):
             task = get_object_or_404(Task, pk=pk)
-            is_owner = task.owner == request.user
-            is_assignee = task.assignee == request.user and task.assignee is not None
-            is_group_admin = task.group and task.group.admin == request.user
-            is_group_member = task.group and Membership.objects.filter(group=task.group, user=request.user).exists()
+            is_owner = task.owner_id == request.user.pk
+            is_assignee = task.assignee_id is not None and task.assignee_id == request.user.pk
+            # Group admins and members alike may complete group tasks.
+            in_group = task.group_id is not None and get_current_group_access(request.user).can_access(task.group_id)
 
-            if not (is_owner or is_assignee or is_group_admin or is_group_member):
+            if not (is_owner or is_assignee or in_group):
                 messages.error(request, "You do not have permission to complete this task.")
                 return redirect('task_list')
            
             if task.status != 'completed':
                 task.status = 'completed'
-                task.save()
+                task.save(update_fields=['status', 'updated_at'])
                 messages.success(request, "Task marked as completed.")
             else:
                 messages.info(request, "Task is already completed.")
             return redirect('task_list')
     
-class TaskDeleteView(LoginRequiredMixin, DeleteView):
+class TaskDeleteView(LoginRequiredMixin, TaskOwnerOrGroupAdminMixin, DeleteView):
     model = Task
     template_name = 'tasks/task_confirm_delete.html'
     context_object_name = 'task'
@@ -201,26 +195,81 @@ class TaskDeleteView(LoginRequiredMixin, DeleteView):
         context['group_id'] = self.object.group.id if self.object.group else None
         return context
     
-class TaskOwnerOrGroupAdminMixin(UserPassesTestMixin):
-    def test_func(self):
-        task = self.get_object()
+class TaskBulkActionView(LoginRequiredMixin, View):
+    """
+    Apply one action to many tasks. Accepts either a JSON body
+    {"action": ..., "ids": [...], "assignee": ..., "group": ...} and answers
+    with per-ID results, or the task list's multi-select form, which gets a
+    summary message and a redirect back.
+    """
+
+    def post(self, request):
+        is_json = request.content_type == 'application/json'
+        if is_json:
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+            if not isinstance(data, dict) or not isinstance(data.get('ids', []), list):
+                return JsonResponse({'error': 'Expected an object with an "ids" list.'}, status=400)
+            action, ids = data.get('action'), data.get('ids', [])
+            assignee, group = data.get('assignee'), data.get('group')
+        else:
+            action, ids = request.POST.get('action'), request.POST.getlist('ids')
+            assignee, group = request.POST.get('assignee') or None, request.POST.get('group') or None
+
+        try:
+            results = apply_bulk_action(request.user, action, ids, assignee_id=assignee, group_id=group)
+        except BulkActionError as error:
+            if is_json:
+                return JsonResponse({'error': str(error)}, status=400)
+            messages.error(request, str(error))
+            return redirect(request.META.get('HTTP_REFERER', reverse_lazy('task_list')))
+
+        if is_json:
+            return JsonResponse({'action': action, 'results': results})
+        changed = sum(result == 'ok' for result in results.values())
+        skipped = len(results) - changed
+        if changed:
+            messages.success(request, f"{changed} task(s) updated.")
+        if skipped:
+            messages.warning(request, f"{skipped} task(s) were skipped: already done or not permitted.")
+        return redirect(request.META.get('HTTP_REFERER', reverse_lazy('task_list')))
+
+
+class TaskExportView(LoginRequiredMixin, View):
+    """
+    Stream the user's visible tasks, or with ?group=<id> every task of a group
+    they belong to, as ?format=csv (default) or ?format=ndjson.
+    """
+
+    def get(self, request):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise Http404("Unknown export format.")
+        group_id = request.GET.get('group')
+        if group_id:
+            try:
+                group = Group.objects.filter(pk=group_id).first()
+            except ValidationError:
+                group = None
+            # From the database: a removed member mustn't export the group.
+            if group is None or not get_current_group_access(request.user).can_access(group.pk):
+                raise Http404("No such group.")
+            queryset = export_queryset(group=group)
+        else:
+            queryset = export_queryset(user=request.user)
 
-        if task.owner == self.request.user:
-            return True
-        
-        if task.group and task.group.admin == self.request.user:
-            return True
-        
-        return False
-        
-    def handle_no_permission(self):
-        messages.error(self.request, "You do not have permission to perform this action.")
-        return redirect('task_list')
-    
+        content_type, lines = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(lines(iter_rows(queryset)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tasks-{localdate():%Y%m%d}.{export_format}"'
+        return response
+
+
+# Mixin to ensure only the group admin can access certain group management features
 class GroupAdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
     def test_func(self):
-        group = self.get_object()
-        return self.request.user == group.admin
+        return get_current_group_access(self.request.user).is_admin(self.kwargs['pk'])
     
     def handle_no_permission(self):
         messages.error(self.request, "You must be the group admin to perform this action.")
@@ -233,10 +282,7 @@ class GroupListView(LoginRequiredMixin, ListView):
     context_object_name = 'groups'
 
     def get_queryset(self):
-        return Group.objects.filter(
-            models.Q(admin=self.request.user) |
-            models.Q(members__user=self.request.user)
-        ).distinct().order_by('name')
+        return Group.objects.visible_to(self.request.user).select_related('admin').with_counts().order_by('name')
 
 
 class GroupCreateView(LoginRequiredMixin, CreateView):
@@ -258,26 +304,81 @@ class GroupCreateView(LoginRequiredMixin, CreateView):
         return context
 
 
-class GroupDetailView(LoginRequiredMixin, DetailView):
+class GroupDetailView(LoginRequiredMixin, CursorPaginationMixin, DetailView):
     model = Group
     template_name = 'groups/group_detail.html'
     context_object_name = 'group'
+    paginate_tasks_by = 10
 
     def get_queryset(self):
-        return Group.objects.filter(
-            models.Q(admin=self.request.user) |
-            models.Q(members__user=self.request.user)
-        ).distinct()
+        return Group.objects.visible_to(self.request.user).select_related('admin')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        group = self.get_object()
-        context['members'] = group.members.all().order_by('user__username')
-        context['tasks'] = group.tasks.all().order_by('due_date', '-created_at')
-        context['is_admin'] = (self.request.user == group.admin)
+        group = self.object
+        # Both querysets stay lazy so a cached fragment skips them; when they do
+        # run, the template's members|length reuses the evaluated rows.
+        context['members'] = group.members.select_related('user').only(
+            'group_id', 'user__username'
+        ).order_by('user__username')
+        tasks = group.tasks.for_listing().with_effective_status()
+        page = self.get_cursor_page(tasks, self.paginate_tasks_by)
+        context['page_obj'] = page
+        context['tasks'] = page
+        context['is_admin'] = (self.request.user.pk == group.admin_id)
+        context['fragment_version'] = group_fragment_version(group.pk)
+        context['fragment_timeout'] = settings.FRAGMENT_CACHE_TIMEOUT
         return context
 
 
+class GroupEventsView(View):
+    """
+    Server-sent events with small JSON deltas for one group's tasks and
+    members (see tasks/events.py). Needs the ASGI server: under WSGI a
+    never-ending stream would hold a worker for good, so it answers 501.
+    """
+
+    async def get(self, request, pk):
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse("Live updates need the ASGI server.", status=501, content_type='text/plain')
+        # EventSource can't follow a login redirect, so plain status codes.
+        user = await request.auser()
+        if not user.is_authenticated:
+            return HttpResponse(status=401)
+        access = await sync_to_async(get_current_group_access)(user)
+        if not access.can_access(pk):
+            raise Http404("No such group.")
+
+        response = StreamingHttpResponse(self.stream(pk, user.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # don't let a proxy hold events back
+        return response
+
+    async def stream(self, group_id, user_id):
+        subscription = get_broker().subscribe(group_channel(group_id))
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                message = await subscription.get(timeout=settings.TASK_EVENTS_HEARTBEAT)
+                if message is None:
+                    # The member.removed event only reaches this process if
+                    # the removal was made here, so check again every beat.
+                    access = await sync_to_async(current_group_access_for)(user_id)
+                    if not access.can_access(group_id):
+                        return
+                    yield ': keep-alive\n\n'
+                    continue
+                if message == RESYNC:
+                    message = json.dumps({'type': RESYNC})
+                event = json.loads(message)
+                yield f"event: {event['type']}\ndata: {message}\n\n"
+                if event['type'] == 'group.deleted' or (
+                        event['type'] == 'member.removed' and event.get('user_id') == user_id):
+                    return
+        finally:
+            subscription.close()
+
+
 class GroupUpdateView(GroupAdminRequiredMixin, UpdateView):
     model = Group
     fields = ['name']
@@ -328,26 +429,38 @@ class GroupMemberManageView(GroupAdminRequiredMixin, UpdateView):
         return form_class(
             data=self.request.POST if self.request.method == 'POST' else None,
             files=self.request.FILES if self.request.method == 'POST' else None,
-            group=self.get_object()
+            group=self.object
         )
 
     def form_valid(self, form):
-        group = self.get_object()
-        selected_members = form.cleaned_data['members']
-
-        if group.admin not in selected_members:
-            selected_members = list(selected_members) + [group.admin]
-
-        current_members = [m.user for m in group.members.exclude(user=group.admin)]
-
-        members_to_add = set(selected_members) - set(current_members)
-        for user_to_add in members_to_add:
-            if user_to_add != group.admin:
-                Membership.objects.get_or_create(group=group, user=user_to_add)
-
-        members_to_remove = set(current_members) - set(selected_members)
-        for user_to_remove in members_to_remove:
-            Membership.objects.filter(group=group, user=user_to_remove).delete()
+        group = self.object
+        # The admin's own membership is never added or removed here.
+        selected_ids = {user.pk for user in form.cleaned_data['members']} - {group.admin_id}
+
+        # Diff on user IDs and apply it with one INSERT and one DELETE,
+        # however many members change.
+        with transaction.atomic():
+            current = dict(group.members.exclude(user_id=group.admin_id).values_list('user_id', 'pk'))
+            ids_to_add = selected_ids - current.keys()
+            ids_to_remove = current.keys() - selected_ids
+            Membership.objects.bulk_create(
+                [Membership(group=group, user_id=user_id) for user_id in ids_to_add],
+                ignore_conflicts=True,
+            )
+            delete_rows(Membership, [current[user_id] for user_id in ids_to_remove])
+            drop_user_counters(*ids_to_add, *ids_to_remove)
+        # bulk_create() and delete_rows() skip the model signals, so
+        # invalidate the changed members' cached access and the group's
+        # fragments, and announce the changes, here.
+        invalidate_group_access(*ids_to_add, *ids_to_remove)
+        invalidate_groups(group.pk)
+        invalidate_memberships(*ids_to_add, *ids_to_remove)
+        for user_id in ids_to_add:
+            publish_group_event(group.pk, 'member.added', {'user_id': user_id})
+            record_activity('member.added', group.pk, data={'user_id': user_id})
+        for user_id in ids_to_remove:
+            publish_group_event(group.pk, 'member.removed', {'user_id': user_id})
+            record_activity('member.removed', group.pk, data={'user_id': user_id})
 
         messages.success(self.request, f'Members for group "{group.name}" updated successfully.')
         return redirect(self.get_success_url())
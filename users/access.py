@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+
+from .models import Group, Membership
+
+
+def _cache_key(user_id):
+    return f"users:group-access:{user_id}"
+
+
+class GroupAccess:
+    """The IDs of the groups a user belongs to and the groups they administer."""
+
+    def __init__(self, member_ids=(), admin_ids=()):
+        self.member_ids = frozenset(member_ids)
+        self.admin_ids = frozenset(admin_ids)
+
+    @property
+    def group_ids(self):
+        return self.member_ids | self.admin_ids
+
+    def is_member(self, group_id):
+        return group_id in self.member_ids
+
+    def is_admin(self, group_id):
+        return group_id in self.admin_ids
+
+    def can_access(self, group_id):
+        # Admins are normally members too, but don't rely on it.
+        return group_id in self.member_ids or group_id in self.admin_ids
+
+
+def _group_access_query(user):
+    memberships = (Membership.objects.filter(user=user).order_by()
+                   .annotate(is_admin=models.Value(False)).values_list('group_id', 'is_admin'))
+    administered = (Group.objects.filter(admin=user).order_by()
+                    .annotate(is_admin=models.Value(True)).values_list('id', 'is_admin'))
+    return memberships.union(administered, all=True)
+
+
+def _split_group_access(rows):
+    member_ids, admin_ids = [], []
+    for group_id, is_admin in rows:
+        (admin_ids if is_admin else member_ids).append(group_id)
+    return member_ids, admin_ids
+
+
+def _load_group_access(user):
+    return _split_group_access(_group_access_query(user))
+
+
+def get_group_access(user):
+    """
+    Return the user's GroupAccess, computing it at most once per request and
+    caching it across requests. Membership and Group signals (users/signals.py)
+    drop the cached entry on every change.
+    """
+    if not user.is_authenticated:
+        return GroupAccess()
+    access = getattr(user, '_group_access', None)
+    if access is None:
+        access = group_access_for(user.pk)
+        user._group_access = access
+    return access
+
+
+def get_current_group_access(user):
+    """
+    The user's GroupAccess read from the database, for checks that let a
+    user change something. The cache is per process, so a membership or
+    admin change made in another worker only reaches it when the entry
+    expires; read-only pages can live with that, writes can't. Refreshes
+    this process's cached entry and the request's copy.
+    """
+    if not user.is_authenticated:
+        return GroupAccess()
+    access = getattr(user, '_current_group_access', None)
+    if access is None:
+        rows = _load_group_access(user.pk)
+        cache.set(_cache_key(user.pk), rows, settings.GROUP_ACCESS_CACHE_TIMEOUT)
+        access = user._current_group_access = user._group_access = GroupAccess(*rows)
+    return access
+
+
+def current_group_access_for(user_id):
+    """get_current_group_access() for a user ID, read afresh on every call."""
+    rows = _load_group_access(user_id)
+    cache.set(_cache_key(user_id), rows, settings.GROUP_ACCESS_CACHE_TIMEOUT)
+    return GroupAccess(*rows)
+
+
+def group_access_for(user_id):
+    """GroupAccess for a user ID (not just the request's user), from the same cache."""
+    key = _cache_key(user_id)
+    cached = cache.get(key)
+    if cached is None:
+        cached = _load_group_access(user_id)
+        cache.set(key, cached, settings.GROUP_ACCESS_CACHE_TIMEOUT)
+    return GroupAccess(*cached)
+
+
+async def aget_group_access(user):
+    """get_group_access() for async views, using the async cache and ORM APIs."""
+    if not user.is_authenticated:
+        return GroupAccess()
+    access = getattr(user, '_group_access', None)
+    if access is None:
+        key = _cache_key(user.pk)
+        cached = await cache.aget(key)
+        if cached is None:
+            cached = _split_group_access([row async for row in _group_access_query(user)])
+            await cache.aset(key, cached, settings.GROUP_ACCESS_CACHE_TIMEOUT)
+        access = GroupAccess(*cached)
+        user._group_access = access
+    return access
+
+
+def invalidate_group_access(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids if user_id is not None])
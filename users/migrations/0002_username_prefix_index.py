@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'users_username_upper_like'
+
+
+def create_index(apps, schema_editor):
+    # Backs UserSearchView's username__istartswith, which Postgres compiles
+    # to UPPER(username::text) LIKE UPPER('prefix%'). Other backends skip it.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(table)} '
+        f'(UPPER("username"::text) text_pattern_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
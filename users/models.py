@@ -1,10 +1,29 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 import uuid
 from django.conf import settings
 
 # Create your models here.
 
+class GroupQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        # EXISTS instead of joining members, so no DISTINCT is needed.
+        is_member = Membership.objects.filter(group=models.OuterRef('pk'), user=user)
+        return self.filter(models.Q(admin=user) | models.Exists(is_member))
+
+    def with_counts(self):
+        # Correlated COUNT subqueries; joining both relations would multiply
+        # members by tasks before counting.
+        return self.annotate(member_count=self._count('members'), task_count=self._count('tasks'))
+
+    def _count(self, relation):
+        field = self.model._meta.get_field(relation).field
+        rows = field.model._default_manager.filter(**{field.name: models.OuterRef('pk')})
+        count = rows.order_by().values(field.name).annotate(n=models.Count('pk')).values('n')
+        return Coalesce(models.Subquery(count), 0)
+
+
 class Group(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255, unique=True, help_text="Name of the group")
@@ -16,6 +35,8 @@ class Group(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = GroupQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Group"
         verbose_name_plural = "Groups"
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .access import invalidate_group_access
+from .models import Group, Membership
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def membership_changed(sender, instance, **kwargs):
+    invalidate_group_access(instance.user_id)
+
+
+@receiver(post_init, sender=Group)
+def remember_group_admin(sender, instance, **kwargs):
+    # Read from __dict__ so groups loaded with only() don't fetch admin_id.
+    instance._loaded_admin_id = instance.__dict__.get('admin_id')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Cover both the previous and the current admin when the admin changes.
+    invalidate_group_access(getattr(instance, '_loaded_admin_id', None), instance.admin_id)
+    instance._loaded_admin_id = instance.admin_id
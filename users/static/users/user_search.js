@@ -0,0 +1,42 @@
+// Typeahead for <select data-user-search-url> widgets (users/widgets.py).
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-user-search-url]').forEach(function (select) {
+        var input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control mb-2';
+        input.placeholder = 'Type a username to search…';
+        select.parentNode.insertBefore(input, select);
+
+        var timer = null;
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                var query = input.value.trim();
+                if (!query) {
+                    return;
+                }
+                var url = new URL(select.dataset.userSearchUrl, window.location.origin);
+                url.searchParams.set('q', query);
+                if (select.dataset.userSearchGroup) {
+                    url.searchParams.set('group', select.dataset.userSearchGroup);
+                }
+                fetch(url, {headers: {'Accept': 'application/json'}})
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        // Keep the empty option and current selections, replace the rest.
+                        Array.from(select.options).forEach(function (option) {
+                            if (option.value && !option.selected) {
+                                option.remove();
+                            }
+                        });
+                        var present = new Set(Array.from(select.options).map(function (o) { return o.value; }));
+                        data.results.forEach(function (user) {
+                            if (!present.has(String(user.id))) {
+                                select.add(new Option(user.username, user.id));
+                            }
+                        });
+                    });
+            }, 200);
+        });
+    });
+});
@@ -1,3 +1,37 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from task_management.testing import TEST_OVERRIDES
+from .models import Group, Membership
+
+User = get_user_model()
+
+
+@TEST_OVERRIDES
+class UserSearchViewTests(TestCase):
+    def setUp(self):
+        self.searcher = User.objects.create_user(username='searcher', password='pass')
+        User.objects.bulk_create([User(username=f"alice{i:02d}") for i in range(30)] + [User(username='bob')])
+        self.client.force_login(self.searcher)
+
+    def search(self, **params):
+        response = self.client.get(reverse('user_search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['username'] for row in response.json()['results']]
+
+    def test_prefix_search_is_case_insensitive_and_paged(self):
+        results = self.search(q='ALI')
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0], 'alice00')
+        self.assertEqual(self.search(q='bo'), ['bob'])
+        self.assertEqual(self.search(q=''), [])
+
+    def test_group_filter_requires_access(self):
+        group = Group.objects.create(name='team', admin=User.objects.get(username='bob'))
+        Membership.objects.create(group=group, user=User.objects.get(username='alice01'))
+
+        self.assertEqual(self.search(q='a', group=str(group.pk)), [])
+        Membership.objects.create(group=group, user=self.searcher)
+        self.assertEqual(self.search(q='a', group=str(group.pk)), ['alice01'])
+        self.assertEqual(self.search(q='a', group='not-a-uuid'), [])
@@ -1,10 +1,11 @@
 
 
 from django.urls import path
-from .views import RegisterView, CustomLoginView, CustomLogoutView
+from .views import RegisterView, CustomLoginView, CustomLogoutView, UserSearchView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', CustomLoginView.as_view(), name='login'),
     path('logout/', CustomLogoutView.as_view(), name='logout'),
+    path('search/', UserSearchView.as_view(), name='user_search'),
 ]
\ No newline at end of file
@@ -1,10 +1,19 @@
+import uuid
+
 from django.shortcuts import redirect, render
+from django.views import View
 from django.views.generic import CreateView
+from django.contrib.auth import get_user_model
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
 from .forms import UserLoginForm, UserRegisterForm
 from django.urls import reverse_lazy
 from django.contrib.auth import login
 from django.contrib import messages
 from django.contrib.auth.views import LoginView, LogoutView
+from .access import get_group_access
+
+User = get_user_model()
 
 # Create your views here.
 
@@ -44,4 +53,32 @@ class CustomLogoutView(LogoutView):
 
     def dispatch(self, request, *args, **kwargs):
         messages.success(request, "You have been logged out successfully.")
-        return super().dispatch(request, *args, **kwargs)
\ No newline at end of file
+        return super().dispatch(request, *args, **kwargs)
+
+
+class UserSearchView(LoginRequiredMixin, View):
+    """Username prefix search backing the assignee and member pickers."""
+    page_size = 20
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()[:150]
+        if not query:
+            return JsonResponse({'results': []})
+
+        users = User.objects.filter(username__istartswith=query)
+        group_id = request.GET.get('group')
+        if group_id:
+            # Restrict to members, but only of groups the searcher can see.
+            if not get_group_access(request.user).can_access(_parse_uuid(group_id)):
+                return JsonResponse({'results': []})
+            users = users.filter(group_memberships__group_id=group_id)
+
+        results = list(users.order_by('username').values('id', 'username')[:self.page_size])
+        return JsonResponse({'results': results})
+
+
+def _parse_uuid(value):
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return None
@@ -0,0 +1,52 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+
+
+class UserSearchSelectMixin:
+    """
+    Render only the selected users as <option>s instead of the whole
+    queryset; users/static/users/user_search.js fetches the rest from the
+    user_search endpoint as the user types. Validation is unchanged: the
+    form field only looks up the submitted IDs.
+    """
+
+    class Media:
+        js = ('users/user_search.js',)
+
+    def __init__(self, attrs=None, search_url=reverse_lazy('user_search')):
+        attrs = {'data-user-search-url': search_url, **(attrs or {})}
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        # A re-rendered bound form carries whatever was submitted; values
+        # that aren't valid keys can't match a user (the field reports them).
+        opts = iterator.queryset.model._meta
+        key_field = opts.get_field(iterator.field.to_field_name) if iterator.field.to_field_name else opts.pk
+        selected = []
+        for v in value:
+            if v in ('', None):
+                continue
+            try:
+                selected.append(key_field.to_python(v))
+            except (ValueError, ValidationError):
+                continue
+        choices = []
+        if not self.allow_multiple_selected and iterator.field.empty_label is not None:
+            choices.append(('', iterator.field.empty_label))
+        if selected:
+            choices.extend(iterator.choice(obj) for obj in iterator.queryset.filter(pk__in=selected))
+        self.choices = choices
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
+
+
+class UserSearchSelect(UserSearchSelectMixin, forms.Select):
+    pass
+
+
+class UserSearchSelectMultiple(UserSearchSelectMixin, forms.SelectMultiple):
+    pass